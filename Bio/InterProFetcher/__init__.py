@@ -9,103 +9,429 @@
 # Please see the LICENSE file that should have been included as part of this
 # package.
 
-from time import sleep
+import functools
+import heapq
+import http.client
 import io
-import json
 import os
 import re
-import ssl
 import sys
 import warnings
+import zlib
 
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.error import URLError, HTTPError
 from urllib.parse import urlencode
-from urllib import request
 
+from ._accessions import AccessionArray
+from ._cache import ResponseCache
+from ._checkpoint import Checkpoint
+from ._client import InterProClient, get_default_client
+from ._faidx import FastaIndex, index_fasta
+from ._jsonstream import StreamedPage
+from ._metrics import Metrics, RequestEvent
+from .offline import OfflineIndex, get_offline_index, set_offline_index
+from ._progress import Progress, print_progress
+from ._ratelimit import RateLimiter
+from ._records import ProteinRecords
+from ._retry import RetryPolicy
+from ._sinks import CsvSink, FastaSink, JsonlSink, open_sink
+from ._sinks import HEADER_SEPARATOR, LINE_LENGTH, _read_committed
+
+
+API_URL = "https://www.ebi.ac.uk:443/interpro/api"
+PDB_DOWNLOAD_URL = "https://files.rcsb.org/download"
+# Results per page of the paginated queries; 200 is the most the API allows.
+PAGE_SIZE = 200
+_CHUNK_SIZE = 1 << 16
+
+
+def _search_string(text):
+    """Return the ``search=`` filter for free text, or an empty string (PRIVATE)."""
+    if text != "":
+        return "search=" + "%20".join(re.split(r"\s+", text.lower().strip())) + "&"
+    return ""
+
+
+def _proteins_url(database, organism, reviewed, entry=None, tax_id=None, length=None, is_fragment=None):
+    """Return the first page URL used by browse_proteins (PRIVATE).
+
+    The structured filters become path filters (entry, taxonomy) or
+    query string filters (length, is_fragment) evaluated by the server.
+    """
+    uniprot = "reviewed" if reviewed else "UniProt"
+    path = f"{API_URL}/protein/{uniprot}/entry/{database}/"
+    if entry:
+        path += entry + "/"
+    if tax_id is not None:
+        path += f"taxonomy/uniprot/{tax_id}/"
+    filters = ""
+    if length is not None:
+        filters += "length=%d-%d&" % tuple(length)
+    if is_fragment is not None:
+        filters += "is_fragment=" + ("true" if is_fragment else "false") + "&"
+    return f"{path}?{filters}{_search_string(organism)}page_size={PAGE_SIZE}"
+
+
+def _structures_url(database, keyword, resolution):
+    """Return the first page URL used by browse_structures (PRIVATE)."""
+    resolution_string = "resolution=" + resolution + "&" if resolution != "" else ""
+    return f"{API_URL}/structure/PDB/entry/{database}/?{resolution_string}{_search_string(keyword)}page_size={PAGE_SIZE}"
+
+
+def _proteomes_url(organism):
+    """Return the first page URL used by browse_proteomes (PRIVATE)."""
+    return f"{API_URL}/proteome/uniprot/entry/InterPro/?{_search_string(organism)}page_size={PAGE_SIZE}"
+
+
+def _database_url(database, type, keyword):
+    """Return the first page URL used by browse_by_type and browse_by_database (PRIVATE)."""
+    type_string = "type=" + type + "&" if type != "" else ""
+    return f"{API_URL}/entry/{database}/?{type_string}{_search_string(keyword)}page_size={PAGE_SIZE}"
 
-def browse_proteins(database: str, organism: str, reviewed: bool = False, write_on_sdout: bool = True, save_to_file: bool = False):
+
+def _proteome_sequences_url(proteome_id):
+    """Return the first page URL used by fetch_proteomes (PRIVATE)."""
+    return f"{API_URL}/protein/UniProt/entry/InterPro/proteome/uniprot/{proteome_id}/?page_size={PAGE_SIZE}&extra_fields=sequence"
+
+
+def _entry_sequences_url(database, accession_number):
+    """Return the first page URL used by fetch_entries (PRIVATE)."""
+    # e.g. https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/pfam/PF00003/
+    return f"{API_URL}/protein/UniProt/entry/{database}/{accession_number}/?page_size={PAGE_SIZE}&extra_fields=sequence"
+
+
+def _ordered_map(function, items, max_workers):
+    """Apply function to items on a thread pool, yielding results in input order (PRIVATE).
+
+    At most a few batches of max_workers calls are queued ahead of the result
+    being consumed, so memory stays bounded for very long inputs.
     """
-    Browse proteins from different databases and organisms.
+    if max_workers <= 1:
+        yield from map(function, items)
+        return
+    with ThreadPoolExecutor(max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 4 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_pages(url, client, progress=None, retry_state=None):
+    """Yield the decoded JSON pages of a cursor paginated query (PRIVATE).
+
+    Pages are requested one at a time as the caller consumes them. All the
+    pages share one retry budget of the client retry policy, retry_state
+    if given. A Progress is updated once the caller is done with each page.
+    """
+    if retry_state is None:
+        retry_state = client.retry.start()
+    while url:
+        try:
+            payload = client.get_json(url, retry_state=retry_state)
+        except URLError:
+            sys.stderr.write("LAST URL: " + url + "\n")
+            raise
+        if payload is None:
+            break
+        yield payload
+        if progress is not None:
+            progress.update(len(payload["results"]), payload.get("count"))
+        url = payload["next"]
+
+
+def _iter_streamed_pages(url, client, progress=None, retry_state=None):
+    """Yield the pages of a cursor paginated query, decoding each while it downloads (PRIVATE).
+
+    The results of every page must be consumed before its ``next`` member
+    is available and the following page is requested.
+    """
+    if retry_state is None:
+        retry_state = client.retry.start()
+    while url:
+        page = StreamedPage(client, url, retry_state)
+        yield page
+        if progress is not None:
+            progress.update(page.size, page.get("count"))
+        url = page["next"]
+
+
+def _progress(label, callback, total=None, page_size=None):
+    """Return a Progress reporting to callback, or None without a callback (PRIVATE)."""
+    if callback is None:
+        return None
+    return Progress(label, callback, page_size or PAGE_SIZE, total)
+
+
+def _count_url(url):
+    """Return the URL of a query asking for a single result, enough to read its count (PRIVATE)."""
+    return re.sub(r"page_size=\d+", "page_size=1", url).replace("&extra_fields=sequence", "")
+
+
+def _query_count(url, client, retry_state=None):
+    """Return the number of results of a paginated query (PRIVATE)."""
+    payload = client.get_json(_count_url(url), retry_state=retry_state)
+    return payload["count"] if payload else 0
+
+
+def _plan(url, client, count=None, retry_state=None):
+    """Return the dry run summary of a paginated query (PRIVATE)."""
+    if count is None:
+        count = _query_count(url, client, retry_state)
+    requests = max(1, -(-count // PAGE_SIZE))
+    return {"count": count, "requests": requests, "seconds": requests / client.rate_limiter.rate}
+
+
+def _iter_results(url, metadata, client, progress=None):
+    """Yield the accession, or the metadata dict, of each result of a query (PRIVATE)."""
+    client = client or get_default_client()
+    for payload in _iter_pages(url, client, _progress(url, progress)):
+        for item in payload["results"]:
+            yield item["metadata"] if metadata else item["metadata"]["accession"]
+
+
+def _paginate_to_file(url, client, sink_class, filename, compression=None, append=False, checkpoint=None, on_results=None, stream=False, progress=None, collect=False, retry_state=None):
+    """Write every page of a query to filename through a sink, checkpointing after each page (PRIVATE).
+
+    retry_state is the retry budget of the job, a new one by default.
+    on_results(results), if given, is called with the results of each page
+    before they are written. With stream True, the results are decoded and
+    written one by one as they download, which bounds memory use by the
+    size of a record rather than of a page (responses are then not cached,
+    so a client with a cache keeps using whole pages). With a checkpoint,
+    the output is synced and the next cursor recorded after every page; a
+    job found in the checkpoint is resumed from there after truncating the
+    output to the recorded offset. On error the partial output is kept
+    only if it can be resumed.
+
+    With collect True, returns the text written to filename by earlier
+    runs of a resumed job; otherwise (and for a new job) returns an empty
+    string, and the earlier output is never read back. progress is an
+    optional Progress updated after every page.
+    """
+    first_url = url
+    state = checkpoint.get(filename, first_url) if checkpoint is not None else None
+    previous = ""
+    if state is None:
+        sink = sink_class(filename, compression, append)
+    else:
+        completed = state["next"] is None
+        if collect:
+            path = filename if append or completed else filename + ".part"
+            previous = _read_committed(path, state["start"], state["offset"], compression)
+        if completed:
+            # Completed by an earlier run
+            return previous
+        sink = sink_class(filename, compression, append, resume=(state["start"], state["offset"]))
+        url = state["next"]
+    if stream and on_results is None and client.cache is None:
+        pages = _iter_streamed_pages(url, client, progress, retry_state)
+    else:
+        pages = _iter_pages(url, client, progress, retry_state)
+    try:
+        for payload in pages:
+            if on_results is not None:
+                on_results(payload["results"])
+            sink.write_results(payload["results"])
+            if checkpoint is not None:
+                checkpoint.update(filename, first_url, payload["next"], sink.start, sink.sync())
+    except BaseException:
+        sink.abort(keep=checkpoint is not None)
+        raise
+    sink.close()
+    return previous
+
+
+def _as_checkpoint(checkpoint):
+    """Accept a Checkpoint, a checkpoint file path or None (PRIVATE)."""
+    if checkpoint is None or isinstance(checkpoint, Checkpoint):
+        return checkpoint
+    return Checkpoint(checkpoint)
+
+
+def _collect(url, write_on_stdout, filename, client, checkpoint=None, progress=None, dry_run=False, offline=None):
+    """Gather the accessions for the browse functions, echoing and saving them (PRIVATE).
+
+    With dry_run True only the size of the query is returned. offline, if
+    given, is a function returning the accessions from the offline index,
+    used instead of the API.
+    """
+    if offline is not None:
+        result_ids = offline()
+        if dry_run:
+            return {"count": len(result_ids), "requests": 0, "seconds": 0.0}
+        text = "".join(accession + "\n" for accession in result_ids)
+        if write_on_stdout:
+            sys.stdout.write(text)
+        if filename is not None and result_ids:
+            with CsvSink(filename, append=True) as sink:
+                sink.write(text)
+        if result_ids == []:
+            print("There is no data associated with this request.")
+            sys.exit()
+        return result_ids
+    client = client or get_default_client()
+    retry_state = client.retry.start()
+    if dry_run:
+        return _plan(url, client, retry_state=retry_state)
+    progress = _progress(url, progress)
+    result_ids = []
+
+    def on_results(results):
+        accessions = [item["metadata"]["accession"] for item in results]
+        result_ids.extend(accessions)
+        if write_on_stdout:
+            sys.stdout.write("".join(accession + "\n" for accession in accessions))
+
+    if filename is None:
+        for payload in _iter_pages(url, client, progress, retry_state):
+            on_results(payload["results"])
+    else:
+        previous = _paginate_to_file(url, client, CsvSink, filename, append=True, checkpoint=_as_checkpoint(checkpoint), on_results=on_results, progress=progress, collect=True, retry_state=retry_state)
+        result_ids[:0] = previous.split()
+    if result_ids == []:
+        print("There is no data associated with this request.")
+        sys.exit()
+    else:
+        return result_ids
+
+
+def iter_proteins(database: str, organism: str = "", reviewed: bool = False, metadata: bool = False, client: InterProClient = None, progress=None, entry: str = None, tax_id: int = None, length: tuple = None, is_fragment: bool = None):
+    """
+    Iterate over proteins from different databases and organisms, page by page.
+
+    This is the streaming counterpart of browse_proteins. Results are
+    yielded as soon as their page arrives and nothing is accumulated, so
+    memory use does not grow with the number of matches. An empty query
+    simply yields nothing.
 
     Args:
         database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
         organism (str, optional): species name.
         reviewed (bool, optional): only reviewed proteins. Defaults to False.
-        write_on_sdout (bool, optional): write results on stdout. Defaults to True.
-        save_to_file (bool, optional): save results to a csvfile. Defaults to False.
+        metadata (bool, optional): yield the full metadata dict of each protein instead of its accession. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        entry (str, optional): only proteins matching this entry accession of database, e.g. "PF00051".
+        tax_id (int, optional): only proteins of this NCBI taxonomy ID (including its descendants). More precise and faster than an organism search.
+        length (tuple, optional): (minimum, maximum) sequence length, inclusive.
+        is_fragment (bool, optional): only fragments (True) or only complete sequences (False). Defaults to both.
+
+    Yields:
+        str or dict: protein accession numbers (or metadata)
+    """
+    return _iter_results(_proteins_url(database, organism, reviewed, entry, tax_id, length, is_fragment), metadata, client, progress)
 
-    Returns:
-        list: protein accession numbers
+
+def iter_structures(database: str, keyword: str = "", resolution: str = "", metadata: bool = False, client: InterProClient = None, progress=None):
     """
-    if reviewed:
-        uniprot = "reviewed"
-    else:
-        uniprot = "UniProt"
-    if organism != "":
-        organism_string = "search=" + "%20".join(re.split("\s+", organism.lower().strip())) + "&"
-    else:
-        organism_string = ""
+    Iterate over PDB structures matching a keyword and resolution, page by page.
 
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/protein/{uniprot}/entry/{database}/?{organism_string}page_size=200"
-    print(BASE_URL)
-    
+    This is the streaming counterpart of browse_structures.
 
-    context = ssl._create_unverified_context()
+    Args:
+        database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+        keyword (str, optional): keyword used to filter the entries.
+        resolution (str, optional): resolution of the structure. Defaults to "". Available resolutions: '0-2', '2-4', '4-100'.
+        metadata (bool, optional): yield the full metadata dict of each structure instead of its accession. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
 
-    next = BASE_URL
-    last_page = False #
-    result_ids = []
-    attempts = 0
+    Yields:
+        str or dict: PDB accession numbers (or metadata)
+    """
+    return _iter_results(_structures_url(database, keyword, resolution), metadata, client, progress)
 
-    while next:
-        try:
-            req = request.Request(next)
-            res = request.urlopen(req, context = context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
-               break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next: #
-                last_page = True #
-        except HTTPError as e:
-            if e.code == 400:
-                sleep(61)
-                continue
-            else:
-                if attempts < 3:
-                   attempts += 1
-                   sleep(61)
-                   continue
-                else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
-            raise e
-        for i, item in enumerate(payload["results"]):
-            accesion = item["metadata"]["accession"]
-            result_ids.append(accesion)
-            if write_on_sdout:
-                sys.stdout.write(accesion + "\n")
-            if save_to_file:
-                with open("protein_accessions_" + database + "_" + "_".join(re.split("\s+", organism)) + ".csv", "a+") as f:
-                    f.write(accesion + "\n")
-        
-        if next:
-            sleep(1)
-    
-    if result_ids == []:
-        print("There is no data associated with this request.")
-        sys.exit()
+
+def iter_entries(database: str = "InterPro", type: str = "", keyword: str = "", metadata: bool = False, client: InterProClient = None, progress=None):
+    """
+    Iterate over entries of a database matching a type and keyword, page by page.
+
+    This is the streaming counterpart of browse_by_type (database "InterPro")
+    and browse_by_database.
+
+    Args:
+        database (str, optional): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf). Defaults to "InterPro".
+        type (str, optional): type of entry to browse (family, domain, homologous_superfamily, repeat, conserved_site, active_site, binding_site, ptm, unknown).
+        keyword (str, optional): keyword used to filter the entries. Defaults to "".
+        metadata (bool, optional): yield the full metadata dict of each entry instead of its accession. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+
+    Yields:
+        str or dict: entry accession numbers (or metadata)
+    """
+    return _iter_results(_database_url(database, type, keyword), metadata, client, progress)
+
+
+def iter_proteomes(organism: str, metadata: bool = False, client: InterProClient = None, progress=None):
+    """
+    Iterate over proteomes of an organism, page by page.
+
+    This is the streaming counterpart of browse_proteomes.
+
+    Args:
+        organism (str): name of the organism to browse with.
+        metadata (bool, optional): yield the full metadata dict of each proteome instead of its accession. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+
+    Yields:
+        str or dict: proteome accession numbers (or metadata)
+    """
+    return _iter_results(_proteomes_url(organism), metadata, client, progress)
+
+
+def browse_proteins(database: str, organism: str = "", reviewed: bool = False, write_on_sdout: bool = True, save_to_file: bool = False, client: InterProClient = None, checkpoint=None, progress=None, dry_run: bool = False, entry: str = None, tax_id: int = None, length: tuple = None, is_fragment: bool = None):
+    """
+    Browse proteins from different databases and organisms.
+
+    The entry, tax_id, length and is_fragment filters are applied by the
+    InterPro server, so only the matching proteins are downloaded. Queries
+    without them are answered locally if an offline index registered with
+    ``set_offline_index`` covers them.
+
+    Args:
+        database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+        organism (str, optional): species name, searched as free text.
+        reviewed (bool, optional): only reviewed proteins. Defaults to False.
+        write_on_sdout (bool, optional): write results on stdout. Defaults to True.
+        save_to_file (bool, optional): save results to a csvfile. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used with save_to_file to resume an interrupted download. Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of results and the estimated number of requests and seconds, without downloading. Defaults to False.
+        entry (str, optional): only proteins matching this entry accession of database, e.g. "PF00051".
+        tax_id (int, optional): only proteins of this NCBI taxonomy ID (including its descendants). More precise and faster than an organism search.
+        length (tuple, optional): (minimum, maximum) sequence length, inclusive.
+        is_fragment (bool, optional): only fragments (True) or only complete sequences (False). Defaults to both.
+
+    Returns:
+        list: protein accession numbers (a dict with dry_run)
+    """
+    BASE_URL = _proteins_url(database, organism, reviewed, entry, tax_id, length, is_fragment)
+    print(BASE_URL)
+    filename = "protein_accessions_" + database + "_" + "_".join(re.split(r"\s+", organism))
+    filename += "".join("_" + str(value) for value in (entry, tax_id) if value is not None)
+    if length is not None:
+        filename += "_length_%d-%d" % tuple(length)
+    if is_fragment is not None:
+        filename += "_fragments" if is_fragment else "_complete"
+    filename += ".csv"
+    structured = (entry, tax_id, length, is_fragment) != (None, None, None, None)
+    index = get_offline_index()
+    if index is not None and not structured and index.can_browse_proteins(database, organism, reviewed):
+        offline = functools.partial(index.browse_proteins, database, organism, reviewed)
     else:
-        return result_ids
-    
+        offline = None
+    return _collect(BASE_URL, write_on_sdout, filename if save_to_file else None, client, checkpoint, progress, dry_run, offline)
+
 
-def browse_structures(database: str, keyword: str, resolution: str = "", write_on_stdout: bool = True, save_to_file: bool = False):
+def browse_structures(database: str, keyword: str, resolution: str = "", write_on_stdout: bool = True, save_to_file: bool = False, client: InterProClient = None, checkpoint=None, progress=None, dry_run: bool = False):
     """
     Browse PDB structures from different databases based on a specific keyword and resolution.
 
@@ -115,203 +441,148 @@ def browse_structures(database: str, keyword: str, resolution: str = "", write_o
         resolution (str, optional): resolution of the structure. Defaults to "". Available resolutions: '0-2', '2-4', '4-100'.
         write_on_stdout (bool, optional): write results on stdout. Defaults to True.
         save_to_file (bool, optional): save results to a csv file. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used with save_to_file to resume an interrupted download. Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of results and the estimated number of requests and seconds, without downloading. Defaults to False.
 
     Returns:
-        list: PDB accession numbers
+        list: PDB accession numbers (a dict with dry_run)
     """
+    filename = "structures_pdb_ids_" + database + "_" + "_".join(re.split(r"\s+", keyword)) + ".csv"
+    return _collect(_structures_url(database, keyword, resolution), write_on_stdout, filename if save_to_file else None, client, checkpoint, progress, dry_run)
 
 
-    if keyword != "":
-        keyword_string = "search=" + "%20".join(re.split("\s+", keyword.lower().strip())) + "&"
-    else:
-        keyword_string = ""
-    if resolution != "":
-        resolution_string = "resolution=" + resolution + "&"
-    else:
-        resolution_string = ""
-
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/structure/PDB/entry/{database}/?{resolution_string}{keyword_string}page_size=200"
+def _stream_to_file(response, filename, decompressor=None):
+    """Copy a response body to filename in chunks, optionally decompressing it (PRIVATE).
 
-    context = ssl._create_unverified_context()
-
-    next = BASE_URL
-    last_page = False
-    result_ids = []
-    attempts = 0
-    if save_to_file:
-        f =  open("structures_pdb_ids_" + database + "_" + "_".join(re.split("\s+", keyword)) + ".csv", "a+")
+    The data goes to a temporary file renamed on success, so an interrupted
+    download never leaves a truncated file under the final name. A body
+    shorter than its Content-Length, or a gzip stream cut short, raises
+    URLError so that the download can be retried.
+    """
+    part_filename = filename + ".part"
+    expected = response.length
+    received = 0
+    try:
+        with open(part_filename, "wb") as handle:
+            while True:
+                chunk = response.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                handle.write(chunk)
+            if expected is not None and received < expected:
+                raise URLError(http.client.IncompleteRead(b"", expected - received))
+            if decompressor is not None:
+                if not decompressor.eof:
+                    raise URLError("Truncated gzip stream")
+                handle.write(decompressor.flush())
+        os.replace(part_filename, filename)
+    except BaseException:
+        if os.path.exists(part_filename):
+            os.remove(part_filename)
+        raise
+
+
+def _download_structure(client, pdb_id, output_path, formats, keep_compressed, retry_state):
+    """Download one structure in the first available format (PRIVATE).
+
+    A download cut short is started again, following the client retry
+    policy with the retry budget retry_state. Returns the name of the
+    written file, or None if no format was found.
+    """
+    for format in formats:
+        url = f"{PDB_DOWNLOAD_URL}/{pdb_id}.{format}.gz"
+        if keep_compressed:
+            filename = os.path.join(output_path, pdb_id + "." + format + ".gz")
+        else:
+            filename = os.path.join(output_path, pdb_id + "." + format)
+
+        def download(first):
+            decompressor = None if keep_compressed else zlib.decompressobj(16 + zlib.MAX_WBITS)
+            # Each try opens the response once, the retries happen around it
+            with client.stream(url, retry=False) as response:
+                _stream_to_file(response, filename, decompressor)
 
-    while next:
         try:
-            req = request.Request(next)
-            res = request.urlopen(req, context=context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
-                break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next:
-                last_page = True
+            client._retrying(download, retry_state)
         except HTTPError as e:
-            if e.code == 408:
-                sleep(61)
+            if e.code == 404:
                 continue
-            else:
-                if attempts < 3:
-                    attempts += 1
-                    sleep(61)
-                    continue
-                else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
             raise e
-
-        for i, item in enumerate(payload["results"]):
-            accesion = item["metadata"]["accession"]
-            result_ids.append(accesion)
-            if write_on_stdout:
-                sys.stdout.write(accesion + "\n")
-            if save_to_file:
-                f.write(accesion + "\n")
-        
-        if next:
-            sleep(1)
-    
-    if result_ids == []:
-        print("There is no data associated with this request.")
-        sys.exit()
-    else:
-        return result_ids
+        return filename
+    return None
 
 
-def download_pdb_structures(PDB_ids: list, output_path: str):
+def download_pdb_structures(PDB_ids: list, output_path: str, client: InterProClient = None, formats: tuple = ("pdb", "cif"), keep_compressed: bool = False, max_workers: int = 4):
     """
     Download PDB files from the list of PDB ids.
 
+    The files are requested gzip compressed and streamed to disk by up to
+    max_workers concurrent downloads. Formats are tried in the given order,
+    so e.g. ``formats=("cif",)`` avoids a wasted request for structures
+    without a legacy PDB file.
+
     Args:
         PDB_ids (list): list of PDB ids.
         output_path (str): path to the output directory.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        formats (tuple, optional): file formats to try in order ("pdb", "cif"). Defaults to ("pdb", "cif").
+        keep_compressed (bool, optional): save the .gz files as downloaded instead of decompressing them. Defaults to False.
+        max_workers (int, optional): number of files downloaded concurrently. Defaults to 4.
+
+    Returns:
+        dict: name of the written file for each downloaded PDB id.
     """
-    if output_path == "":
-        output_path = "."
-    else:
-        output_path = output_path.strip()
-    
-    if not output_path.endswith("/"):
-        output_path += "/"
-    
-    context = ssl._create_unverified_context()
+    output_path = output_path.strip() or "."
+    client = client or get_default_client()
+    retry_state = client.retry.start()
 
-    for pdb_id in PDB_ids:
-        print("Downloading " + pdb_id + "...")
+    def download(pdb_id):
         pdb_id = pdb_id.strip()
-        url = f"https://files.rcsb.org/download/{pdb_id}.pdb"
-        try:
-            req = request.Request(url)
-            res = request.urlopen(req, context=context)
-            output_filename = output_path + pdb_id + ".pdb"
-            with open(output_filename, "w") as f:
-                f.write(res.read().decode())
+        print("Downloading " + pdb_id + "...")
+        filename = _download_structure(client, pdb_id, output_path, formats, keep_compressed, retry_state)
+        if filename is None:
+            sys.stderr.write(f"WARNING: {pdb_id} is not found in the PDB database.\n")
+        return pdb_id, filename
 
-        except HTTPError as e:
-            if e.code == 404:
-                sys.stderr.write(f"WARNING: {pdb_id}.pdb is not found in the PDB database. Trying to download CIF file.\n")
-                try:
-                    url = f"https://files.rcsb.org/download/{pdb_id}.cif"
-                    req = request.Request(url)
-                    res = request.urlopen(req, context=context)
-                    output_filename = output_path + pdb_id + ".cif"
-                    with open(output_filename, "w") as f:
-                        f.write(res.read().decode())
-                except HTTPError as e:
-                    if e.code == 404:
-                        sys.stderr.write(f"WARNING: {pdb_id} is not found in the PDB database.\n")
-                        continue
-            else:
-                raise e
-        except Exception as e:
-            raise e
-        sleep(5)
+    downloads = _ordered_map(download, PDB_ids, max_workers)
+    return {pdb_id: filename for pdb_id, filename in downloads if filename is not None}
 
 
-def browse_by_type(type: str, keyword: str = "", write_on_sdout: bool = True, save_to_file: bool = False):
+def browse_by_type(type: str, keyword: str = "", write_on_sdout: bool = True, save_to_file: bool = False, client: InterProClient = None, checkpoint=None, progress=None, dry_run: bool = False):
     """
     Browse entries from the InterPro database based on a specific type and keyword.
 
+    The query is answered locally if an offline index registered with
+    ``set_offline_index`` covers it.
+
     Args:
         type (str): type of entry to browse (family, domain, homologous_superfamily, repeat, conserved_site, active_site, binding_site, ptm).
         keyword (str, optional): keyword used to filter the entries. Defaults to "".
         write_on_sdout (bool, optional): write results on stdout. Defaults to True.
         save_to_file (bool, optional): save results to a csv file. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used with save_to_file to resume an interrupted download. Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of results and the estimated number of requests and seconds, without downloading. Defaults to False.
 
     Returns:
-        list: accession numbers of selected type that are matching the request.
+        list: accession numbers of selected type that are matching the request (a dict with dry_run).
     """
-    if keyword != "":
-        keyword_string = "search=" + "%20".join(re.split("\s+", keyword.lower().strip())) + "&"
+    filename = type + "_accessions_" + "_".join(re.split(r"\s+", keyword)) + ".csv"
+    index = get_offline_index()
+    if index is not None and index.can_browse_by_type():
+        offline = functools.partial(index.browse_by_type, type, keyword)
     else:
-        keyword_string = ""
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/entry/InterPro/?type={type}&{keyword_string}page_size=200"
-    
-    context = ssl._create_unverified_context()
+        offline = None
+    return _collect(_database_url("InterPro", type, keyword), write_on_sdout, filename if save_to_file else None, client, checkpoint, progress, dry_run, offline)
 
-    next = BASE_URL
-    last_page = False #
-    result_ids = []
-    while next:
-        try:
-            req = request.Request(next)
-            res = request.urlopen(req, context = context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
-               break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next: #
-                last_page = True #
-        except HTTPError as e:
-            if e.code == 400:
-                sleep(61)
-                continue
-            else:
-                if attempts < 3:
-                   attempts += 1
-                   sleep(61)
-                   continue
-                else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
-            raise e
-        for i, item in enumerate(payload["results"]):
-            accesion = item["metadata"]["accession"]
-            result_ids.append(accesion)
-            if write_on_sdout:
-                sys.stdout.write(accesion + "\n")
-            if save_to_file:
-                with open(type + "_accessions_" + "_".join(re.split("\s+", keyword)) + ".csv", "a+") as f:
-                    f.write(accesion + "\n")
-        
-        if next:
-            sleep(1)
-    
-    if result_ids == []:
-        print("There is no data associated with this request.")
-        sys.exit()
-    else:
-        return result_ids
-    
 
-def browse_proteomes(organism: str, write_on_sdout: bool = True, save_to_file: bool = False):
+def browse_proteomes(organism: str, write_on_sdout: bool = True, save_to_file: bool = False, client: InterProClient = None, checkpoint=None, progress=None, dry_run: bool = False):
     """
     Browse proteomes from the InterPro database for a specific organism.
 
@@ -319,66 +590,19 @@ def browse_proteomes(organism: str, write_on_sdout: bool = True, save_to_file: b
         organism (str): name of the organism to browse with.
         write_on_sdout (bool, optional): write results on stdout. Defaults to True.
         save_to_file (bool, optional): save results to a csv file. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used with save_to_file to resume an interrupted download. Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of results and the estimated number of requests and seconds, without downloading. Defaults to False.
 
     Return:
-        list: accession numbers of proteomes that are matching the request.
+        list: accession numbers of proteomes that are matching the request (a dict with dry_run).
     """
-    organism_string = "%20".join(re.split("\s+", organism.lower().strip()))
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/proteome/uniprot/entry/InterPro/?search={organism_string}&page_size=200"
+    filename = "proteome_accessions_" + "_".join(re.split(r"\s+", organism)) + ".csv"
+    return _collect(_proteomes_url(organism), write_on_sdout, filename if save_to_file else None, client, checkpoint, progress, dry_run)
 
-    context = ssl._create_unverified_context()
 
-    next = BASE_URL
-    last_page = False #
-    result_ids = []
-    while next:
-        try:
-            req = request.Request(next)
-            res = request.urlopen(req, context = context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
-               break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next: #
-                last_page = True #
-        except HTTPError as e:
-            if e.code == 400:
-                sleep(61)
-                continue
-            else:
-                if attempts < 3:
-                   attempts += 1
-                   sleep(61)
-                   continue
-                else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
-            raise e
-        for i, item in enumerate(payload["results"]):
-            accesion = item["metadata"]["accession"]
-            result_ids.append(accesion)
-            if write_on_sdout:
-                sys.stdout.write(accesion + "\n")
-            if save_to_file:
-                with open("proteome_accessions_" + "_".join(re.split("\s+", organism)) + ".csv", "a+") as f:
-                    f.write(accesion + "\n")
-        
-        if next:
-            sleep(1)
-    
-    if result_ids == []:
-        print("There is no data associated with this request.")
-        sys.exit()
-    else:
-        return result_ids
-    
-def browse_by_database(database: str, type: str = "", keyword: str = "", write_on_sdout: bool = True, save_to_file: bool = False):
+def browse_by_database(database: str, type: str = "", keyword: str = "", write_on_sdout: bool = True, save_to_file: bool = False, client: InterProClient = None, checkpoint=None, progress=None, dry_run: bool = False):
     """
     Browse entries from selected database based on a specific type and keyword.
 
@@ -388,115 +612,64 @@ def browse_by_database(database: str, type: str = "", keyword: str = "", write_o
         keyword (str, optional): keyword used to filter the entries. Defaults to "".
         write_on_sdout (bool, optional): write results on stdout. Defaults to True.
         save_to_file (bool, optional): save results to a csv file. Defaults to False.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used with save_to_file to resume an interrupted download. Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of results and the estimated number of requests and seconds, without downloading. Defaults to False.
     
     Returns:
-        list: accession numbers that are matching the request.
+        list: accession numbers that are matching the request (a dict with dry_run).
     """
-    if keyword != "":
-        keyword_string = "search=" + "%20".join(re.split("\s+", keyword.lower().strip())) + "&"
-    else:
-        keyword_string = ""
-    if type != "":
-        type_string = "type=" + type + "&"
-    else:
-        type_string = ""
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/entry/{database}/?{type_string}{keyword_string}page_size=200"
+    filename = database + "_" + type + "_accessions" + "_".join(re.split(r"\s+", keyword)) + ".csv"
+    return _collect(_database_url(database, type, keyword), write_on_sdout, filename if save_to_file else None, client, checkpoint, progress, dry_run)
 
-    context = ssl._create_unverified_context()
 
-    next = BASE_URL
-    last_page = False 
-    result_ids = []
-    while next:
-        try:
-            req = request.Request(next)
-            res = request.urlopen(req, context = context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
-               break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next: #
-                last_page = True #
-        except HTTPError as e:
-            if e.code == 400:
-                sleep(61)
-                continue
-            else:
-                if attempts < 3:
-                   attempts += 1
-                   sleep(61)
-                   continue
-                else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
-            raise e
-        for i, item in enumerate(payload["results"]):
-            accesion = item["metadata"]["accession"]
-            result_ids.append(accesion)
-            if write_on_sdout:
-                sys.stdout.write(accesion + "\n")
-            if save_to_file:
-                with open(database + "_" + type + "_accessions" + "_".join(re.split("\s+", keyword)) + ".csv", "a+") as f:
-                    f.write(accesion + "\n")
-        
-        if next:
-            sleep(1)
-    
-    if result_ids == []:
-        print("There is no data associated with this request.")
-        sys.exit()
-    else:
-        return result_ids
-    
+def _fetch_protein_metadata(client, accession_number, retry_state=None):
+    """Return the InterPro metadata of a UniProt protein, or None if not found (PRIVATE)."""
+    url = f"{API_URL}/protein/UniProt/{accession_number}"
+    try:
+        return client.get_json(url, retry_state=retry_state)["metadata"]
+    except HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
 
-def fetch_protein_sequences(accession_numbers: list[str], output_path: str):
+
+def fetch_protein_sequences(accession_numbers: list[str], output_path: str, client: InterProClient = None, max_workers: int = 8, compression: str = None, progress=None):
     """
     Fetch protein sequences based on the given accession numbers and save them to a file.
     If there is no sequence found for a given accession number, a warning message is displayed.
 
+    The accessions are resolved by up to max_workers concurrent requests
+    sharing the client rate limit, while the sequences are still written in
+    the order of accession_numbers.
+
     Args:
         accession_numbers (list[str]): list of protein accession numbers to browse.
         output_path (str): name of the file to save the sequences.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        max_workers (int, optional): number of accessions fetched concurrently. Defaults to 8.
+        compression (str, optional): compress the output with "gzip" or "bgzf". Defaults to None.
+        progress (callable, optional): called with a Progress after every accession, e.g. ``print_progress``. Defaults to None.
     """
-
-    HEADER_SEPARATOR = "|"
-    LINE_LENGTH = 80
-
-    context = ssl._create_unverified_context()
+    client = client or get_default_client()
+    retry_state = client.retry.start()
+    progress = _progress(output_path, progress, len(accession_numbers), page_size=1)
     not_found = 0
 
-    with open(output_path, "w") as file:
-        for accession_number in accession_numbers:
-            try:
-                url = f"https://www.ebi.ac.uk/interpro/api/protein/UniProt/{accession_number}"
-                req = request.Request(url, headers={"Accept": "application/json"})
-                res = request.urlopen(req, context=context)
-                payload = json.loads(res.read().decode())
-                seq = payload["metadata"]["sequence"]
-                file.write(">" + payload["metadata"]["accession"] + HEADER_SEPARATOR + payload["metadata"]["name"] + "\n")
-                fasta_seq_fragments = [seq[i:i+LINE_LENGTH] for i in range(0, len(seq), LINE_LENGTH)]
-                for fasta_seq_fragment in fasta_seq_fragments:
-                    file.write(fasta_seq_fragment + "\n")
-
-                sleep(1)
-
-            except HTTPError as e:
-                if e.code == 408:
-                    sleep(61)
-                    continue
-                elif e.code == 404:
-                    sys.stderr.write(f"WARNING: {accession_number} not found.\n")
-                else:
-                    raise e
-
-            except Exception as e:
-                raise e
+    def fetch(accession_number):
+        return accession_number, _fetch_protein_metadata(client, accession_number, retry_state)
+
+    with FastaSink(output_path, compression) as sink:
+        for accession_number, metadata in _ordered_map(fetch, accession_numbers, max_workers):
+            if progress is not None:
+                # Accessions not found are done too
+                progress.update(1)
+            if metadata is None:
+                not_found += 1
+                sys.stderr.write(f"WARNING: {accession_number} not found.\n")
+                continue
+            sink.write_record(metadata["accession"], metadata["name"], metadata["sequence"])
 
     if not_found != len(accession_numbers):
         print("The downloaded sequences were saved to a file:", output_path)
@@ -504,72 +677,75 @@ def fetch_protein_sequences(accession_numbers: list[str], output_path: str):
         print("Provided accession numbers not found")
 
 
-def fetch_proteomes(proteome_ids, output_directory):
+def _fasta_sink(compression, index):
+    """Return the sink class of the FASTA downloads, indexing them if asked (PRIVATE)."""
+    if not index:
+        return FastaSink
+    if compression == "gzip":
+        raise ValueError("gzip output cannot be indexed, use compression='bgzf'")
+    return functools.partial(FastaSink, index=True)
+
+
+def _fasta_filename(output_directory, accession, compression):
+    """Return the FASTA file name used for one proteome or entry (PRIVATE)."""
+    return os.path.join(output_directory, accession + ".fasta" + (".gz" if compression else ""))
+
+
+def fetch_proteomes(proteome_ids, output_directory, client: InterProClient = None, checkpoint=None, compression: str = None, max_workers: int = 4, progress=None, dry_run: bool = False, index: bool = False):
     """
     Fetch proteomes based on the given InterPro proteome IDs and save them to individual FASTA files.
     If a proteome is not found for a given ID, a warning message is displayed.
 
+    Up to max_workers proteomes are downloaded concurrently, each following
+    its own cursor pagination into its own file. All of them share the rate
+    limiter and connection pool of the client, so the download time scales
+    with the allowed request rate rather than with the number of proteomes.
+
+    With a checkpoint file, the cursor and output offset of every proteome
+    are recorded after each page. Rerunning with the same checkpoint skips
+    completed proteomes and resumes interrupted ones where they stopped.
+
     Args:
         proteome_ids (list): list of proteome IDs to fetch.
         output_directory (str): directory to save the proteome files.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        checkpoint (str or Checkpoint, optional): checkpoint file used to resume interrupted downloads. Defaults to None.
+        compression (str, optional): compress the FASTA files with "gzip" or "bgzf" (saved as .fasta.gz). Defaults to None.
+        max_workers (int, optional): number of proteomes downloaded concurrently. Defaults to 4.
+        progress (callable, optional): called with a Progress after every page of every proteome, from the worker threads. Defaults to None.
+        dry_run (bool, optional): only return the number of sequences and the estimated number of requests and seconds of each proteome, without downloading. Defaults to False.
+        index (bool, optional): also write a samtools faidx index (.fai, plus .gzi with "bgzf" compression) while downloading, for random access with ``index_fasta``. Not available with "gzip" compression. Defaults to False.
 
+    Returns:
+        dict: name of the written file (or the dry_run summary) for each proteome ID found.
     """
-    for proteome_id in proteome_ids:
-        print("Downloading " + proteome_id + "...")
-        BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/InterPro/proteome/uniprot/{proteome_id}/?page_size=200&extra_fields=sequence"
-
-        HEADER_SEPARATOR = "|"
-        LINE_LENGTH = 80
-
-
-        context = ssl._create_unverified_context()
-
-        next = BASE_URL
-        last_page = False
-
-        with open(os.path.join(output_directory, proteome_id + ".fasta"), "w+") as out_file:
-
-            attempts = 0
-            while next:
-                try:
-                    req = request.Request(next, headers={"Accept": "application/json"})
-                    res = request.urlopen(req, context=context)
-                    if res.status == 408:
-                        sleep(61)
-                        continue
-                    elif res.status == 204:
-                        break
-                    payload = json.loads(res.read().decode())
-                    next = payload["next"]
-                    attempts = 0
-                    if not next:
-                        last_page = True
-                except HTTPError as e:
-                    if e.code == 408:
-                        sleep(61)
-                        continue
-                    else:
-                        if attempts < 3:
-                            attempts += 1
-                            sleep(61)
-                            continue
-                        else:
-                            sys.stderr.write("LAST URL: " + next)
-                            raise e
-
-                for i, item in enumerate(payload["results"]):
-                                       
-                    out_file.write(">" + item["metadata"]["accession"] + HEADER_SEPARATOR + item["metadata"]["name"] + "\n")
+    client = client or get_default_client()
+    checkpoint = _as_checkpoint(checkpoint)
+    sink_class = _fasta_sink(compression, index)
+
+    def fetch(proteome_id):
+        url = _proteome_sequences_url(proteome_id)
+        # Every proteome has its own retry budget, so that a long crawl
+        # does not give up once the retries of all proteomes add up
+        retry_state = client.retry.start()
+        try:
+            if dry_run:
+                return proteome_id, _plan(url, client, retry_state=retry_state)
+            print("Downloading " + proteome_id + "...")
+            output_filename = _fasta_filename(output_directory, proteome_id, compression)
+            _paginate_to_file(url, client, sink_class, output_filename, compression, checkpoint=checkpoint, stream=True, progress=_progress(proteome_id, progress), retry_state=retry_state)
+        except HTTPError as e:
+            if e.code != 404:
+                raise
+            sys.stderr.write(f"WARNING: No data found for ID: {proteome_id}\n")
+            return proteome_id, None
+        return proteome_id, output_filename
 
-                    seq = item["extra_fields"]["sequence"]
-                    for fasta_seq_fragment in [seq[i:i+LINE_LENGTH] for i in range(0, len(seq), LINE_LENGTH)]:
-                        out_file.write(fasta_seq_fragment + "\n")
-                
-                if next:
-                    sleep(1)
+    downloads = _ordered_map(fetch, proteome_ids, max_workers)
+    return {proteome_id: filename for proteome_id, filename in downloads if filename is not None}
 
 
-def fetch_entries(database: str, accession_number: str, output_directory):
+def fetch_entries(database: str, accession_number: str, output_directory, client: InterProClient = None, compression: str = None, progress=None, dry_run: bool = False, index: bool = False):
     """
     Fetch sequences based on the given a databse and accession number and save them to FASTA file.
     Accession numbers might be from different databases and different types (families, domains, etc).
@@ -578,63 +754,115 @@ def fetch_entries(database: str, accession_number: str, output_directory):
     Args:
         accession_numbers (list): list of accession numbers to fetch.
         output_directory (str): directory to save the sequences.
-    """
-    # https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/pfam/PF00003/
-    # https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/InterPro/IPR000006/
-    # BASE_URL = "https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/ncbifam/NF033510/?page_size=200&extra_fields=sequence"
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        compression (str, optional): compress the FASTA file with "gzip" or "bgzf" (saved as .fasta.gz). Defaults to None.
+        progress (callable, optional): called with a Progress after every page, e.g. ``print_progress``. Defaults to None.
+        dry_run (bool, optional): only return the number of sequences and the estimated number of requests and seconds, without downloading. Defaults to False.
+        index (bool, optional): also write a samtools faidx index (.fai, plus .gzi with "bgzf" compression) while downloading, for random access with ``index_fasta``. Not available with "gzip" compression. Defaults to False.
 
-    HEADER_SEPARATOR = "|"
-    LINE_LENGTH = 80
+    Returns:
+        dict: the dry_run summary, or None.
+    """
+    client = client or get_default_client()
+    retry_state = client.retry.start()
+    sink_class = _fasta_sink(compression, index)
+    url = _entry_sequences_url(database, accession_number)
+    try:
+        if dry_run:
+            return _plan(url, client, retry_state=retry_state)
+        print("Downloading " + accession_number + "...")
+        output_filename = _fasta_filename(output_directory, accession_number, compression)
+        _paginate_to_file(url, client, sink_class, output_filename, compression, stream=True, progress=_progress(accession_number, progress), retry_state=retry_state)
+    except HTTPError as e:
+        if e.code == 404:
+            sys.stderr.write(f"WARNING: No data found for ID: {accession_number}\n")
+            sys.exit()
+        raise e
+
+
+def fetch_entries_bulk(entries, output_directory, client: InterProClient = None, compression: str = None, max_workers: int = 4, checkpoint=None, progress=None, dry_run: bool = False, index: bool = False):
+    """
+    Fetch the sequences of many entries and save them to one FASTA file per entry.
 
-    context = ssl._create_unverified_context()
-    not_found = 0
+    The protein count of every entry is requested first (one small request
+    each), and the downloads are scheduled on max_workers threads, smallest
+    known entry first, so that the many small entries are finished early
+    instead of waiting behind a few large ones. All requests share the rate
+    limiter and connection pool of the client, while every entry has its
+    own retry budget.
 
-    BASE_URL = f"https://www.ebi.ac.uk:443/interpro/api/protein/UniProt/entry/{database}/{accession_number}/?page_size=200&extra_fields=sequence"
-    context = ssl._create_unverified_context()
+    A failed entry (e.g. not found, a malformed page or an error writing
+    its file) is reported with a warning and recorded in the returned
+    failures; the other entries carry on.
 
-    next = BASE_URL
-    last_page = False 
-    print("Downloading " + accession_number + "...")
+    Args:
+        entries (iterable): (database, accession number) pairs, e.g. ``[("pfam", "PF00003"), ("InterPro", "IPR000001")]``.
+        output_directory (str): directory to save the sequences.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        compression (str, optional): compress the FASTA files with "gzip" or "bgzf" (saved as .fasta.gz). Defaults to None.
+        max_workers (int, optional): number of entries downloaded concurrently. Defaults to 4.
+        checkpoint (str or Checkpoint, optional): checkpoint file used to resume interrupted downloads. Defaults to None.
+        progress (callable, optional): called with a Progress after every page of every entry, from the worker threads. Defaults to None.
+        dry_run (bool, optional): only request the protein counts and return the dry_run summary of each entry instead of a file name. Defaults to False.
+        index (bool, optional): also write a samtools faidx index (.fai, plus .gzi with "bgzf" compression) while downloading, for random access with ``index_fasta``. Not available with "gzip" compression. Defaults to False.
 
-    while next:
-        try:
-            req = request.Request(next)
-            res = request.urlopen(req, context = context)
-            if res.status == 408:
-                sleep(61)
-                continue
-            elif res.status == 204:
+    Returns:
+        tuple: dict of the written file (or the dry_run summary) for each (database, accession) pair, and dict of the exception for each failed pair.
+    """
+    client = client or get_default_client()
+    checkpoint = _as_checkpoint(checkpoint)
+    sink_class = _fasta_sink(compression, index)
+    entries = iter(dict.fromkeys(tuple(entry) for entry in entries))
+    written = {}
+    failures = {}
+
+    def download(database, accession_number, count):
+        print("Downloading " + accession_number + "...")
+        output_filename = _fasta_filename(output_directory, accession_number, compression)
+        _paginate_to_file(_entry_sequences_url(database, accession_number), client, sink_class, output_filename, compression, checkpoint=checkpoint, stream=True, progress=_progress(accession_number, progress, count))
+        return output_filename
+
+    def fail(entry, error):
+        sys.stderr.write(f"WARNING: Failed to fetch {entry[1]} from {entry[0]}: {error}\n")
+        failures[entry] = error
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        sizes = {}
+        running = {}
+        queue = []
+        order = 0
+        exhausted = False
+        while True:
+            # Keep a window of size requests ahead of the downloads
+            while not exhausted and len(sizes) + len(queue) < 4 * max_workers:
+                entry = next(entries, None)
+                if entry is None:
+                    exhausted = True
+                else:
+                    sizes[executor.submit(_query_count, _entry_sequences_url(*entry), client)] = entry
+            while queue and len(running) < max_workers:
+                count, _, entry = heapq.heappop(queue)
+                running[executor.submit(download, *entry, count)] = entry
+            if not sizes and not running:
                 break
-            payload = json.loads(res.read().decode())
-            next = payload["next"]
-            attempts = 0
-            if not next:
-                last_page = True 
-        except HTTPError as e:
-            if e.code == 400:
-                sleep(61)
-                continue
-            elif e.code == 404:
-                sys.stderr.write(f"WARNING: No data found for ID: {accession_number}\n")
-                sys.exit()
-            else:
-                if attempts < 3:
-                    attempts += 1
-                    sleep(61)
-                    continue
+            done, _ = wait(list(sizes) + list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in sizes:
+                    entry = sizes.pop(future)
+                    try:
+                        count = future.result()
+                    except Exception as e:
+                        fail(entry, e)
+                        continue
+                    if dry_run:
+                        written[entry] = _plan(None, client, count)
+                    else:
+                        heapq.heappush(queue, (count, order, entry))
+                        order += 1
                 else:
-                    sys.stderr.write("LAST URL: " + next)
-                    raise e
-        except Exception as e:
-            sys.stderr.write("LAST URL: " + next)
-            raise e
-
-        with open(os.path.join(output_directory, accession_number + ".fasta"), "w+") as out_file:
-            for i, item in enumerate(payload["results"]):             
-                        out_file.write(">" + item["metadata"]["accession"] + HEADER_SEPARATOR + item["metadata"]["name"] + "\n")
-                        seq = item["extra_fields"]["sequence"]
-                        for fasta_seq_fragment in [seq[i:i+LINE_LENGTH] for i in range(0, len(seq), LINE_LENGTH)]:
-                            out_file.write(fasta_seq_fragment + "\n")
-                
-        if next:
-            sleep(1)
+                    entry = running.pop(future)
+                    try:
+                        written[entry] = future.result()
+                    except Exception as e:
+                        fail(entry, e)
+    return written, failures
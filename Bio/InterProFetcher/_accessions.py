@@ -0,0 +1,298 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Compact integer-encoded storage of accession numbers (PRIVATE)."""
+
+import bisect
+import sys
+
+from array import array
+
+
+_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# Code 0 pads short accessions, so shorter accessions sort first.
+_BASE = len(_ALPHABET) + 1
+_WIDTH = 12
+_VALUES = {char: value for value, char in enumerate(_ALPHABET, 1)}
+# 37 ** 12 < 2 ** 63, so the top bit is free to mark lowercase accessions
+_LOWERCASE = 1 << 63
+
+
+def encode_accession(accession: str) -> int:
+    """Return the 64 bit code of an accession of up to 12 letters and digits.
+
+    Letters must be all uppercase (UniProt, InterPro, member databases,
+    proteomes) or all lowercase (PDB). Codes of accessions of the same
+    case sort like the accessions, and every lowercase (PDB) code sorts
+    after all the uppercase ones, e.g. "P12345" before "1abc".
+    """
+    code = 0
+    if accession.islower():
+        flag = _LOWERCASE
+        accession = accession.upper()
+    else:
+        flag = 0
+    if len(accession) > _WIDTH:
+        raise ValueError(f"Accession {accession!r} is longer than {_WIDTH} characters")
+    try:
+        for char in accession:
+            code = code * _BASE + _VALUES[char]
+    except KeyError:
+        raise ValueError(f"Cannot encode accession {accession!r}: only letters of one case and digits are supported") from None
+    return (code * _BASE ** (_WIDTH - len(accession))) | flag
+
+
+def decode_accession(code: int) -> str:
+    """Return the accession encoded by encode_accession."""
+    chars = []
+    value = code & ~_LOWERCASE
+    for _ in range(_WIDTH):
+        value, digit = divmod(value, _BASE)
+        if digit:
+            chars.append(_ALPHABET[digit - 1])
+    accession = "".join(reversed(chars))
+    return accession.lower() if code & _LOWERCASE else accession
+
+
+def _merge_codes(left, right, keep_left, keep_both, keep_right, codes):
+    """Merge two sorted sequences without duplicates into codes, returned (PRIVATE).
+
+    The keep flags tell whether values only in left, in both, or only in
+    right are kept, so one linear pass gives the union, intersection or
+    difference.
+    """
+    i = j = 0
+    left_length = len(left)
+    right_length = len(right)
+    while i < left_length and j < right_length:
+        a = left[i]
+        b = right[j]
+        if a < b:
+            if keep_left:
+                codes.append(a)
+            i += 1
+        elif b < a:
+            if keep_right:
+                codes.append(b)
+            j += 1
+        else:
+            if keep_both:
+                codes.append(a)
+            i += 1
+            j += 1
+    if keep_left:
+        codes.extend(left[i:])
+    if keep_right:
+        codes.extend(right[j:])
+    return codes
+
+
+class AccessionArray:
+    """Memory efficient list of UniProt, PDB, InterPro or proteome accessions.
+
+    Every accession is stored as one 64 bit integer, 8 bytes instead of
+    about 60 for a Python string, and is converted back to a string only
+    when it is read. Build one straight from a streaming query to hold
+    millions of accessions without ever creating the list of strings::
+
+        from Bio.InterProFetcher import AccessionArray, iter_proteins
+        proteins = AccessionArray(iter_proteins("pfam", "homo sapiens"))
+
+    An AccessionArray can be passed wherever the InterProFetcher functions
+    expect a list of accessions. Membership tests are a binary search once
+    the array is sorted (``sort`` or ``unique``) and a fast scan otherwise.
+
+    Accessions which cannot be encoded, such as CATH-Gene3D
+    ("G3DSA:3.40.50.300") or PANTHER subfamilies ("PTHR10000:SF12"), are
+    accepted too: the array then keeps all its accessions as a plain list
+    of strings, with the same behaviour but no memory saving.
+
+    Args:
+        accessions (iterable, optional): accession numbers.
+    """
+
+    def __init__(self, accessions=()):
+        last = []
+
+        def encode(accession):
+            last[:] = [accession]
+            return encode_accession(accession)
+
+        accessions = iter(accessions)
+        self.codes = array("Q")
+        try:
+            self.codes.extend(map(encode, accessions))
+        except ValueError:
+            # The accession that failed was consumed, add it back
+            self._expand()
+            self.codes.extend(last)
+            self.codes.extend(accessions)
+        self._sorted = len(self.codes) < 2
+
+    @classmethod
+    def _from_codes(cls, codes, is_sorted=False):
+        accessions = cls()
+        accessions.codes = codes
+        accessions._sorted = is_sorted or len(codes) < 2
+        return accessions
+
+    @property
+    def _compact(self):
+        return isinstance(self.codes, array)
+
+    def _expand(self):
+        """Switch to storing the accessions as a list of strings (PRIVATE)."""
+        if self._compact:
+            self.codes = list(map(decode_accession, self.codes))
+            # PDB codes sort after the uppercase accessions, strings do not
+            self._sorted = len(self.codes) < 2
+
+    def _encode(self, accession):
+        return encode_accession(accession) if self._compact else accession
+
+    def _decode(self, code):
+        return decode_accession(code) if self._compact else code
+
+    @classmethod
+    def frombytes(cls, data: bytes):
+        """Rebuild an AccessionArray from the output of tobytes."""
+        codes = array("Q")
+        codes.frombytes(data)
+        return cls._from_codes(codes)
+
+    def tobytes(self) -> bytes:
+        """Return the encoded accessions as bytes, e.g. to save them to a file.
+
+        Raises ValueError if the array holds accessions which cannot be encoded.
+        """
+        if not self._compact:
+            raise ValueError("This AccessionArray holds accessions which cannot be encoded")
+        return self.codes.tobytes()
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the encoded accessions."""
+        if not self._compact:
+            return sys.getsizeof(self.codes) + sum(map(sys.getsizeof, self.codes))
+        return self.codes.itemsize * len(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        if not self._compact:
+            return iter(self.codes)
+        return map(decode_accession, self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._from_codes(self.codes[index], self._sorted and (index.step or 1) > 0)
+        return self._decode(self.codes[index])
+
+    def __contains__(self, accession):
+        try:
+            code = self._encode(accession)
+        except (TypeError, ValueError):
+            return False
+        if self._sorted:
+            i = bisect.bisect_left(self.codes, code)
+            return i < len(self.codes) and self.codes[i] == code
+        return code in self.codes
+
+    def __eq__(self, other):
+        if isinstance(other, AccessionArray):
+            if self._compact != other._compact:
+                return list(self) == list(other)
+            return self.codes == other.codes
+        return NotImplemented
+
+    def __repr__(self):
+        preview = ", ".join(repr(accession) for accession in self[:3])
+        more = ", ..." if len(self) > 3 else ""
+        return f"AccessionArray([{preview}{more}])"
+
+    def append(self, accession: str):
+        """Add an accession at the end."""
+        try:
+            code = self._encode(accession)
+        except ValueError:
+            self._expand()
+            code = accession
+        if self._sorted and self.codes and code < self.codes[-1]:
+            self._sorted = False
+        self.codes.append(code)
+
+    def extend(self, accessions):
+        """Add accessions at the end."""
+        for accession in accessions:
+            self.append(accession)
+
+    def _sorted_codes(self):
+        """Return the codes in sorted order, without sorting in place (PRIVATE)."""
+        if self._sorted:
+            return self.codes
+        if not self._compact:
+            return sorted(self.codes)
+        return array("Q", sorted(self.codes))
+
+    def sort(self):
+        """Sort the accessions in place.
+
+        Encoded accessions are in string order, except that PDB IDs come
+        after all the uppercase accessions (see ``encode_accession``).
+        Arrays holding accessions which cannot be encoded are in string order.
+        """
+        if not self._sorted:
+            self.codes = self._sorted_codes()
+            self._sorted = True
+
+    def unique(self):
+        """Return a new sorted AccessionArray without duplicates."""
+        codes = array("Q") if self._compact else []
+        previous = None
+        for code in self._sorted_codes():
+            if code != previous:
+                codes.append(code)
+                previous = code
+        return self._from_codes(codes, True)
+
+    def _combine(self, other, keep_left, keep_both, keep_right):
+        if not isinstance(other, AccessionArray):
+            other = AccessionArray(other)
+        left = self.unique()
+        right = other.unique()
+        if left._compact != right._compact:
+            # Compare as strings, re-sorted as the code order may differ
+            left = AccessionArray._from_codes(sorted(left))
+            right = AccessionArray._from_codes(sorted(right))
+        codes = array("Q") if left._compact else []
+        return self._from_codes(_merge_codes(left.codes, right.codes, keep_left, keep_both, keep_right, codes), True)
+
+    def union(self, other):
+        """Return the sorted accessions found in either array (or iterable of accessions)."""
+        return self._combine(other, True, True, True)
+
+    def intersection(self, other):
+        """Return the sorted accessions found in both arrays."""
+        return self._combine(other, False, True, False)
+
+    def difference(self, other):
+        """Return the sorted accessions of this array missing from the other."""
+        return self._combine(other, True, False, False)
+
+    def __or__(self, other):
+        if not hasattr(other, "__iter__"):
+            return NotImplemented
+        return self.union(other)
+
+    def __and__(self, other):
+        if not hasattr(other, "__iter__"):
+            return NotImplemented
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        if not hasattr(other, "__iter__"):
+            return NotImplemented
+        return self.difference(other)
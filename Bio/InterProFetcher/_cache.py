@@ -0,0 +1,184 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Persistent on-disk cache of InterPro API responses (PRIVATE)."""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from http.client import HTTPMessage
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+# Response headers kept alongside the cached body.
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+# Fraction of max_size left after an eviction, so that a full cache does
+# not scan its directory again on every put.
+_LOW_WATER = 0.9
+
+
+def _normalise_url(url):
+    """Return a canonical form of url used as cache key (PRIVATE).
+
+    Scheme and host are lowercased, default ports are dropped and query
+    parameters are sorted, so equivalent URLs share one cache entry.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ""
+    if parts.port and parts.port != {"http": 80, "https": 443}.get(scheme):
+        netloc += ":%d" % parts.port
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{scheme}://{netloc}{parts.path or '/'}?{query}"
+
+
+class _CacheEntry:
+    """A cached response read back from disk (PRIVATE)."""
+
+    def __init__(self, url, status, headers, stored, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.stored = stored
+        self.body = body
+
+    def validators(self):
+        """Return the conditional request headers for revalidation."""
+        validators = {}
+        if "ETag" in self.headers:
+            validators["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            validators["If-Modified-Since"] = self.headers["Last-Modified"]
+        return validators
+
+    def http_headers(self):
+        message = HTTPMessage()
+        for name, value in self.headers.items():
+            message[name] = value
+        return message
+
+
+class ResponseCache:
+    """Size-capped on-disk cache of HTTP responses with TTL and revalidation.
+
+    Each response body is stored gzip compressed in its own file under
+    ``directory``, keyed on the normalised request URL. Entries younger than
+    ``ttl`` seconds are served without any network traffic; older entries
+    are revalidated with ``If-None-Match``/``If-Modified-Since`` and reused
+    when the server answers 304 Not Modified. When the files exceed
+    ``max_size`` bytes in total, the least recently used entries are removed
+    until they are back under 90% of ``max_size``.
+
+    Pass an instance as the ``cache`` argument of ``InterProClient`` to
+    enable it.
+
+    Args:
+        directory (str): directory holding the cache files, created if needed.
+        ttl (float, optional): seconds during which an entry is used without revalidation. Defaults to one day.
+        max_size (int, optional): maximum total size of the cache files in bytes. Defaults to 1 GiB.
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 60 * 60, max_size: int = 1 << 30):
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, url):
+        key = hashlib.sha256(_normalise_url(url).encode()).hexdigest()
+        return os.path.join(self.directory, key + ".gz")
+
+    def get(self, url: str):
+        """Return the cached entry for url, or None.
+
+        Reading an entry marks it as recently used.
+        """
+        path = self._path(url)
+        try:
+            with gzip.open(path, "rb") as handle:
+                meta = json.loads(handle.readline())
+                body = handle.read()
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            # Missing, evicted meanwhile or truncated: treat as a miss.
+            return None
+        return _CacheEntry(meta["url"], meta["status"], meta["headers"], meta["stored"], body)
+
+    def is_fresh(self, entry) -> bool:
+        """Check whether entry may be used without revalidation."""
+        return time.time() - entry.stored < self.ttl
+
+    def put(self, url: str, status: int, headers, body: bytes, stored: float = None):
+        """Store a response body and its validators."""
+        meta = {
+            "url": url,
+            "status": status,
+            "headers": {name: headers[name] for name in _STORED_HEADERS if headers.get(name)},
+            "stored": time.time() if stored is None else stored,
+        }
+        path = self._path(url)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as handle:
+                handle.write(json.dumps(meta).encode() + b"\n")
+                handle.write(body)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                total = self._current_size()
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._size = total - old_size + size
+                if self._size > self.max_size:
+                    self._evict()
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def refresh(self, url: str, entry):
+        """Restart the TTL of an entry the server reported as not modified."""
+        self.put(url, entry.status, entry.headers, entry.body)
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".gz"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _current_size(self):
+        # Computed once from disk, then maintained incrementally.
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def _evict(self):
+        """Remove least recently used entries until under the low-water mark (PRIVATE)."""
+        target = self.max_size * _LOW_WATER
+        for _, size, path in sorted(self._entries()):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self._lock:
+            for _, _, path in list(self._entries()):
+                os.remove(path)
+            self._size = 0
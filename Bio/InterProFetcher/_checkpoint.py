@@ -0,0 +1,53 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Checkpoint file for resuming long InterPro paginations (PRIVATE)."""
+
+import json
+import os
+import tempfile
+import threading
+
+
+class Checkpoint:
+    """JSON file recording how far each paginated download has got.
+
+    A job is identified by its output file. For every job the checkpoint
+    keeps the URL of the first page, the ``next`` cursor URL still to be
+    fetched and the byte offset of the output file once all earlier pages
+    were written. A rerun with the same checkpoint truncates the output to
+    that offset and continues from the recorded cursor, so no line is lost
+    or written twice. A job whose ``next`` is None has completed.
+
+    Args:
+        path (str): path of the checkpoint file, created on first update.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as handle:
+                self._jobs = json.load(handle)
+        except FileNotFoundError:
+            self._jobs = {}
+
+    def get(self, job: str, url: str):
+        """Return the recorded state of job, or None if it was not started with url."""
+        with self._lock:
+            state = self._jobs.get(os.path.abspath(job))
+        if state is None or state["url"] != url:
+            return None
+        return dict(state)
+
+    def update(self, job: str, url: str, next: str, start: int, offset: int):
+        """Record that the pages before next are safely written up to offset."""
+        with self._lock:
+            self._jobs[os.path.abspath(job)] = {"url": url, "next": next, "start": start, "offset": offset}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as handle:
+                json.dump(self._jobs, handle, indent=1)
+            os.replace(tmp_path, self.path)
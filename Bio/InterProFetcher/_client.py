@@ -0,0 +1,507 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Pooled HTTPS client shared by the InterProFetcher functions (PRIVATE)."""
+
+import contextlib
+import functools
+import gzip
+import http.client
+import io
+import json
+import ssl
+import threading
+import time
+
+from urllib.error import URLError, HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from ._cache import ResponseCache
+from ._metrics import _current_event, _detached, _instrument, _timed_create_connection
+from ._ratelimit import RateLimiter
+from ._retry import RetryPolicy
+
+
+# Errors raised when the server has silently closed a kept-alive connection.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Statuses telling us to slow down.
+_OVERLOAD_CODES = (408, 429)
+_MAX_REDIRECTS = 5
+
+
+class _Response:
+    """Fully read HTTP response (PRIVATE).
+
+    Mimics the parts of ``http.client.HTTPResponse`` used by InterProFetcher
+    (``status``, ``headers``, ``url`` and ``read()``) so the body can be
+    consumed after the connection went back to the pool.
+    """
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._body = body
+
+    def read(self):
+        return self._body
+
+    def json(self):
+        # json.loads detects the encoding of bytes itself, saving a copy
+        return json.loads(self._body)
+
+
+class _Call:
+    """Outcome of a call shared by _SingleFlight (PRIVATE)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SingleFlight:
+    """Let concurrent identical calls share one execution (PRIVATE)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """Return the result of function() and whether it was shared.
+
+        If a call with the same key is already running in another thread,
+        wait for it and return (or raise) its outcome instead of calling
+        function.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def _flight_key(kind, url, headers):
+    return kind, url, tuple(sorted(headers.items())) if headers else ()
+
+
+class InterProClient:
+    """Thread-safe HTTPS client keeping persistent connections to InterPro and RCSB.
+
+    Every InterProFetcher function accepts a ``client`` argument. When it is
+    omitted a module-wide client is used, so consecutive calls (and threads)
+    reuse the same kept-alive TCP/TLS connections to www.ebi.ac.uk and
+    files.rcsb.org instead of doing a handshake for every page.
+
+    All requests sent by a client, from any thread, spend tokens from the
+    same ``rate_limiter``, which slows down on HTTP 408/429 responses and
+    speeds up again while responses are healthy. Transient failures are
+    retried following the ``retry`` policy.
+
+    Every request is timed and reported to the ``hooks`` as a
+    ``RequestEvent`` once it is finished, with its DNS, connect, TTFB,
+    transfer and decode times, bytes, status, retries and sleeps. A
+    ``Metrics`` object is a ready-made hook aggregating them.
+
+    Identical requests made at the same time by several threads are sent
+    only once when ``coalesce`` is on: the other callers wait for the
+    response (or error) of the first one. With ``get_json`` they also share
+    the decoded object, which must then be treated as read-only.
+
+    Args:
+        max_connections (int, optional): maximum number of idle connections kept per host. Defaults to 8.
+        timeout (float, optional): socket timeout in seconds. Defaults to 60.
+        context (ssl.SSLContext, optional): SSL context used for HTTPS connections. Defaults to an unverified context.
+        rate_limiter (RateLimiter, optional): request budget shared by all requests of the client. Defaults to ``RateLimiter()``.
+        cache (ResponseCache, optional): on-disk cache of successful responses. Defaults to no caching.
+        retry (RetryPolicy, optional): which failures are retried and how long to wait. Defaults to ``RetryPolicy()``.
+        hooks (list, optional): callables called with a RequestEvent after every request, from the thread which made it. Defaults to none.
+        coalesce (bool, optional): share one request between concurrent identical requests. Defaults to True.
+    """
+
+    def __init__(self, max_connections: int = 8, timeout: float = 60, context: ssl.SSLContext = None, rate_limiter: RateLimiter = None, cache: ResponseCache = None, retry: RetryPolicy = None, hooks: list = None, coalesce: bool = True):
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        if context is None:
+            context = ssl._create_unverified_context()
+        self.context = context
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        if retry is None:
+            retry = RetryPolicy()
+        self.retry = retry
+        self.hooks = list(hooks or ())
+        self.coalesce = coalesce
+        self._flights = _SingleFlight()
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close all idle connections held by the client."""
+        with self._lock:
+            pools = self._pools
+            self._pools = {}
+        for connections in pools.values():
+            for connection in connections:
+                connection.close()
+
+    def _new_connection(self, scheme, host, port):
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self.context)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        connection._create_connection = _timed_create_connection
+        return connection
+
+    def _get_connection(self, key):
+        """Return an idle pooled connection for key, or a new one (PRIVATE)."""
+        with self._lock:
+            connections = self._pools.get(key)
+            if connections:
+                return connections.pop(), True
+        return self._new_connection(*key), False
+
+    def _put_connection(self, key, connection):
+        """Return a connection to the pool, closing it if the pool is full (PRIVATE)."""
+        with self._lock:
+            connections = self._pools.setdefault(key, [])
+            if len(connections) < self.max_connections:
+                connections.append(connection)
+                return
+        connection.close()
+
+    @staticmethod
+    def _split(url):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return (scheme, parts.hostname, port), path
+
+    def _open(self, url, headers):
+        """Send a single GET request over a pooled connection (PRIVATE).
+
+        Returns the pool key, the connection and the response whose body is
+        still unread. A reused connection which turns out to be closed by the
+        server is discarded and the request is sent once more on a fresh
+        connection.
+        """
+        key, path = self._split(url)
+        request_headers = {"Connection": "keep-alive"}
+        if headers:
+            request_headers.update(headers)
+        event = _current_event()
+        while True:
+            connection, reused = self._get_connection(key)
+            try:
+                if event is not None:
+                    if not reused:
+                        event.new_connections += 1
+                        dns = event.dns
+                        start = time.perf_counter()
+                        connection.connect()
+                        event.connect += time.perf_counter() - start - (event.dns - dns)
+                    start = time.perf_counter()
+                connection.request("GET", path, headers=request_headers)
+                response = connection.getresponse()
+                if event is not None:
+                    event.ttfb += time.perf_counter() - start
+                    event.status = response.status
+                return key, connection, response
+            except _STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+    def _release(self, key, connection, response):
+        """Return the connection to the pool if its response was fully read (PRIVATE)."""
+        if response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self._put_connection(key, connection)
+
+    def _send(self, url, headers):
+        """Send a single GET request and read the whole body (PRIVATE).
+
+        The body is requested gzip compressed, which shrinks InterPro JSON
+        pages several fold on the wire, and decompressed here.
+        """
+        request_headers = {"Accept-Encoding": "gzip"}
+        if headers:
+            request_headers.update(headers)
+        key, connection, response = self._open(url, request_headers)
+        event = _current_event()
+        start = time.perf_counter()
+        try:
+            body = response.read()
+        except BaseException:
+            connection.close()
+            raise
+        self._release(key, connection, response)
+        if event is not None:
+            event.transfer += time.perf_counter() - start
+            event.bytes += len(body)
+        if response.headers.get("Content-Encoding") == "gzip":
+            start = time.perf_counter()
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError) as e:
+                raise URLError(e) from e
+            if event is not None:
+                event.decode += time.perf_counter() - start
+        return _Response(url, response.status, response.reason, response.headers, body)
+
+    def _adapt(self, status):
+        """Feed the status of a response back to the rate limiter (PRIVATE)."""
+        if status in _OVERLOAD_CODES:
+            self.rate_limiter.penalize()
+        elif status < 400:
+            self.rate_limiter.reward()
+
+    def request(self, url: str, headers: dict = None, retry_state=None):
+        """Send a GET request and return the fully read response.
+
+        Waits for the rate limiter first and follows redirects. The body is
+        transferred gzip compressed when the server supports it and returned
+        decompressed. If the client has a cache, fresh cached responses are
+        returned without a request and stale ones are revalidated. Like
+        ``urllib.request.urlopen``, HTTP error statuses raise
+        ``urllib.error.HTTPError`` and network failures raise
+        ``urllib.error.URLError`` once the retry policy gives up.
+
+        Args:
+            url (str): URL to fetch.
+            headers (dict, optional): extra request headers.
+            retry_state (optional): retry bookkeeping shared by the requests of one job, from ``client.retry.start()``. Defaults to a new one per request.
+
+        Returns:
+            response object with ``status``, ``headers``, ``url`` and ``read()``.
+        """
+        return self._request(url, headers, False, retry_state)
+
+    def _retrying(self, call, retry_state):
+        """Call call(first_try) until it succeeds or the retry policy gives up (PRIVATE)."""
+        if retry_state is None:
+            retry_state = self.retry.start()
+        attempt = 0
+        while True:
+            try:
+                return call(attempt == 0)
+            except URLError as e:
+                delay = retry_state.delay(attempt, e)
+                if delay is None:
+                    raise
+            attempt += 1
+            event = _current_event()
+            if event is not None:
+                event.attempts = attempt + 1
+                event.sleep += delay
+            time.sleep(delay)
+
+    def _request(self, url, headers, reserved, retry_state=None, retry=True):
+        """Send a GET request, retrying transient failures (PRIVATE).
+
+        If reserved is True the caller has already waited for a rate limiter
+        token for the first request (e.g. with ``await asyncio.sleep``).
+        With retry False a single try is made.
+        """
+        with _instrument(self.hooks, url) as event:
+            if not retry:
+                call = functools.partial(self._cached_fetch, url, headers, reserved)
+            else:
+                call = functools.partial(self._retrying, lambda first: self._cached_fetch(url, headers, reserved and first), retry_state)
+            if not self.coalesce:
+                return call()
+            response, shared = self._flights.do(_flight_key("request", url, headers), call)
+            if shared and event is not None:
+                event.coalesced = True
+                event.status = response.status
+            return response
+
+    def _cached_fetch(self, url, headers, reserved):
+        """Answer a GET request from the cache or the network (PRIVATE)."""
+        if self.cache is None:
+            return self._fetch(url, headers, reserved)
+        event = _current_event()
+        entry = self.cache.get(url)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                if event is not None:
+                    event.cached = True
+                    event.status = entry.status
+                return _Response(url, entry.status, "OK", entry.http_headers(), entry.body)
+            headers = dict(headers or {}, **entry.validators())
+        response = self._fetch(url, headers, reserved)
+        if response.status == 304 and entry is not None:
+            if event is not None:
+                event.cached = True
+            self.cache.refresh(url, entry)
+            return _Response(url, entry.status, "OK", entry.http_headers(), entry.body)
+        if response.status == 200:
+            self.cache.put(url, response.status, response.headers, response.read())
+        return response
+
+    def _acquire(self):
+        """Wait for a rate limiter token, recording the wait (PRIVATE)."""
+        event = _current_event()
+        if event is None:
+            self.rate_limiter.acquire()
+            return
+        start = time.perf_counter()
+        self.rate_limiter.acquire()
+        event.wait += time.perf_counter() - start
+
+    def _fetch(self, url, headers, reserved):
+        """Send a GET request, following redirects (PRIVATE)."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            if reserved:
+                reserved = False
+            else:
+                self._acquire()
+            try:
+                response = self._send(url, headers)
+            except (http.client.HTTPException, OSError) as e:
+                raise URLError(e) from e
+            self._adapt(response.status)
+            if response.status in _REDIRECT_CODES and "Location" in response.headers:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(response.read()))
+            return response
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, io.BytesIO(response.read()))
+
+    @contextlib.contextmanager
+    def stream(self, url: str, headers: dict = None, retry_state=None, retry: bool = True):
+        """Send a GET request and give access to the response before its body is read.
+
+        Use as a context manager; the body can then be copied in chunks with
+        ``response.read(size)`` without holding it in memory. The connection
+        goes back to the pool on exit if the body was read completely.
+        Responses are never cached. Redirects, errors and retries are handled
+        as in ``request``, up to the moment the response is handed over.
+        With retry False a single try is made, for callers retrying the
+        whole transfer themselves.
+        """
+        with _instrument(self.hooks, url) as event:
+            if retry:
+                key, connection, response = self._retrying(lambda first: self._open_stream(url, headers), retry_state)
+            else:
+                key, connection, response = self._open_stream(url, headers)
+            start = time.perf_counter()
+            try:
+                with _detached():
+                    yield response
+            finally:
+                if event is not None:
+                    event.transfer += time.perf_counter() - start
+                    length = response.headers.get("Content-Length")
+                    event.bytes = int(length) if length and length.isdigit() else None
+                self._release(key, connection, response)
+
+    def _open_stream(self, url, headers):
+        """Send a GET request, following redirects, leaving the body unread (PRIVATE)."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            self._acquire()
+            try:
+                key, connection, response = self._open(url, headers)
+            except (http.client.HTTPException, OSError) as e:
+                raise URLError(e) from e
+            self._adapt(response.status)
+            redirect = response.status in _REDIRECT_CODES and "Location" in response.headers
+            if redirect or response.status >= 400:
+                try:
+                    body = response.read()
+                except (http.client.HTTPException, OSError) as e:
+                    connection.close()
+                    raise URLError(e) from e
+                self._release(key, connection, response)
+                if redirect:
+                    url = urljoin(url, response.headers["Location"])
+                    continue
+                raise HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(body))
+            return key, connection, response
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, io.BytesIO(body))
+
+    def get_json(self, url: str, headers: dict = None, retry_state=None):
+        """Fetch a URL and decode its JSON body.
+
+        Returns None for an empty (HTTP 204) response.
+        """
+        request_headers = {"Accept": "application/json"}
+        if headers:
+            request_headers.update(headers)
+        with _instrument(self.hooks, url) as event:
+            if not self.coalesce:
+                return self._get_json(url, request_headers, retry_state, event)
+            payload, shared = self._flights.do(_flight_key("json", url, request_headers), lambda: self._get_json(url, request_headers, retry_state, event))
+            if shared and event is not None:
+                event.coalesced = True
+            return payload
+
+    def _get_json(self, url, headers, retry_state, event):
+        response = self.request(url, headers, retry_state)
+        if response.status == 204:
+            return None
+        if event is None:
+            return response.json()
+        start = time.perf_counter()
+        payload = response.json()
+        event.decode += time.perf_counter() - start
+        return payload
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Return the InterProClient shared by all calls made without an explicit client."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = InterProClient()
+        return _default_client
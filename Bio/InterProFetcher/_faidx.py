@@ -0,0 +1,211 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""samtools faidx style indexes of InterProFetcher FASTA files (PRIVATE).
+
+A ``.fai`` file has one line per record: name, sequence length, offset of
+the sequence in the uncompressed file, bases per line and bytes per line.
+For BGZF compressed files a ``.gzi`` file maps the start of every BGZF
+block to its uncompressed offset: a little endian uint64 count followed
+by one (compressed offset, uncompressed offset) uint64 pair per block,
+the first block excluded. Both are written by ``FastaSink`` while the
+FASTA file is written, and read by ``FastaIndex``.
+"""
+
+import bisect
+import struct
+
+from collections.abc import Mapping
+
+from Bio import bgzf
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+
+def _record_name(header):
+    """Return the ID of a FASTA header line, as given as bytes (PRIVATE)."""
+    words = header[1:].split(None, 1)
+    return words[0].decode() if words else ""
+
+
+class _FaiBuilder:
+    """The .fai and .gzi entries of a FASTA file being written (PRIVATE)."""
+
+    def __init__(self):
+        self.records = []
+        # (compressed offset, uncompressed offset) of the BGZF blocks
+        self.blocks = []
+        self.offset = 0
+
+    def add_record(self, header: bytes, length: int, line_length: int):
+        """Record a FASTA record written with line_length residues per line."""
+        name = _record_name(header)
+        linebases = min(length, line_length) or line_length
+        sequence_offset = self.offset + len(header)
+        self.records.append((name, length, sequence_offset, linebases, linebases + 1))
+        self.offset = sequence_offset + length + -(-length // line_length)
+
+    def scan(self, lines):
+        """Record the FASTA records of lines of bytes, e.g. the output of an earlier run read from a file."""
+        record = None
+        position = 0
+        for line in lines:
+            if line.startswith(b">"):
+                if record is not None:
+                    self.records.append(tuple(record))
+                record = [_record_name(line), 0, position + len(line), 0, 0]
+            elif record is not None and line.strip():
+                if not record[3]:
+                    record[3] = len(line.rstrip(b"\r\n"))
+                    record[4] = len(line)
+                record[1] += len(line.rstrip(b"\r\n"))
+            position += len(line)
+        if record is not None:
+            self.records.append(tuple(record))
+        self.offset = position
+
+    def write(self, filename: str):
+        """Write the .fai index of filename, and its .gzi index if blocks were recorded."""
+        with open(filename + ".fai", "w") as handle:
+            for name, length, offset, linebases, linewidth in self.records:
+                handle.write(f"{name}\t{length}\t{offset}\t{linebases}\t{linewidth}\n")
+        if self.blocks:
+            blocks = [block for block in self.blocks if block[0] > 0]
+            with open(filename + ".gzi", "wb") as handle:
+                handle.write(struct.pack("<Q", len(blocks)))
+                handle.write(b"".join(struct.pack("<QQ", *block) for block in blocks))
+
+
+class _IndexingBgzfWriter(bgzf.BgzfWriter):
+    """BgzfWriter recording where every block starts (PRIVATE)."""
+
+    def __init__(self, fileobj, blocks, uncompressed=0):
+        super().__init__(fileobj=fileobj)
+        self.blocks = blocks
+        self.uncompressed = uncompressed
+
+    def _write_block(self, block):
+        # Empty blocks, written by flush, hold no data to look up
+        if block:
+            self.blocks.append((self._handle.tell(), self.uncompressed))
+            self.uncompressed += len(block)
+        super()._write_block(block)
+
+
+def _scan_blocks(filename):
+    """Return the (compressed, uncompressed) offsets of the BGZF blocks of a file (PRIVATE)."""
+    blocks = []
+    uncompressed = 0
+    with open(filename, "rb") as handle:
+        for start, _, _, data_length in bgzf.BgzfBlocks(handle):
+            if data_length:
+                blocks.append((start, uncompressed))
+                uncompressed += data_length
+    return blocks
+
+
+class FastaIndex(Mapping):
+    """Read-only dictionary of the records of an indexed FASTA file.
+
+    Works like ``Bio.SeqIO.index(filename, "fasta")``: keys are record IDs
+    (the header up to the first space, e.g. "P69905|Hemoglobin"), values
+    are SeqRecords read on access, and ``get_raw`` returns a record as
+    bytes. Nothing is parsed up front: the record offsets come from the
+    ``.fai`` index and, for BGZF files, the block offsets from the ``.gzi``
+    index, so a lookup reads one record whatever the size of the file.
+
+    Args:
+        filename (str): FASTA file, plain or BGZF compressed, with its .fai index (and .gzi index if compressed).
+        key_function (callable, optional): maps record IDs to the keys, e.g. ``lambda name: name.split("|")[0]`` for accessions.
+    """
+
+    def __init__(self, filename: str, key_function=None):
+        self.filename = filename
+        self._records = {}
+        start = 0
+        with open(filename + ".fai") as handle:
+            for line in handle:
+                name, length, offset, linebases, linewidth = line.rstrip("\n").split("\t")
+                length, offset, linebases, linewidth = int(length), int(offset), int(linebases), int(linewidth)
+                lines = -(-length // linebases) if linebases else 0
+                end = offset + length + lines * (linewidth - linebases)
+                key = key_function(name) if key_function is not None else name
+                if key in self._records:
+                    raise ValueError(f"Duplicate key {key!r}")
+                # Headers start where the previous record ended
+                self._records[key] = (start, end)
+                start = end
+        with open(filename, "rb") as handle:
+            compressed = handle.read(2) == b"\x1f\x8b"
+        if compressed:
+            self._blocks = [(0, 0)] + self._read_gzi(filename)
+            self._starts = [uncompressed for _, uncompressed in self._blocks]
+            self._handle = bgzf.BgzfReader(filename, "rb")
+        else:
+            self._blocks = None
+            self._handle = open(filename, "rb")
+
+    @staticmethod
+    def _read_gzi(filename):
+        try:
+            with open(filename + ".gzi", "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return [block for block in _scan_blocks(filename) if block[0] > 0]
+        (count,) = struct.unpack_from("<Q", data)
+        return [struct.unpack_from("<QQ", data, 8 + 16 * i) for i in range(count)]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __repr__(self):
+        return f"FastaIndex({self.filename!r})"
+
+    def get_raw(self, key) -> bytes:
+        """Return the FASTA text of a record, header included, as bytes."""
+        start, end = self._records[key]
+        if self._blocks is not None:
+            block = bisect.bisect_right(self._starts, start) - 1
+            compressed, uncompressed = self._blocks[block]
+            self._handle.seek(bgzf.make_virtual_offset(compressed, start - uncompressed))
+        else:
+            self._handle.seek(start)
+        return self._handle.read(end - start)
+
+    def __getitem__(self, key) -> SeqRecord:
+        header, _, sequence = self.get_raw(key).decode().partition("\n")
+        title = header[1:].rstrip()
+        identifier = title.split(None, 1)[0] if title else ""
+        sequence = "".join(sequence.split())
+        return SeqRecord(Seq(sequence), id=identifier, name=identifier, description=title)
+
+    def close(self):
+        """Close the FASTA file."""
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def index_fasta(filename: str, key_function=None) -> FastaIndex:
+    """Open a FASTA file written with ``index=True`` for random access to its records.
+
+    Args:
+        filename (str): FASTA file, plain or BGZF compressed, with its .fai index (and .gzi index if compressed).
+        key_function (callable, optional): maps record IDs to the keys, e.g. ``lambda name: name.split("|")[0]`` for accessions.
+
+    Returns:
+        FastaIndex: read-only dictionary of SeqRecords, as returned by ``Bio.SeqIO.index``.
+    """
+    return FastaIndex(filename, key_function)
@@ -0,0 +1,211 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Incremental decoding of paginated InterPro JSON responses (PRIVATE).
+
+A page of an InterPro list endpoint is a JSON object such as::
+
+    {"count": 5210, "next": "https://...", "previous": null, "results": [...]}
+
+``iter_results`` walks such an object from a stream of text chunks and
+yields the items of the ``results`` array one at a time, as soon as each
+one is complete, so only one record needs to be held in memory instead of
+the raw page, its decoded text and the full object tree.
+"""
+
+import codecs
+import http.client
+import re
+import sys
+import time
+import zlib
+
+from json import JSONDecodeError, JSONDecoder
+from urllib.error import URLError
+
+
+_CHUNK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = JSONDecoder()
+# Errors raised while reading a response body after its headers arrived.
+_READ_ERRORS = (http.client.HTTPException, OSError, EOFError, zlib.error)
+
+
+class _TextBuffer:
+    """The not yet decoded part of a stream of text chunks (PRIVATE)."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = ""
+        self.pos = 0
+
+    def more(self, size=0):
+        """Append chunks until at least size more characters are buffered; False at the end."""
+        pending = [self.text[self.pos:]]
+        read = 0
+        for chunk in self.chunks:
+            pending.append(chunk)
+            read += len(chunk)
+            if read >= size:
+                break
+        self.text = "".join(pending)
+        self.pos = 0
+        return read > 0
+
+    def next_char(self):
+        """Return the next character after white space and step over it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                self.pos += 1
+                return self.text[self.pos - 1]
+            if not self.more():
+                raise JSONDecodeError("Unexpected end of data", self.text, self.pos)
+
+    def peek(self):
+        char = self.next_char()
+        self.pos -= 1
+        return char
+
+    def expect(self, expected):
+        char = self.next_char()
+        if char not in expected:
+            raise JSONDecodeError(f"Expected {expected!r}", self.text, self.pos - 1)
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except JSONDecodeError:
+                # Incomplete value: at least double the buffer before retrying,
+                # so a large record is not parsed again for every chunk.
+                if not self.more(len(self.text) - self.pos):
+                    raise
+                continue
+            # A number ending with the buffer may continue in the next chunk
+            if end == len(self.text) and self.more():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_results(chunks, fields):
+    """Yield the items of the results array of a JSON page given as text chunks.
+
+    The other members of the page are stored in the fields dict as they are
+    met; all of them are known once the iteration is finished.
+    """
+    buffer = _TextBuffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        key = buffer.value()
+        buffer.expect(":")
+        if key == "results" and buffer.peek() == "[":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.expect("]")
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.expect(",]") == "]":
+                        break
+        else:
+            fields[key] = buffer.value()
+        if buffer.expect(",}") == "}":
+            return
+
+
+def _text_chunks(response):
+    """Yield the body of an HTTP response as text, decompressing gzip (PRIVATE)."""
+    if response.headers.get("Content-Encoding") == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+    else:
+        decompressor = None
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        data = response.read(_CHUNK_SIZE)
+        if not data:
+            if response.length:
+                # read(size) does not complain when the server hangs up early
+                raise http.client.IncompleteRead(b"", response.length)
+            break
+        if decompressor is not None:
+            data = decompressor.decompress(data)
+        yield decoder.decode(data)
+    if decompressor is not None:
+        if not decompressor.eof:
+            raise EOFError("Compressed response ended before the end-of-stream marker")
+        yield decoder.decode(decompressor.flush())
+    yield decoder.decode(b"", final=True)
+
+
+class StreamedPage:
+    """One page of a paginated query, decoded while it is downloaded.
+
+    Behaves like the decoded page dict for the keys used during pagination:
+    ``page["results"]`` iterates over the results as they arrive, and the
+    other members (e.g. ``page["next"]``) are available once the results
+    were consumed. If the connection breaks in the middle of the page, the
+    page is requested again (following the retry policy) and the results
+    already handed out are skipped.
+    """
+
+    def __init__(self, client, url, retry_state):
+        self.client = client
+        self.url = url
+        self.retry_state = retry_state
+        # Number of results handed out so far
+        self.size = 0
+        self._fields = None
+
+    def __getitem__(self, key):
+        if key == "results":
+            return self._iter_results()
+        if self._fields is None:
+            raise RuntimeError("The results of a streamed page must be consumed first")
+        return self._fields[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _iter_results(self):
+        attempt = 0
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        while True:
+            error = None
+            try:
+                with self.client.stream(self.url, headers, self.retry_state) as response:
+                    fields = {}
+                    try:
+                        if response.status != 204:
+                            for index, item in enumerate(iter_results(_text_chunks(response), fields)):
+                                if index == self.size:
+                                    self.size += 1
+                                    yield item
+                        # Drain the body so the connection can be kept alive
+                        response.read()
+                    except _READ_ERRORS as e:
+                        error = URLError(e)
+                    if error is None:
+                        self._fields = {"next": None, **fields}
+                        return
+            except URLError:
+                # The request itself failed, retries included
+                sys.stderr.write("LAST URL: " + self.url + "\n")
+                raise
+            delay = self.retry_state.delay(attempt, error)
+            if delay is None:
+                sys.stderr.write("LAST URL: " + self.url + "\n")
+                raise error
+            attempt += 1
+            time.sleep(delay)
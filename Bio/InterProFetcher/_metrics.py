@@ -0,0 +1,230 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Per-request instrumentation of InterProClient (PRIVATE)."""
+
+import bisect
+import contextlib
+import socket
+import threading
+import time
+
+
+# Event of the request in progress in each thread
+_local = threading.local()
+
+_TIMINGS = ("dns", "connect", "ttfb", "transfer", "decode", "wait", "sleep")
+
+
+class RequestEvent:
+    """Timings and outcome of one request, passed to the client hooks.
+
+    One event covers a whole request as seen by the caller, including its
+    retries and redirects; the times are summed over all tries. Streamed
+    responses count the time the caller spent reading the body as
+    transfer, and their decoding, done while reading, is part of it.
+
+    Attributes:
+        url (str): requested URL.
+        status (int): HTTP status of the last response, or None if none was received.
+        error (Exception): exception raised to the caller, or None on success.
+        attempts (int): number of tries, 1 without retries.
+        cached (bool): answered from the response cache (possibly after revalidation).
+        coalesced (bool): answered by an identical request of another thread, without a request of its own.
+        new_connections (int): number of connections opened instead of taken from the pool.
+        bytes (int): body bytes received, as sent on the wire (compressed); None if unknown.
+        dns (float): seconds spent resolving host names.
+        connect (float): seconds spent opening connections (TCP and TLS), DNS excluded.
+        ttfb (float): seconds from sending requests to receiving the response headers.
+        transfer (float): seconds spent receiving response bodies.
+        decode (float): seconds spent decompressing and decoding JSON bodies.
+        wait (float): seconds spent waiting for the rate limiter.
+        sleep (float): seconds slept between retries.
+        duration (float): seconds from the start to the end of the request.
+        started (float): start time, as returned by time.time().
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.status = None
+        self.error = None
+        self.attempts = 1
+        self.cached = False
+        self.coalesced = False
+        self.new_connections = 0
+        self.bytes = 0
+        for name in _TIMINGS:
+            setattr(self, name, 0.0)
+        self.duration = 0.0
+        self.started = time.time()
+
+    def __repr__(self):
+        return f"<RequestEvent {self.url} status={self.status} attempts={self.attempts} duration={self.duration:.3f}s>"
+
+
+def _current_event():
+    """Return the event of the request in progress in this thread, or None (PRIVATE)."""
+    return getattr(_local, "event", None)
+
+
+@contextlib.contextmanager
+def _instrument(hooks, url):
+    """Record the request made in the context and pass its event to the hooks (PRIVATE).
+
+    Yields the event, or None without hooks. A request made within another
+    one (e.g. ``request`` called by ``get_json``) adds to the outer event.
+    """
+    event = _current_event()
+    if event is not None or not hooks:
+        yield event
+        return
+    event = _local.event = RequestEvent(url)
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        event.error = e
+        raise
+    finally:
+        _local.event = None
+        event.duration = time.perf_counter() - start
+        for hook in hooks:
+            hook(event)
+
+
+@contextlib.contextmanager
+def _detached():
+    """Hide the current event, e.g. while a streamed body is handed to the caller (PRIVATE)."""
+    event = _current_event()
+    _local.event = None
+    try:
+        yield
+    finally:
+        _local.event = event
+
+
+def _timed_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection recording the DNS time in the current event (PRIVATE)."""
+    event = _current_event()
+    if event is None:
+        return socket.create_connection(address, timeout, source_address)
+    host, port = address
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    event.dns += time.perf_counter() - start
+    error = None
+    for _, _, _, _, sockaddr in addresses:
+        try:
+            return socket.create_connection(sockaddr[:2], timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+class _Histogram:
+    """Cumulative histogram with fixed bucket bounds (PRIVATE)."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class Metrics:
+    """Hook aggregating RequestEvents into counters and histograms.
+
+    Register it with a client and read ``snapshot()``, or expose
+    ``to_prometheus()`` to a monitoring system::
+
+        from Bio.InterProFetcher import InterProClient, Metrics
+        metrics = Metrics()
+        client = InterProClient(hooks=[metrics])
+        ...
+        print(metrics.to_prometheus())
+
+    Counters: requests (per status, "error" when no response was
+    received), errors, retries, cache hits, coalesced requests, new
+    connections, bytes, and seconds slept on retries and waited for the
+    rate limiter. Histograms (in seconds): duration, dns, connect, ttfb,
+    transfer and decode.
+
+    Args:
+        buckets (tuple, optional): upper bounds of the histogram buckets, in seconds.
+    """
+
+    HISTOGRAMS = ("duration", "dns", "connect", "ttfb", "transfer", "decode")
+
+    def __init__(self, buckets: tuple = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all the requests recorded so far."""
+        with self._lock:
+            self._requests = {}
+            self._counters = dict.fromkeys(("errors", "retries", "cache_hits", "coalesced", "new_connections", "bytes", "sleep_seconds", "wait_seconds"), 0)
+            self._histograms = {name: _Histogram(self.buckets) for name in self.HISTOGRAMS}
+
+    def __call__(self, event: RequestEvent):
+        status = "error" if event.status is None else str(event.status)
+        with self._lock:
+            self._requests[status] = self._requests.get(status, 0) + 1
+            counters = self._counters
+            counters["errors"] += event.error is not None
+            counters["retries"] += event.attempts - 1
+            counters["cache_hits"] += event.cached
+            counters["coalesced"] += event.coalesced
+            counters["new_connections"] += event.new_connections
+            counters["bytes"] += event.bytes or 0
+            counters["sleep_seconds"] += event.sleep
+            counters["wait_seconds"] += event.wait
+            for name, histogram in self._histograms.items():
+                histogram.observe(getattr(event, name))
+
+    def snapshot(self) -> dict:
+        """Return the counters and histograms as plain Python values.
+
+        Returns:
+            dict: "requests" maps each status to a count, "counters" holds the other counters and "histograms" maps each timing to its cumulative "buckets" ((upper bound, count) pairs), "sum" and "count".
+        """
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "counters": dict(self._counters),
+                "histograms": {name: histogram.snapshot() for name, histogram in self._histograms.items()},
+            }
+
+    def to_prometheus(self, prefix: str = "interprofetcher") -> str:
+        """Return the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_requests_total counter"]
+        for status, count in sorted(snapshot["requests"].items()):
+            lines.append(f'{prefix}_requests_total{{status="{status}"}} {count}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, histogram in snapshot["histograms"].items():
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram["buckets"]:
+                lines.append(f'{metric}_bucket{{le="{"+Inf" if bound == float("inf") else bound}"}} {count}')
+            lines.append(f"{metric}_sum {histogram['sum']}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Progress reporting for long InterProFetcher downloads (PRIVATE)."""
+
+import sys
+import time
+
+
+class Progress:
+    """Progress of one download, passed to the ``progress`` callbacks.
+
+    The total is the ``count`` reported by the first page of a query (or
+    the number of accessions asked for), so the remaining requests,
+    throughput and estimated time left are known from the first page on.
+
+    Attributes:
+        label (str): what is being downloaded, e.g. a proteome ID or a query URL.
+        total (int): number of results expected, or None while unknown.
+        done (int): number of results received so far.
+        requests (int): number of pages (or single records) received so far.
+        page_size (int): results per request.
+    """
+
+    def __init__(self, label: str, callback, page_size: int, total: int = None):
+        self.label = label
+        self.callback = callback
+        self.page_size = page_size
+        self.total = total
+        self.done = 0
+        self.requests = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the download started."""
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Results received per second."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def requests_remaining(self):
+        """Number of requests still needed, or None while the total is unknown."""
+        if self.total is None:
+            return None
+        return -(-max(0, self.total - self.done) // self.page_size)
+
+    @property
+    def eta(self):
+        """Estimated seconds left, or None while unknown."""
+        rate = self.rate
+        if self.total is None or rate == 0:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def update(self, results: int, total: int = None):
+        """Record one more request bringing results and report it to the callback."""
+        if total is not None:
+            self.total = total
+        self.done += results
+        self.requests += 1
+        self.callback(self)
+
+    def __str__(self):
+        total = "?" if self.total is None else self.total
+        text = f"{self.label}: {self.done}/{total} results, {self.rate:.1f}/s"
+        if self.total is not None:
+            text += f", {self.requests_remaining} requests left"
+        if self.eta is not None:
+            text += f", ETA {self.eta:.0f}s"
+        return text
+
+
+def print_progress(progress: Progress):
+    """Progress callback writing one line per update to stderr."""
+    sys.stderr.write(str(progress) + "\n")
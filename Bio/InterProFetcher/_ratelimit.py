@@ -0,0 +1,82 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Adaptive token-bucket rate limiter for InterProFetcher requests (PRIVATE)."""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket whose rate adapts to the server responses.
+
+    Each request spends one token; tokens are refilled at ``rate`` per
+    second up to ``burst``. When the server signals overload (HTTP 408 or
+    429) the rate is multiplied by ``decrease`` and the bucket is emptied.
+    Every healthy response raises the rate by ``increase`` requests per
+    second again, up to ``max_rate`` (additive increase, multiplicative
+    decrease).
+
+    Args:
+        rate (float, optional): initial requests per second. Defaults to 2.
+        burst (float, optional): maximum number of tokens stored. Defaults to 5.
+        min_rate (float, optional): lowest rate reached after repeated errors. Defaults to one request a minute.
+        max_rate (float, optional): highest rate reached after healthy responses. Defaults to 10.
+        increase (float, optional): rate added after each healthy response. Defaults to 0.1.
+        decrease (float, optional): factor applied to the rate on overload. Defaults to 0.5.
+    """
+
+    def __init__(self, rate: float = 2, burst: float = 5, min_rate: float = 1 / 60, max_rate: float = 10, increase: float = 0.1, decrease: float = 0.5):
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("Expected 0 < min_rate <= rate <= max_rate")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it.
+
+        The token is reserved immediately, so concurrent callers queue up
+        behind each other instead of all waking at the same time.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self):
+        """Lower the rate after an overload response."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0)
+
+    def reward(self):
+        """Raise the rate after a healthy response."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase)
@@ -0,0 +1,179 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Lazy SeqRecord access to InterPro proteins (PRIVATE)."""
+
+import sys
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from Bio import InterProFetcher
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from ._client import get_default_client
+
+
+def _to_record(metadata):
+    """Build a SeqRecord from the InterPro metadata of a protein (PRIVATE)."""
+    accession = metadata["accession"]
+    annotations = {"molecule_type": "protein"}
+    if metadata.get("source_database"):
+        annotations["source_database"] = metadata["source_database"]
+    organism = metadata.get("source_organism") or {}
+    if organism.get("scientificName"):
+        annotations["organism"] = organism["scientificName"]
+    if organism.get("taxId"):
+        annotations["taxonomy_id"] = organism["taxId"]
+    return SeqRecord(Seq(metadata["sequence"]), id=accession, name=accession, description=metadata.get("name") or "", annotations=annotations)
+
+
+class ProteinRecords:
+    """Lazy list of SeqRecords for UniProt accessions, fetched from InterPro on access.
+
+    Nothing is downloaded when the collection is created. Indexing
+    (``records[0]`` or ``records["P69905"]``) fetches that one protein;
+    iterating, or indexing the positions in order, also fetches the next
+    prefetch proteins in the background on max_workers threads, so that the
+    records are usually ready when they are reached. Fetched records are kept
+    in a cache of cache_size records. The collection can be passed wherever
+    Biopython expects SeqRecords::
+
+        from Bio import SeqIO
+        from Bio.InterProFetcher import ProteinRecords
+
+        records = ProteinRecords(["P69905", "P68871", "P02042", "P02100"])
+        SeqIO.write(records[:2], "sample.fasta", "fasta")
+
+    The accessions are stored when the collection is created, so an
+    iterator such as ``iter_proteins(...)`` is consumed at that point.
+
+    Proteins missing from InterPro raise KeyError when indexed and are
+    skipped with a warning when iterating. Slices prefetch on the threads
+    of the collection they were taken from, which ``close`` stops.
+
+    Args:
+        accession_numbers (iterable): UniProt accession numbers.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        prefetch (int, optional): number of records fetched ahead of the one being read. Defaults to 16.
+        max_workers (int, optional): number of records fetched concurrently. Defaults to 8.
+        cache_size (int, optional): number of fetched records kept in memory. Defaults to 1024.
+    """
+
+    def __init__(self, accession_numbers, client=None, prefetch: int = 16, max_workers: int = 8, cache_size: int = 1024):
+        self.accession_numbers = list(accession_numbers)
+        self.client = client
+        self.prefetch = prefetch
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._records = OrderedDict()
+        self._pending = {}
+        self._executor = None
+        # Slices share the prefetching threads of the collection they come from
+        self._owner = self
+        self._last_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.accession_numbers)
+
+    def __repr__(self):
+        return f"<ProteinRecords of {len(self)} proteins>"
+
+    def __contains__(self, accession_number):
+        # Without it, ``in`` would fetch and compare the records one by one
+        return accession_number in self.accession_numbers
+
+    def keys(self):
+        """Return the accession numbers, in order."""
+        return list(self.accession_numbers)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            records = ProteinRecords(self.accession_numbers[key], self.client, self.prefetch, self.max_workers, self.cache_size)
+            records._owner = self._owner
+            return records
+        if isinstance(key, str):
+            return self._get(key)
+        index = range(len(self))[key]
+        if self._last_index is not None and index == self._last_index + 1:
+            self._read_ahead(index + 1)
+        self._last_index = index
+        return self._get(self.accession_numbers[index])
+
+    def get(self, accession_number: str, default=None):
+        """Return the SeqRecord of an accession, or default if it is not in InterPro."""
+        try:
+            return self._get(accession_number)
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        for index, accession_number in enumerate(self.accession_numbers):
+            self._read_ahead(index + 1)
+            try:
+                yield self._get(accession_number)
+            except KeyError:
+                sys.stderr.write(f"WARNING: {accession_number} not found.\n")
+
+    def close(self):
+        """Stop the prefetching threads (only cancel the pending prefetches of a slice)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fetch(self, accession_number):
+        """Return the SeqRecord of an accession, or None if not found (PRIVATE)."""
+        metadata = InterProFetcher._fetch_protein_metadata(self.client or get_default_client(), accession_number)
+        return None if metadata is None else _to_record(metadata)
+
+    def _read_ahead(self, start):
+        """Start fetching the records following position start - 1 (PRIVATE)."""
+        if self.prefetch <= 0:
+            return
+        executor = self._owner._get_executor()
+        with self._lock:
+            for accession_number in self.accession_numbers[start:start + self.prefetch]:
+                if accession_number not in self._records and accession_number not in self._pending:
+                    self._pending[accession_number] = executor.submit(self._fetch, accession_number)
+
+    def _get_executor(self):
+        """Return the prefetching thread pool, started on first use (PRIVATE)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="InterProFetcher")
+            return self._executor
+
+    def _get(self, accession_number):
+        """Return the SeqRecord of an accession from the cache, a prefetch or a new request (PRIVATE)."""
+        with self._lock:
+            cached = accession_number in self._records
+            if cached:
+                self._records.move_to_end(accession_number)
+                record = self._records[accession_number]
+            else:
+                future = self._pending.pop(accession_number, None)
+        if not cached:
+            record = self._fetch(accession_number) if future is None else future.result()
+            with self._lock:
+                # None marks proteins not found, so they are not asked for again
+                self._records[accession_number] = record
+                while len(self._records) > self.cache_size:
+                    self._records.popitem(last=False)
+        if record is None:
+            raise KeyError(accession_number)
+        return record
@@ -0,0 +1,109 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Retry policy for InterPro and RCSB requests (PRIVATE)."""
+
+import random
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.error import HTTPError
+
+
+def _parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header, or None (PRIVATE).
+
+    The header holds either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decide which failed requests are retried and how long to wait.
+
+    Network failures and the HTTP statuses in ``retry_statuses`` are
+    transient and retried; any other HTTP error (e.g. 400 or 404) is
+    permanent and raised at once. The wait honours the ``Retry-After``
+    header when the server sends one, and is otherwise a capped exponential
+    backoff with jitter: between half and all of
+    ``min(max_delay, base_delay * 2 ** attempt)`` seconds.
+
+    A job (one paginated query with all its pages, such as one proteome of
+    ``fetch_proteomes``, or one call fetching single records or files)
+    gives up once it has made ``max_attempts`` tries for one request or
+    would sleep more than ``max_total`` seconds in total.
+
+    Args:
+        max_attempts (int, optional): tries per request, including the first one. Defaults to 5.
+        base_delay (float, optional): backoff before the first retry, in seconds. Defaults to 1.
+        max_delay (float, optional): largest backoff between two tries, in seconds. Defaults to 60.
+        max_total (float, optional): largest total time slept on retries per job, in seconds. Defaults to 600.
+        retry_statuses (tuple, optional): HTTP statuses treated as transient. Defaults to 408, 429, 500, 502, 503 and 504.
+        jitter (bool, optional): randomise the backoff to spread out concurrent retries. Defaults to True.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1, max_delay: float = 60, max_total: float = 600, retry_statuses: tuple = (408, 429, 500, 502, 503, 504), jitter: bool = True):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_total = max_total
+        self.retry_statuses = retry_statuses
+        self.jitter = jitter
+
+    def is_transient(self, error) -> bool:
+        """Check whether a request which failed with error may succeed when retried."""
+        if isinstance(error, HTTPError):
+            return error.code in self.retry_statuses
+        return True
+
+    def backoff(self, attempt: int) -> float:
+        """Return the wait before retry number attempt + 1 without a Retry-After header."""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+    def start(self):
+        """Return the retry bookkeeping for a new job."""
+        return _RetryState(self)
+
+
+class _RetryState:
+    """Time spent on retries by one job (PRIVATE)."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.spent = 0.0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt, error):
+        """Return how long to wait before retrying after error, or None to give up.
+
+        attempt is the number of failed tries of this request so far minus one.
+        """
+        policy = self.policy
+        if not policy.is_transient(error) or attempt + 1 >= policy.max_attempts:
+            return None
+        delay = None
+        if isinstance(error, HTTPError) and error.headers is not None:
+            delay = _parse_retry_after(error.headers.get("Retry-After"))
+        if delay is None:
+            delay = policy.backoff(attempt)
+        with self._lock:
+            if self.spent + delay > policy.max_total:
+                return None
+            self.spent += delay
+        return delay
@@ -0,0 +1,237 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Buffered output writers for InterPro results (PRIVATE)."""
+
+import gzip
+import json
+import os
+
+from Bio import bgzf
+
+from ._faidx import _FaiBuilder, _IndexingBgzfWriter, _scan_blocks
+
+
+HEADER_SEPARATOR = "|"
+LINE_LENGTH = 80
+
+_BUFFER_SIZE = 1 << 20
+_COMPRESSIONS = (None, "gzip", "bgzf")
+
+
+def _write_fasta_record(handle, accession, name, sequence):
+    """Write one protein in the InterProFetcher FASTA layout (PRIVATE)."""
+    handle.write(">" + accession + HEADER_SEPARATOR + name + "\n")
+    for i in range(0, len(sequence), LINE_LENGTH):
+        handle.write(sequence[i:i + LINE_LENGTH] + "\n")
+
+
+def _read_committed(path, start, offset, compression):
+    """Return the text stored in path between two output offsets (PRIVATE)."""
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(offset - start)
+    if compression is not None:
+        # gzip members and BGZF blocks both decompress as multi-member gzip
+        data = gzip.decompress(data)
+    return data.decode()
+
+
+class _Sink:
+    """Base class of the InterProFetcher output writers (PRIVATE).
+
+    The output file is opened once, with a large write buffer, and
+    optionally gzip or BGZF compressed. Unless appending to an existing
+    file, data goes to ``filename + ".part"`` which is renamed to filename
+    by ``close``, so readers never see a half written file.
+
+    Subclasses implement ``write_results`` for one page of API results.
+    """
+
+    def __init__(self, filename: str, compression: str = None, append: bool = False, resume: tuple = None):
+        if compression not in _COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {_COMPRESSIONS}")
+        self.filename = filename
+        self.compression = compression
+        self.append = append
+        self._path = filename if append else filename + ".part"
+        if resume is not None:
+            self.start, offset = resume
+            self._raw = open(self._path, "r+b", buffering=_BUFFER_SIZE)
+            self._raw.truncate(offset)
+            self._raw.seek(offset)
+            self._resumed()
+        else:
+            # Read access is needed by BgzfWriter to check the mode.
+            self._raw = open(self._path, "a+b" if append else "w+b", buffering=_BUFFER_SIZE)
+            self.start = self._raw.tell()
+        self._handle = self._open_compressed()
+
+    def _resumed(self):
+        """Called once the output of an earlier run has been truncated to its checkpoint (PRIVATE)."""
+
+    def _open_compressed(self):
+        if self.compression == "gzip":
+            return gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "bgzf":
+            return bgzf.BgzfWriter(fileobj=self._raw)
+        return self._raw
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, text: str):
+        """Write text to the output."""
+        self._handle.write(text.encode())
+
+    def write_results(self, results):
+        """Write the results of one page of an InterPro API response."""
+        raise NotImplementedError
+
+    def sync(self) -> int:
+        """Flush everything written so far to disk and return the output offset.
+
+        The output can later be truncated at this offset and continued with
+        the ``resume`` argument. Gzip output starts a new gzip member.
+        """
+        if self.compression == "gzip":
+            self._handle.close()
+        elif self.compression == "bgzf":
+            self._handle.flush()
+        self._raw.flush()
+        offset = self._raw.tell()
+        if self.compression == "gzip":
+            # The header of the next member must come after the offset
+            self._handle = self._open_compressed()
+        return offset
+
+    def _close_handles(self):
+        if self.compression is not None:
+            self._handle.close()
+        if not self._raw.closed:
+            self._raw.close()
+
+    def close(self):
+        """Finish the output and move it to its final name."""
+        self._close_handles()
+        if not self.append:
+            os.replace(self._path, self.filename)
+
+    def abort(self, keep: bool = False):
+        """Close the output after an error, removing the partial file unless keep is True."""
+        self._close_handles()
+        if not keep and not self.append:
+            os.remove(self._path)
+
+
+class CsvSink(_Sink):
+    """Write one accession per line."""
+
+    def write_results(self, results):
+        self.write("".join(item["metadata"]["accession"] + "\n" for item in results))
+
+
+class JsonlSink(_Sink):
+    """Write every result as one JSON object per line."""
+
+    def write_results(self, results):
+        self.write("".join(json.dumps(item) + "\n" for item in results))
+
+
+class FastaSink(_Sink):
+    """Write proteins fetched with ``extra_fields=sequence`` as FASTA.
+
+    With index True, a samtools faidx index (``filename + ".fai"``) is
+    built while the records are written, plus a BGZF block index
+    (``filename + ".gzi"``) with "bgzf" compression. Both are saved by
+    ``close``, so the file can be opened with ``index_fasta`` (or
+    ``samtools faidx``) for random access as soon as it is complete.
+    """
+
+    def __init__(self, filename: str, compression: str = None, append: bool = False, resume: tuple = None, index: bool = False):
+        if index and compression == "gzip":
+            raise ValueError("gzip output cannot be indexed, use compression='bgzf'")
+        if index and append:
+            raise ValueError("Appended output cannot be indexed")
+        self.index = _FaiBuilder() if index else None
+        super().__init__(filename, compression, append, resume)
+
+    def _resumed(self):
+        if self.index is None:
+            return
+        # Index the records of the earlier runs, reading them line by line
+        with open(self._path, "rb") as handle:
+            handle.seek(self.start)
+            if self.compression is None:
+                self.index.scan(handle)
+            else:
+                self.index.scan(gzip.GzipFile(fileobj=handle, mode="rb"))
+        if self.compression == "bgzf":
+            self.index.blocks.extend(_scan_blocks(self._path))
+
+    def _open_compressed(self):
+        if self.index is None or self.compression != "bgzf":
+            return super()._open_compressed()
+        return _IndexingBgzfWriter(self._raw, self.index.blocks, self.index.offset)
+
+    def write_record(self, accession: str, name: str, sequence: str):
+        """Write one protein in the InterProFetcher FASTA layout."""
+        if self.index is not None:
+            header = (">" + accession + HEADER_SEPARATOR + name + "\n").encode()
+            self.index.add_record(header, len(sequence), LINE_LENGTH)
+        _write_fasta_record(self, accession, name, sequence)
+
+    def close(self):
+        super().close()
+        if self.index is not None:
+            self.index.write(self.filename)
+
+    def write_results(self, results):
+        for item in results:
+            self.write_record(item["metadata"]["accession"], item["metadata"]["name"], item["extra_fields"]["sequence"])
+
+
+_SINKS = {"csv": CsvSink, "jsonl": JsonlSink, "fasta": FastaSink}
+_EXTENSIONS = {".csv": "csv", ".txt": "csv", ".jsonl": "jsonl", ".fasta": "fasta", ".fa": "fasta", ".faa": "fasta"}
+
+
+def open_sink(filename: str, format: str = None, compression: str = None, append: bool = False):
+    """
+    Open a buffered writer for InterPro results.
+
+    The format and compression are guessed from the file name when not
+    given, e.g. "hits.jsonl.gz" is gzip compressed JSONL and "seqs.fasta.bgz"
+    is BGZF compressed FASTA.
+
+    Args:
+        filename (str): name of the output file.
+        format (str, optional): "csv", "jsonl" or "fasta".
+        compression (str, optional): None, "gzip" or "bgzf".
+        append (bool, optional): append to an existing file instead of atomically replacing it. Defaults to False.
+
+    Returns:
+        CsvSink, JsonlSink or FastaSink
+    """
+    root, extension = os.path.splitext(filename)
+    if extension in (".gz", ".bgz"):
+        if compression is None:
+            compression = "gzip" if extension == ".gz" else "bgzf"
+        extension = os.path.splitext(root)[1]
+    if format is None:
+        try:
+            format = _EXTENSIONS[extension]
+        except KeyError:
+            raise ValueError(f"Cannot guess the output format of {filename}") from None
+    try:
+        sink_class = _SINKS[format]
+    except KeyError:
+        raise ValueError(f"Unknown output format {format!r}, expected one of {sorted(_SINKS)}") from None
+    return sink_class(filename, compression, append)
@@ -0,0 +1,327 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Asyncio counterparts of the InterProFetcher browse and fetch functions.
+
+The coroutines in this module mirror ``browse_proteins``,
+``browse_structures``, ``browse_by_type``, ``browse_proteomes``,
+``browse_by_database``, ``fetch_entries`` and ``fetch_proteomes``, so a
+single event loop can drive many InterPro queries at once::
+
+    import asyncio
+    from Bio.InterProFetcher import aio
+
+    async def main():
+        return await asyncio.gather(
+            aio.browse_by_type("family", "cystatin"),
+            aio.browse_proteomes("saccharomyces cerevisiae"),
+        )
+
+Requests are sent through an ``AsyncInterProClient``. It wraps the pooled
+``InterProClient`` and bounds the number of requests in flight across all
+coroutines with one semaphore. Waiting for the rate limiter and between
+retries happens with ``asyncio.sleep``, so the event loop is never blocked
+by throttling.
+
+Unlike the blocking functions, the coroutines neither print accessions nor
+exit the interpreter when a query has no results; they return an empty list.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+
+from . import (
+    _database_url,
+    _entry_sequences_url,
+    _proteins_url,
+    _proteome_sequences_url,
+    _proteomes_url,
+    _structures_url,
+)
+from ._client import InterProClient, get_default_client
+from ._sinks import FastaSink
+
+
+class AsyncInterProClient:
+    """Awaitable front end of an InterProClient with a global concurrency limit.
+
+    The blocking socket I/O of each request runs on a small thread pool of
+    ``max_concurrency`` workers, shared by every coroutine using this client,
+    so hundreds of queries need no more than ``max_concurrency`` threads.
+
+    Args:
+        client (InterProClient, optional): pooled client doing the requests. Defaults to the shared module client.
+        max_concurrency (int, optional): maximum number of requests in flight. Defaults to 16.
+    """
+
+    def __init__(self, client: InterProClient = None, max_concurrency: int = 16):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.client = client or get_default_client()
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="InterProFetcher")
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    @property
+    def rate_limiter(self):
+        return self.client.rate_limiter
+
+    def _semaphore(self):
+        # asyncio primitives belong to one event loop, keep one per loop.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def request(self, url: str, headers: dict = None, retry_state=None):
+        """Send a GET request without blocking the event loop.
+
+        See ``InterProClient.request`` for the arguments, the returned object
+        and errors. The retry policy of the wrapped client applies.
+        """
+        if retry_state is None:
+            retry_state = self.client.retry.start()
+        attempt = 0
+        while True:
+            try:
+                return await self._send(url, headers)
+            except URLError as e:
+                delay = retry_state.delay(attempt, e)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, url, headers):
+        """Make one try of a request on the worker threads (PRIVATE)."""
+        async with self._semaphore():
+            delay = self.client.rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return await self._run(self.client._request, url, headers, True, retry=False)
+
+    async def _run(self, function, *args, **kwargs):
+        """Call a blocking function on the worker threads (PRIVATE)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def get_json(self, url: str, headers: dict = None, retry_state=None):
+        """Fetch a URL and decode its JSON body, or None for HTTP 204.
+
+        The body is decoded on the worker threads, as large pages would
+        otherwise hold up the event loop.
+        """
+        request_headers = {"Accept": "application/json"}
+        if headers:
+            request_headers.update(headers)
+        response = await self.request(url, request_headers, retry_state)
+        if response.status == 204:
+            return None
+        return await self._run(response.json)
+
+    def close(self):
+        """Shut down the worker threads (the wrapped client stays open)."""
+        self._executor.shutdown(wait=False)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_async_client():
+    """Return the AsyncInterProClient shared by calls made without an explicit client."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = AsyncInterProClient()
+        return _default_client
+
+
+async def _iter_pages(client, url):
+    """Yield the decoded JSON pages of a cursor paginated query (PRIVATE)."""
+    retry_state = client.client.retry.start()
+    while url:
+        try:
+            payload = await client.get_json(url, retry_state=retry_state)
+        except URLError:
+            sys.stderr.write("LAST URL: " + url + "\n")
+            raise
+        if payload is None:
+            break
+        yield payload
+        url = payload["next"]
+
+
+async def _browse(url, client):
+    """Collect the accessions of every result of a browse query (PRIVATE)."""
+    client = client or get_default_async_client()
+    return [item["metadata"]["accession"] async for payload in _iter_pages(client, url) for item in payload["results"]]
+
+
+async def browse_proteins(database: str, organism: str = "", reviewed: bool = False, client: AsyncInterProClient = None, entry: str = None, tax_id: int = None, length: tuple = None, is_fragment: bool = None):
+    """
+    Browse proteins from different databases and organisms.
+
+    Args:
+        database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+        organism (str, optional): species name.
+        reviewed (bool, optional): only reviewed proteins. Defaults to False.
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+        entry, tax_id, length, is_fragment: server-side filters, as in ``Bio.InterProFetcher.browse_proteins``.
+
+    Returns:
+        list: protein accession numbers
+    """
+    return await _browse(_proteins_url(database, organism, reviewed, entry, tax_id, length, is_fragment), client)
+
+
+async def browse_structures(database: str, keyword: str, resolution: str = "", client: AsyncInterProClient = None):
+    """
+    Browse PDB structures from different databases based on a specific keyword and resolution.
+
+    Args:
+        database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+        keyword (str): keyword used to filter the entries.
+        resolution (str, optional): resolution of the structure. Defaults to "". Available resolutions: '0-2', '2-4', '4-100'.
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Returns:
+        list: PDB accession numbers
+    """
+    return await _browse(_structures_url(database, keyword, resolution), client)
+
+
+async def browse_by_type(type: str, keyword: str = "", client: AsyncInterProClient = None):
+    """
+    Browse entries from the InterPro database based on a specific type and keyword.
+
+    Args:
+        type (str): type of entry to browse (family, domain, homologous_superfamily, repeat, conserved_site, active_site, binding_site, ptm).
+        keyword (str, optional): keyword used to filter the entries. Defaults to "".
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Returns:
+        list: accession numbers of selected type that are matching the request.
+    """
+    return await _browse(_database_url("InterPro", type, keyword), client)
+
+
+async def browse_proteomes(organism: str, client: AsyncInterProClient = None):
+    """
+    Browse proteomes from the InterPro database for a specific organism.
+
+    Args:
+        organism (str): name of the organism to browse with.
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Return:
+        list: accession numbers of proteomes that are matching the request.
+    """
+    return await _browse(_proteomes_url(organism), client)
+
+
+async def browse_by_database(database: str, type: str = "", keyword: str = "", client: AsyncInterProClient = None):
+    """
+    Browse entries from selected database based on a specific type and keyword.
+
+    Args:
+        database (str): name of the database (cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+        type (str, optional): type of entry to browse (family, domain, repeat, conserved_site, unknown).
+        keyword (str, optional): keyword used to filter the entries. Defaults to "".
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Returns:
+        list: accession numbers that are matching the request.
+    """
+    return await _browse(_database_url(database, type, keyword), client)
+
+
+async def _fetch_fasta(url, output_filename, client):
+    """Write every protein of a paginated sequence query to a FASTA file (PRIVATE).
+
+    The file is opened, written and closed on the worker threads of the
+    client, so disk I/O does not block the event loop. Returns the number
+    of sequences written.
+    """
+    count = 0
+    sink = await client._run(FastaSink, output_filename)
+    try:
+        async for payload in _iter_pages(client, url):
+            await client._run(sink.write_results, payload["results"])
+            count += len(payload["results"])
+    except BaseException:
+        await client._run(sink.abort)
+        raise
+    await client._run(sink.close)
+    return count
+
+
+async def fetch_proteomes(proteome_ids, output_directory, client: AsyncInterProClient = None):
+    """
+    Fetch proteomes based on the given InterPro proteome IDs and save them to individual FASTA files.
+
+    The proteomes are downloaded concurrently, at most ``max_concurrency``
+    of the client at a time so that the number of open output files stays
+    bounded. If a proteome is not found for a given ID, a warning message
+    is displayed.
+
+    Args:
+        proteome_ids (list): list of proteome IDs to fetch.
+        output_directory (str): directory to save the proteome files.
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Returns:
+        dict: number of sequences written for each proteome ID found.
+    """
+    client = client or get_default_async_client()
+    downloads = asyncio.Semaphore(client.max_concurrency)
+
+    async def fetch(proteome_id):
+        output_filename = os.path.join(output_directory, proteome_id + ".fasta")
+        try:
+            async with downloads:
+                return await _fetch_fasta(_proteome_sequences_url(proteome_id), output_filename, client)
+        except HTTPError as e:
+            if e.code != 404:
+                raise
+            sys.stderr.write(f"WARNING: No data found for ID: {proteome_id}\n")
+            return None
+
+    counts = await asyncio.gather(*(fetch(proteome_id) for proteome_id in proteome_ids))
+    return {proteome_id: count for proteome_id, count in zip(proteome_ids, counts) if count is not None}
+
+
+async def fetch_entries(database: str, accession_number: str, output_directory, client: AsyncInterProClient = None):
+    """
+    Fetch sequences based on the given database and accession number and save them to FASTA file.
+
+    If an accession number is not found, a warning message is displayed.
+
+    Args:
+        database (str): name of the database the accession number belongs to.
+        accession_number (str): accession number of the entry to fetch.
+        output_directory (str): directory to save the sequences.
+        client (AsyncInterProClient, optional): client used for the requests. Defaults to the shared async client.
+
+    Returns:
+        int: number of sequences written, or None if the entry was not found.
+    """
+    client = client or get_default_async_client()
+    output_filename = os.path.join(output_directory, accession_number + ".fasta")
+    try:
+        return await _fetch_fasta(_entry_sequences_url(database, accession_number), output_filename, client)
+    except HTTPError as e:
+        if e.code != 404:
+            raise
+        sys.stderr.write(f"WARNING: No data found for ID: {accession_number}\n")
+        return None
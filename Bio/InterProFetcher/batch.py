@@ -0,0 +1,163 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Run many InterProFetcher queries from a JSONL job file.
+
+Each line of the job file is a JSON object naming an InterProFetcher
+function and its keyword arguments, with an optional ``id``::
+
+    {"id": "yeast", "function": "browse_proteomes", "kwargs": {"organism": "saccharomyces cerevisiae", "write_on_sdout": false}}
+    {"function": "fetch_entries", "kwargs": {"database": "pfam", "accession_number": "PF00003", "output_directory": "out"}}
+
+Identical jobs (same function and arguments) are run once. The jobs run
+concurrently and share one ``InterProClient``, so they also share its
+connection pool and rate limit. One manifest line is written per job with
+its outcome, result, timing and any error::
+
+    from Bio.InterProFetcher import batch
+    batch.run_batch("jobs.jsonl", "manifest.jsonl")
+
+The same can be done from the command line::
+
+    python -m Bio.InterProFetcher.batch jobs.jsonl manifest.jsonl
+"""
+
+import argparse
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from Bio import InterProFetcher
+
+from ._client import InterProClient, get_default_client
+from ._sinks import JsonlSink
+
+
+# Functions a job may call; all of them accept a client argument.
+JOB_FUNCTIONS = (
+    "browse_by_database",
+    "browse_by_type",
+    "browse_proteins",
+    "browse_proteomes",
+    "browse_structures",
+    "download_pdb_structures",
+    "fetch_entries",
+    "fetch_entries_bulk",
+    "fetch_protein_sequences",
+    "fetch_proteomes",
+)
+
+
+def _jsonable(value):
+    """Convert a job result to something json.dumps accepts (PRIVATE)."""
+    if isinstance(value, dict):
+        return {"|".join(key) if isinstance(key, tuple) else str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def read_jobs(filename: str):
+    """
+    Read and deduplicate the jobs of a JSONL job file.
+
+    Blank lines are skipped. A job without an ``id`` is named after its
+    line number.
+
+    Args:
+        filename (str): name of the JSONL job file.
+
+    Returns:
+        list: one dict per distinct job, with keys "id", "function", "kwargs" and "duplicates" (ids of identical jobs).
+    """
+    jobs = {}
+    with open(filename) as handle:
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            spec = json.loads(line)
+            function = spec.get("function")
+            if function not in JOB_FUNCTIONS:
+                raise ValueError(f"Line {number} of {filename}: unknown function {function!r}, expected one of {JOB_FUNCTIONS}")
+            kwargs = spec.get("kwargs", {})
+            if not isinstance(kwargs, dict):
+                raise ValueError(f"Line {number} of {filename}: kwargs must be a JSON object")
+            job_id = str(spec.get("id", number))
+            key = json.dumps([function, kwargs], sort_keys=True)
+            if key in jobs:
+                jobs[key]["duplicates"].append(job_id)
+            else:
+                jobs[key] = {"id": job_id, "function": function, "kwargs": kwargs, "duplicates": []}
+    return list(jobs.values())
+
+
+def _run_job(job, client):
+    """Run one job and return its manifest record (PRIVATE)."""
+    record = {"id": job["id"], "function": job["function"], "kwargs": job["kwargs"], "duplicates": job["duplicates"]}
+    function = getattr(InterProFetcher, job["function"])
+    start = time.monotonic()
+    record["started"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    try:
+        result = function(client=client, **job["kwargs"])
+    except SystemExit:
+        # The browse functions exit when a query has no results
+        record["status"] = "error"
+        record["error"] = "no results"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    else:
+        record["status"] = "ok"
+        record["result"] = _jsonable(result)
+    record["elapsed"] = round(time.monotonic() - start, 3)
+    return record
+
+
+def run_batch(jobs_filename: str, manifest_filename: str, client: InterProClient = None, max_workers: int = 4):
+    """
+    Run the jobs of a JSONL job file concurrently and write a JSONL manifest.
+
+    A failed job is recorded in the manifest with status "error" and does
+    not stop the others. Manifest lines are in completion order.
+
+    Args:
+        jobs_filename (str): name of the JSONL job file.
+        manifest_filename (str): name of the JSONL manifest to write.
+        client (InterProClient, optional): client shared by all jobs. Defaults to the shared module client.
+        max_workers (int, optional): number of jobs running at the same time. Defaults to 4.
+
+    Returns:
+        list: the manifest records.
+    """
+    jobs = read_jobs(jobs_filename)
+    client = client or get_default_client()
+    records = []
+    with JsonlSink(manifest_filename) as manifest, ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(_run_job, job, client) for job in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            manifest.write_results([record])
+            records.append(record)
+    return records
+
+
+def main(argv=None):
+    """Run a job file from the command line (PRIVATE)."""
+    parser = argparse.ArgumentParser(prog="python -m Bio.InterProFetcher.batch", description="Run InterProFetcher jobs listed in a JSONL file.")
+    parser.add_argument("jobs", help="JSONL file with one job per line")
+    parser.add_argument("manifest", help="JSONL manifest to write")
+    parser.add_argument("-j", "--jobs-in-parallel", type=int, default=4, dest="max_workers", help="number of jobs run at the same time (default 4)")
+    args = parser.parse_args(argv)
+    records = run_batch(args.jobs, args.manifest, max_workers=args.max_workers)
+    failed = sum(record["status"] != "ok" for record in records)
+    print(f"{len(records) - failed} jobs succeeded, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
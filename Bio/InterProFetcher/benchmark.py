@@ -0,0 +1,306 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Benchmark the InterProFetcher browse and fetch functions offline.
+
+Every benchmark calls one InterProFetcher function against a local
+``MockServer`` and reports requests, records and bytes per second and the
+peak resident memory. The server replays either synthetic data or a
+recording of the live API made once with ``--record``, so changes to
+connection pooling, concurrency or caching can be compared without
+touching EBI::
+
+    python -m Bio.InterProFetcher.benchmark --records 5000 --latency 0.05
+    python -m Bio.InterProFetcher.benchmark --record recording
+    python -m Bio.InterProFetcher.benchmark --replay recording --error-rate 0.02
+
+The same from Python::
+
+    from Bio.InterProFetcher import benchmark
+    from Bio.InterProFetcher.mockserver import MockServer
+
+    with MockServer(latency=0.05) as server:
+        benchmark.populate(server, records=5000)
+        for result in benchmark.run_benchmarks(server):
+            print(benchmark.format_result(result))
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from Bio import InterProFetcher
+
+from ._client import InterProClient
+from ._ratelimit import RateLimiter
+from ._retry import RetryPolicy
+from .mockserver import MockServer, record
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Real accessions, so that the same benchmarks can be recorded from the live API
+_ACCESSIONS = ("P69905", "P68871", "P01308", "P04637", "P38398", "P00533", "P02768", "P60709", "P07900", "P10636")
+_PROTEOME = "UP000002311"
+_ENTRIES = (("pfam", "PF00051"), ("pfam", "PF00031"))
+_STRUCTURES = ("4hhb", "1a3n")
+
+
+def _count_fasta_records(directory):
+    """Return the number of FASTA records in the files of directory (PRIVATE)."""
+    records = 0
+    for name in os.listdir(directory):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(os.path.join(directory, name), "rt") as handle:
+            records += sum(line.startswith(">") for line in handle)
+    return records
+
+
+def _fetch_protein_sequences(client, directory):
+    InterProFetcher.fetch_protein_sequences(list(_ACCESSIONS), os.path.join(directory, "proteins.fasta"), client)
+    return _count_fasta_records(directory)
+
+
+def _fetch_proteomes(client, directory):
+    InterProFetcher.fetch_proteomes([_PROTEOME], directory, client)
+    return _count_fasta_records(directory)
+
+
+def _fetch_entries(client, directory):
+    InterProFetcher.fetch_entries(*_ENTRIES[0], directory, client)
+    return _count_fasta_records(directory)
+
+
+def _fetch_entries_bulk(client, directory):
+    InterProFetcher.fetch_entries_bulk(_ENTRIES, directory, client)
+    return _count_fasta_records(directory)
+
+
+def _benchmarks():
+    """Return the name, requests and run function of every benchmark (PRIVATE).
+
+    The requests are (kind, URL) pairs: "pages" for a paginated query,
+    "count" for its one result count probe, "protein" for one protein and
+    "structure" for one RCSB file. They are built on each call, so they
+    follow a patched API_URL. Each run function takes a client and an
+    empty directory and returns the number of records obtained.
+    """
+    proteins_url = InterProFetcher._proteins_url("pfam", "homo sapiens", False)
+    structures_url = InterProFetcher._structures_url("InterPro", "kinase", "0-2")
+    proteomes_url = InterProFetcher._proteomes_url("saccharomyces")
+    by_type_url = InterProFetcher._database_url("InterPro", "family", "cystatin")
+    by_database_url = InterProFetcher._database_url("pfam", "domain", "transmembrane")
+    entry_urls = [InterProFetcher._entry_sequences_url(*entry) for entry in _ENTRIES]
+    return [
+        ("browse_proteins", [("pages", proteins_url)],
+         lambda client, directory: len(InterProFetcher.browse_proteins("pfam", "homo sapiens", write_on_sdout=False, client=client))),
+        ("browse_structures", [("pages", structures_url)],
+         lambda client, directory: len(InterProFetcher.browse_structures("InterPro", "kinase", "0-2", write_on_stdout=False, client=client))),
+        ("browse_proteomes", [("pages", proteomes_url)],
+         lambda client, directory: len(InterProFetcher.browse_proteomes("saccharomyces", write_on_sdout=False, client=client))),
+        ("browse_by_type", [("pages", by_type_url)],
+         lambda client, directory: len(InterProFetcher.browse_by_type("family", "cystatin", write_on_sdout=False, client=client))),
+        ("browse_by_database", [("pages", by_database_url)],
+         lambda client, directory: len(InterProFetcher.browse_by_database("pfam", "domain", "transmembrane", write_on_sdout=False, client=client))),
+        ("fetch_protein_sequences", [("protein", f"{InterProFetcher.API_URL}/protein/UniProt/{accession}") for accession in _ACCESSIONS], _fetch_protein_sequences),
+        ("fetch_proteomes", [("pages", InterProFetcher._proteome_sequences_url(_PROTEOME))], _fetch_proteomes),
+        ("fetch_entries", [("pages", entry_urls[0])], _fetch_entries),
+        ("fetch_entries_bulk", [("pages", url) for url in entry_urls] + [("count", url) for url in entry_urls], _fetch_entries_bulk),
+        ("download_pdb_structures", [("structure", f"{InterProFetcher.PDB_DOWNLOAD_URL}/{pdb_id}.pdb.gz") for pdb_id in _STRUCTURES],
+         lambda client, directory: len(InterProFetcher.download_pdb_structures(list(_STRUCTURES), directory, client, formats=("pdb",)))),
+    ]
+
+
+BENCHMARKS = tuple(name for name, _, _ in _benchmarks())
+
+
+def _synthetic_protein(number):
+    """Return an InterPro protein result with its sequence (PRIVATE)."""
+    accession = "A%05d" % number
+    sequence = "MKVLAAGIVGLLLAGCSSHK" * (5 + number % 20)
+    return {
+        "metadata": {"accession": accession, "name": accession + " protein", "source_database": "unreviewed", "length": len(sequence)},
+        "extra_fields": {"sequence": sequence},
+    }
+
+
+def populate(server: MockServer, records: int = 2000):
+    """Add synthetic responses for every benchmark to server.
+
+    Args:
+        server (MockServer): server to fill.
+        records (int, optional): number of results of every paginated query. Defaults to 2000.
+    """
+    with server.patch():
+        benchmarks = _benchmarks()
+    results = [_synthetic_protein(number) for number in range(records)]
+    pages = [results[start:start + InterProFetcher.PAGE_SIZE] for start in range(0, records, InterProFetcher.PAGE_SIZE)]
+    structure = gzip.compress("".join("ATOM  %5d  CA  GLY A%4d      11.104  13.207   2.100  1.00 20.00           C\n" % (i, i) for i in range(1, 2001)).encode())
+    for _, requests, _ in benchmarks:
+        for kind, url in requests:
+            if kind == "pages":
+                server.add_pages(url, pages)
+            elif kind == "count":
+                server.add(InterProFetcher._count_url(url), {"count": records, "next": None, "previous": None, "results": results[:1]})
+            elif kind == "protein":
+                protein = _synthetic_protein(len(server.routes))
+                metadata = dict(protein["metadata"], accession=url.rsplit("/", 1)[1], sequence=protein["extra_fields"]["sequence"])
+                server.add(url, {"metadata": metadata})
+            else:
+                server.add(url, structure, headers={"Content-Type": "application/octet-stream"})
+
+
+def record_benchmarks(directory: str, client: InterProClient = None):
+    """Record the live responses needed by every benchmark in directory, for MockServer.load."""
+    saved = 0
+    for _, requests, _ in _benchmarks():
+        for kind, url in requests:
+            if kind == "count":
+                saved += record([InterProFetcher._count_url(url)], directory, client, follow=False)
+            else:
+                saved += record([url], directory, client)
+    return saved
+
+
+def _peak_rss():
+    """Return the peak resident memory of this process in bytes, or None if unknown (PRIVATE)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _make_client(max_connections, rate):
+    """Return the client of one benchmark run (PRIVATE)."""
+    if rate is None:
+        # Measure the client, not the politeness of its rate limiter
+        rate_limiter = RateLimiter(rate=1e6, burst=1e6, max_rate=1e6)
+    else:
+        rate_limiter = RateLimiter(rate=rate, burst=rate, max_rate=rate)
+    return InterProClient(max_connections=max_connections, rate_limiter=rate_limiter, retry=RetryPolicy(base_delay=0.05, max_delay=1))
+
+
+def _run_one(name, api_url, pdb_download_url, max_connections, rate):
+    """Run one benchmark and return its records, seconds and peak RSS (PRIVATE)."""
+    run = next(run for benchmark, _, run in _benchmarks() if benchmark == name)
+    with tempfile.TemporaryDirectory() as directory, _make_client(max_connections, rate) as client:
+        with contextlib.redirect_stdout(io.StringIO()):
+            InterProFetcher.API_URL = api_url
+            InterProFetcher.PDB_DOWNLOAD_URL = pdb_download_url
+            start = time.perf_counter()
+            records = run(client, directory)
+            seconds = time.perf_counter() - start
+    return records, seconds, _peak_rss()
+
+
+def _run_isolated(connection, *args):
+    """Run one benchmark in a child process and send back its result (PRIVATE)."""
+    try:
+        connection.send(_run_one(*args))
+    except BaseException as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+def run_benchmarks(server: MockServer, names=None, max_connections: int = 8, rate: float = None, isolate: bool = False):
+    """Run benchmarks against a MockServer and return their measurements.
+
+    Args:
+        server (MockServer): server holding the responses, e.g. filled by populate or MockServer.load.
+        names (iterable, optional): benchmarks to run, among BENCHMARKS. Defaults to all of them.
+        max_connections (int, optional): connections per host of the client. Defaults to 8.
+        rate (float, optional): requests per second allowed by the client rate limiter. Defaults to None (unlimited).
+        isolate (bool, optional): run every benchmark in a fresh Python process, so that peak_rss is its own. Defaults to False.
+
+    Returns:
+        list: one dict per benchmark with name, seconds, requests, errors, records, bytes, requests_per_second, records_per_second, bytes_per_second and peak_rss (bytes, None if unknown).
+    """
+    results = []
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark {name!r}, expected one of {', '.join(BENCHMARKS)}")
+        server.reset_stats()
+        args = (name, server.api_url, server.pdb_download_url, max_connections, rate)
+        if isolate:
+            context = multiprocessing.get_context("spawn")
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_isolated, args=(sender, *args))
+            process.start()
+            sender.close()
+            outcome = receiver.recv()
+            process.join()
+            if isinstance(outcome, BaseException):
+                raise outcome
+            records, seconds, peak_rss = outcome
+        else:
+            with server.patch():
+                records, seconds, peak_rss = _run_one(*args)
+        stats = dict(server.stats)
+        results.append({
+            "name": name,
+            "seconds": seconds,
+            "requests": stats["requests"],
+            "errors": stats["errors"],
+            "records": records,
+            "bytes": stats["bytes_sent"],
+            "requests_per_second": stats["requests"] / seconds,
+            "records_per_second": records / seconds,
+            "bytes_per_second": stats["bytes_sent"] / seconds,
+            "peak_rss": peak_rss,
+        })
+    return results
+
+
+def format_result(result: dict) -> str:
+    """Return one line summarising a result of run_benchmarks."""
+    peak_rss = "?" if result["peak_rss"] is None else "%.1f MiB" % (result["peak_rss"] / (1 << 20))
+    return "%-24s %8.3fs %8.1f req/s %10.1f rec/s %10.1f KiB/s  peak RSS %s" % (
+        result["name"], result["seconds"], result["requests_per_second"], result["records_per_second"], result["bytes_per_second"] / 1024, peak_rss,
+    )
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m Bio.InterProFetcher.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", metavar="benchmark", help="benchmarks to run (default: all of %s)" % ", ".join(BENCHMARKS))
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="DIRECTORY", help="replay a recording instead of synthetic data")
+    source.add_argument("--record", metavar="DIRECTORY", help="record the live responses of the benchmarks and exit")
+    parser.add_argument("--records", type=int, default=2000, help="results per synthetic query (default: 2000)")
+    parser.add_argument("--latency", type=float, default=0, help="seconds of server latency per request")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests failing with 408/429/5xx")
+    parser.add_argument("--bandwidth", type=float, default=None, help="server throughput cap in bytes per second")
+    parser.add_argument("--connections", type=int, default=8, help="connections per host of the client (default: 8)")
+    parser.add_argument("--rate", type=float, default=None, help="client rate limit in requests per second (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the error injection")
+    parser.add_argument("--no-isolate", dest="isolate", action="store_false", help="run all benchmarks in this process (peak RSS is then cumulative)")
+    args = parser.parse_args(argv)
+    if args.record:
+        print("Saved %d responses to %s" % (record_benchmarks(args.record), args.record))
+        return
+    options = {"latency": args.latency, "error_rate": args.error_rate, "bandwidth": args.bandwidth, "seed": args.seed}
+    if args.replay:
+        server = MockServer.load(args.replay, **options)
+    else:
+        server = MockServer(**options)
+        populate(server, args.records)
+    with server:
+        for result in run_benchmarks(server, args.names, args.connections, args.rate, args.isolate):
+            print(format_result(result))
+
+
+if __name__ == "__main__":
+    main()
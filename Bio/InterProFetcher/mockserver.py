@@ -0,0 +1,288 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Local stand-in for the InterPro API and the RCSB file server.
+
+``MockServer`` answers on 127.0.0.1 with canned responses, either added
+one by one or replayed from a directory written by ``record``. Latency,
+transient errors (408, 429 and 5xx) and a bandwidth cap can be injected,
+so that connection pooling, concurrency, retries and caching can be
+measured and tested without touching EBI or RCSB::
+
+    from Bio import InterProFetcher
+    from Bio.InterProFetcher.mockserver import MockServer, record
+
+    record([InterProFetcher._proteomes_url("yeast")], "recording")
+
+    with MockServer.load("recording", latency=0.05, error_rate=0.01) as server:
+        with server.patch():
+            InterProFetcher.browse_proteomes("yeast", write_on_sdout=False)
+        print(server.stats)
+
+The InterPro API is served under ``/interpro/api`` and RCSB downloads
+under ``/download``, as on the real servers, and ``patch`` points
+``API_URL`` and ``PDB_DOWNLOAD_URL`` at them. Absolute ``next`` links of
+recorded pages are rewritten to the local server.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlsplit
+
+from Bio import InterProFetcher
+
+from ._client import get_default_client
+
+
+API_PATH = "/interpro/api"
+PDB_DOWNLOAD_PATH = "/download"
+# Origins of recorded absolute links, longest first
+_ORIGINS = (b"https://www.ebi.ac.uk:443", b"https://www.ebi.ac.uk", b"https://files.rcsb.org")
+_CHUNK_SIZE = 1 << 14
+
+
+def _route_key(url):
+    """Return the path and query string of a URL (PRIVATE)."""
+    parts = urlsplit(url)
+    return parts.path + ("?" + parts.query if parts.query else "")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Hand every request to the MockServer (PRIVATE)."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.mock._serve(self)
+
+
+class MockServer:
+    """Keep-alive HTTP server replaying canned InterPro and RCSB responses.
+
+    The server starts listening when it is created; ``url`` is its base URL.
+    Requests for unknown paths are answered with 404. Each request first
+    waits ``latency`` seconds, then fails with probability ``error_rate``
+    with one of ``error_statuses`` (429 and 503 carry a ``Retry-After``
+    header when ``retry_after`` is set). JSON bodies are sent gzip
+    compressed to clients accepting it, like the InterPro API does.
+
+    Args:
+        latency (float, optional): seconds waited before every response. Defaults to 0.
+        error_rate (float, optional): fraction of requests answered with a transient error. Defaults to 0.
+        error_statuses (tuple, optional): statuses of the injected errors. Defaults to 408, 429, 500, 502, 503 and 504.
+        bandwidth (float, optional): cap on the bytes sent per second, shared by all connections. Defaults to None (no cap).
+        retry_after (int, optional): value of the Retry-After header of injected 429 and 503 errors. Defaults to None (no header).
+        seed (int, optional): seed of the random error injection, for reproducible runs.
+    """
+
+    def __init__(self, latency: float = 0, error_rate: float = 0, error_statuses: tuple = (408, 429, 500, 502, 503, 504), bandwidth: float = None, retry_after: int = None, seed: int = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.bandwidth = bandwidth
+        self.retry_after = retry_after
+        self.routes = {}
+        self.requests = []
+        self.stats = {"requests": 0, "errors": 0, "bytes_sent": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self.url = "http://127.0.0.1:%d" % self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def api_url(self) -> str:
+        """Replacement of InterProFetcher.API_URL."""
+        return self.url + API_PATH
+
+    @property
+    def pdb_download_url(self) -> str:
+        """Replacement of InterProFetcher.PDB_DOWNLOAD_URL."""
+        return self.url + PDB_DOWNLOAD_PATH
+
+    def close(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def patch(self):
+        """Point the InterProFetcher functions at this server while the context is active."""
+        with mock.patch.object(InterProFetcher, "API_URL", self.api_url), mock.patch.object(InterProFetcher, "PDB_DOWNLOAD_URL", self.pdb_download_url):
+            yield self
+
+    def reset_stats(self):
+        """Forget the requests served so far."""
+        with self._lock:
+            self.requests = []
+            self.stats = {"requests": 0, "errors": 0, "bytes_sent": 0}
+
+    def add(self, url: str, body, status: int = 200, headers: dict = None):
+        """Serve a response for a URL of this server, or a path such as ``/interpro/api/entry/pfam/``.
+
+        Args:
+            url (str): URL or path and query string of the request.
+            body (bytes, str, dict or list): response body; dicts and lists are sent as JSON.
+            status (int, optional): HTTP status. Defaults to 200.
+            headers (dict, optional): extra response headers.
+        """
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers.setdefault("Content-Type", "application/json")
+        elif isinstance(body, str):
+            body = body.encode()
+        for origin in _ORIGINS:
+            body = body.replace(origin, self.url.encode())
+        compressed = None
+        if headers.get("Content-Type", "").startswith("application/json"):
+            compressed = gzip.compress(body, compresslevel=6)
+        self.routes[_route_key(url)] = (status, headers, body, compressed)
+
+    def add_pages(self, url: str, pages):
+        """Serve lists of results as a cursor paginated InterPro query starting at url."""
+        url = _route_key(url)
+        separator = "&" if "?" in url else "?"
+        count = sum(map(len, pages))
+        for number, results in enumerate(pages):
+            following = self.url + url + separator + "cursor=%d" % (number + 1) if number + 1 < len(pages) else None
+            page_url = url + (separator + "cursor=%d" % number if number else "")
+            self.add(page_url, {"count": count, "next": following, "previous": None, "results": results})
+
+    @classmethod
+    def load(cls, directory: str, **kwargs):
+        """Start a server replaying the responses saved by record in directory.
+
+        Keyword arguments are passed on to MockServer.
+        """
+        server = cls(**kwargs)
+        with open(os.path.join(directory, "index.json")) as handle:
+            index = json.load(handle)
+        for key, entry in index.items():
+            with open(os.path.join(directory, entry["file"]), "rb") as handle:
+                body = handle.read()
+            if "origin" in entry:
+                body = body.replace(entry["origin"].encode(), server.url.encode())
+            server.add(key, body, entry["status"], entry["headers"])
+        return server
+
+    def _serve(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+            self.stats["requests"] += 1
+            inject_error = self.error_rate and self._random.random() < self.error_rate
+            if inject_error:
+                self.stats["errors"] += 1
+                error_status = self._random.choice(self.error_statuses)
+        if self.latency:
+            time.sleep(self.latency)
+        if inject_error:
+            headers = {}
+            if self.retry_after is not None and error_status in (429, 503):
+                headers["Retry-After"] = str(self.retry_after)
+            status, body = error_status, b""
+        else:
+            status, headers, body, compressed = self.routes.get(handler.path, (404, {}, b"not found", None))
+            headers = dict(headers)
+            if compressed is not None and "gzip" in handler.headers.get("Accept-Encoding", ""):
+                headers["Content-Encoding"] = "gzip"
+                body = compressed
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        for start in range(0, len(body), _CHUNK_SIZE):
+            chunk = body[start:start + _CHUNK_SIZE]
+            self._throttle(len(chunk))
+            handler.wfile.write(chunk)
+        with self._lock:
+            self.stats["bytes_sent"] += len(body)
+
+    def _throttle(self, size):
+        """Wait until size more bytes fit in the bandwidth cap (PRIVATE)."""
+        if not self.bandwidth:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._free_at)
+            self._free_at = start + size / self.bandwidth
+        if start > now:
+            time.sleep(start - now)
+
+
+def record(urls, directory: str, client=None, follow: bool = True):
+    """Download URLs from the live servers and save them for MockServer.load.
+
+    Paginated InterPro queries are followed to their last page unless
+    follow is False. Responses already in the directory are kept, so a
+    recording can be extended.
+
+    Args:
+        urls (iterable): InterPro API or RCSB download URLs, e.g. from the InterProFetcher URL helpers.
+        directory (str): recording directory, created if missing.
+        client (InterProClient, optional): client used for the requests. Defaults to the shared module client.
+        follow (bool, optional): also record the following pages of paginated queries. Defaults to True.
+
+    Returns:
+        int: number of responses saved.
+    """
+    client = client or get_default_client()
+    os.makedirs(directory, exist_ok=True)
+    index_filename = os.path.join(directory, "index.json")
+    index = {}
+    if os.path.exists(index_filename):
+        with open(index_filename) as handle:
+            index = json.load(handle)
+    saved = 0
+    for url in urls:
+        while url:
+            key = _route_key(url)
+            response = client.request(url)
+            body = response.read()
+            content_type = response.headers.get("Content-Type", "")
+            filename = hashlib.sha1(key.encode()).hexdigest() + (".json" if "json" in content_type else ".bin")
+            with open(os.path.join(directory, filename), "wb") as handle:
+                handle.write(body)
+            parts = urlsplit(url)
+            index[key] = {
+                "status": response.status,
+                "headers": {"Content-Type": content_type} if content_type else {},
+                "file": filename,
+                "origin": parts.scheme + "://" + parts.netloc,
+            }
+            saved += 1
+            url = None
+            if follow and "json" in content_type and response.status == 200:
+                payload = json.loads(body)
+                if isinstance(payload, dict):
+                    url = payload.get("next")
+    with open(index_filename, "w") as handle:
+        json.dump(index, handle, indent=1, sort_keys=True)
+    return saved
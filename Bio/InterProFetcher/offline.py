@@ -0,0 +1,366 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Answer common InterProFetcher queries offline from InterPro release files.
+
+InterPro publishes its data as bulk files with every release
+(https://ftp.ebi.ac.uk/pub/databases/interpro/current_release/):
+
+- ``entry.list``: accession, type and name of every InterPro entry;
+- ``protein2ipr.dat.gz``: every UniProt protein with the InterPro entries
+  and member database signatures matching it.
+
+``OfflineIndex.build`` streams these files into a SQLite database, which
+then answers ``browse_proteins`` and ``browse_by_type`` queries in
+milliseconds instead of hours of pagination::
+
+    from Bio.InterProFetcher.offline import OfflineIndex
+    index = OfflineIndex.build("interpro.sqlite", "protein2ipr.dat.gz", "entry.list", "uniprot.tsv.gz")
+    index.browse_proteins("pfam", "gorilla gorilla")
+
+The release files have no taxonomy or review status, so filtering by
+organism or on reviewed proteins needs a UniProt table with the columns
+"Entry", "Reviewed", "Organism" and "Organism (ID)", as exported in TSV
+format from https://www.uniprot.org (any of the last three may be missing).
+
+Once registered with ``set_offline_index``, the index is used by
+``Bio.InterProFetcher.browse_proteins`` and ``browse_by_type`` for every
+query it can answer; the other queries still go to the InterPro API.
+"""
+
+import csv
+import gzip
+import re
+import sqlite3
+import threading
+
+
+# Member database of a signature, from its accession.
+_SIGNATURE_DATABASES = (
+    (re.compile(r"PF\d"), "pfam"),
+    (re.compile(r"PTHR\d"), "panther"),
+    (re.compile(r"G3DSA:"), "cathgene3d"),
+    (re.compile(r"SSF\d"), "ssf"),
+    (re.compile(r"SM\d"), "smart"),
+    (re.compile(r"PS5\d"), "profile"),
+    (re.compile(r"PS\d"), "prosite"),
+    (re.compile(r"PR\d"), "prints"),
+    (re.compile(r"PIRSF\d"), "pirsf"),
+    (re.compile(r"MF_\d"), "hamap"),
+    (re.compile(r"SFLD[FGS]\d"), "sfld"),
+    (re.compile(r"cd\d"), "cdd"),
+    (re.compile(r"(TIGR|NF)\d"), "ncbifam"),
+)
+
+_SCHEMA = """
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    accession TEXT UNIQUE NOT NULL,
+    database TEXT NOT NULL,
+    type TEXT,
+    name TEXT
+);
+CREATE TABLE proteins (
+    id INTEGER PRIMARY KEY,
+    accession TEXT UNIQUE NOT NULL,
+    organism TEXT,
+    tax_id INTEGER,
+    reviewed INTEGER
+);
+CREATE TABLE matches (
+    entry INTEGER NOT NULL,
+    protein INTEGER NOT NULL,
+    PRIMARY KEY (entry, protein)
+) WITHOUT ROWID;
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INDEXES = """
+CREATE INDEX entries_database ON entries (database, type);
+"""
+
+_BATCH_SIZE = 100000
+
+
+def signature_database(accession: str):
+    """Return the member database name of a signature accession, or None if unknown."""
+    for pattern, database in _SIGNATURE_DATABASES:
+        if pattern.match(accession):
+            return database
+    return None
+
+
+def _open_text(filename):
+    """Open a plain or gzip compressed text file (PRIVATE)."""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt", newline="")
+    return open(filename, newline="")
+
+
+def _like_all(columns, text):
+    """Return SQL requiring every word of text in one of columns, with its parameters (PRIVATE)."""
+    clauses = []
+    parameters = []
+    for word in text.split():
+        clauses.append("(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")")
+        parameters.extend(["%" + word + "%"] * len(columns))
+    return clauses, parameters
+
+
+class OfflineIndex:
+    """SQLite index of InterPro matches built from the release files.
+
+    Open an existing index with ``OfflineIndex(path)`` or create one with
+    ``OfflineIndex.build``. The index can be shared between threads.
+
+    Args:
+        path (str): path of the SQLite file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        info = dict(self._execute("SELECT key, value FROM info"))
+        self.has_organisms = info.get("organisms") == "1"
+        self.has_reviewed = info.get("reviewed") == "1"
+        self.databases = {database for database, in self._execute("SELECT DISTINCT database FROM entries")}
+
+    def _connection(self):
+        # sqlite3 connections must stay in the thread that opened them
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return connection
+
+    def _execute(self, sql, parameters=()):
+        return self._connection().execute(sql, parameters).fetchall()
+
+    @classmethod
+    def build(cls, path: str, protein2ipr: str, entry_list: str = None, proteins: str = None):
+        """
+        Create an index from InterPro release files.
+
+        The files are read as streams (gzip compressed or not), so memory use
+        does not depend on their size. An existing index at path is replaced.
+
+        Args:
+            path (str): path of the SQLite file to create.
+            protein2ipr (str): the protein2ipr.dat(.gz) file.
+            entry_list (str, optional): the entry.list file giving the type of every InterPro entry. Without it browse_by_type cannot be answered.
+            proteins (str, optional): UniProt TSV export with "Entry" and any of "Reviewed", "Organism" and "Organism (ID)" columns.
+
+        Returns:
+            OfflineIndex
+        """
+        connection = sqlite3.connect(path)
+        try:
+            connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;")
+            for table in ("entries", "proteins", "matches", "info"):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.executescript(_SCHEMA)
+            builder = _Builder(connection)
+            if entry_list is not None:
+                builder.load_entry_list(entry_list)
+            builder.load_protein2ipr(protein2ipr)
+            info = {"organisms": "0", "reviewed": "0"}
+            if proteins is not None:
+                info.update(builder.load_proteins(proteins))
+            connection.executemany("INSERT INTO info VALUES (?, ?)", info.items())
+            connection.executescript(_INDEXES)
+            connection.commit()
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+        return cls(path)
+
+    def can_browse_proteins(self, database: str, organism: str = "", reviewed: bool = False) -> bool:
+        """Check whether browse_proteins can be answered from the index."""
+        if database.lower() not in self.databases:
+            return False
+        if organism.strip() and not self.has_organisms:
+            return False
+        return self.has_reviewed or not reviewed
+
+    def browse_proteins(self, database: str, organism: str = "", reviewed: bool = False):
+        """
+        Return the proteins matching a database, like InterProFetcher.browse_proteins.
+
+        The organism is matched on its tax ID, if numeric, or else on every
+        word appearing in the organism name, ignoring case.
+
+        Args:
+            database (str): name of the database (InterPro, cathgene3d, cdd, hamap, ncbifam, panther, pfam, pirsf, prints, profile, prosite, sfld, smart, ssf).
+            organism (str, optional): species name or tax ID.
+            reviewed (bool, optional): only reviewed proteins. Defaults to False.
+
+        Returns:
+            list: protein accession numbers, sorted.
+        """
+        if not self.can_browse_proteins(database, organism, reviewed):
+            raise ValueError(f"The offline index cannot answer this query for database {database!r}")
+        clauses = ["e.database = ?"]
+        parameters = [database.lower()]
+        organism = organism.strip()
+        if organism.isdigit():
+            clauses.append("p.tax_id = ?")
+            parameters.append(int(organism))
+        elif organism:
+            words, word_parameters = _like_all(["p.organism"], organism)
+            clauses += words
+            parameters += word_parameters
+        if reviewed:
+            clauses.append("p.reviewed = 1")
+        sql = f"""SELECT DISTINCT p.accession FROM entries e
+                  JOIN matches m ON m.entry = e.id JOIN proteins p ON p.id = m.protein
+                  WHERE {" AND ".join(clauses)} ORDER BY p.accession"""
+        return [accession for accession, in self._execute(sql, parameters)]
+
+    def can_browse_by_type(self) -> bool:
+        """Check whether browse_by_type can be answered (the index was built with entry.list)."""
+        return bool(self._execute("SELECT 1 FROM entries WHERE database = 'interpro' AND type IS NOT NULL LIMIT 1"))
+
+    def browse_by_type(self, type: str, keyword: str = ""):
+        """
+        Return the InterPro entries of a type, like InterProFetcher.browse_by_type.
+
+        Every word of keyword must appear in the entry name or accession,
+        ignoring case.
+
+        Args:
+            type (str): type of entry (family, domain, homologous_superfamily, repeat, conserved_site, active_site, binding_site, ptm).
+            keyword (str, optional): keyword used to filter the entries. Defaults to "".
+
+        Returns:
+            list: InterPro accession numbers, sorted.
+        """
+        clauses, parameters = _like_all(["name", "accession"], keyword)
+        clauses[:0] = ["database = 'interpro'", "type = ?"]
+        sql = f"SELECT accession FROM entries WHERE {' AND '.join(clauses)} ORDER BY accession"
+        return [accession for accession, in self._execute(sql, [type.lower()] + parameters)]
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class _Builder:
+    """Fill the tables of a new index (PRIVATE)."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.entries = {}
+
+    def entry_id(self, accession, database, name=None):
+        entry_id = self.entries.get(accession)
+        if entry_id is None:
+            cursor = self.connection.execute("INSERT INTO entries (accession, database, name) VALUES (?, ?, ?)", (accession, database, name))
+            entry_id = self.entries[accession] = cursor.lastrowid
+        return entry_id
+
+    def load_entry_list(self, filename):
+        with _open_text(filename) as handle:
+            rows = csv.reader(handle, delimiter="\t")
+            for row in rows:
+                if len(row) < 3 or row[0] == "ENTRY_AC":
+                    continue
+                accession, entry_type, name = row[:3]
+                cursor = self.connection.execute("INSERT INTO entries (accession, database, type, name) VALUES (?, 'interpro', ?, ?)", (accession, entry_type.lower(), name))
+                self.entries[accession] = cursor.lastrowid
+
+    def load_protein2ipr(self, filename):
+        proteins = []
+        matches = []
+        current = None
+        protein_id = 0
+        seen = set()
+        with _open_text(filename) as handle:
+            # protein2ipr is sorted by protein, so the matches of a protein
+            # are deduplicated while it is current. A protein whose lines are
+            # not contiguous gets a new ID, merged into the first by _flush.
+            for row in csv.reader(handle, delimiter="\t"):
+                if len(row) < 4:
+                    continue
+                accession, interpro, interpro_name, signature = row[:4]
+                if accession != current:
+                    current = accession
+                    protein_id += 1
+                    proteins.append((protein_id, accession))
+                    seen.clear()
+                if interpro not in seen:
+                    seen.add(interpro)
+                    matches.append((self.entry_id(interpro, "interpro", interpro_name), protein_id))
+                database = signature_database(signature)
+                if signature not in seen and database is not None:
+                    seen.add(signature)
+                    matches.append((self.entry_id(signature, database), protein_id))
+                if len(matches) >= _BATCH_SIZE:
+                    self._flush(proteins, matches)
+        self._flush(proteins, matches)
+
+    def _flush(self, proteins, matches):
+        cursor = self.connection.executemany("INSERT OR IGNORE INTO proteins (id, accession) VALUES (?, ?)", proteins)
+        if cursor.rowcount != len(proteins):
+            # Some proteins were already added from an earlier run of their
+            # lines: move their matches to the existing row.
+            moved = {}
+            for protein_id, accession in proteins:
+                (existing,) = self.connection.execute("SELECT id FROM proteins WHERE accession = ?", (accession,)).fetchone()
+                if existing != protein_id:
+                    moved[protein_id] = existing
+            matches[:] = [(entry_id, moved.get(protein_id, protein_id)) for entry_id, protein_id in matches]
+        # OR IGNORE drops the matches such a protein already had
+        self.connection.executemany("INSERT OR IGNORE INTO matches VALUES (?, ?)", matches)
+        proteins.clear()
+        matches.clear()
+
+    def load_proteins(self, filename):
+        """Add organism and review status from a UniProt TSV export, return the info flags."""
+        with _open_text(filename) as handle:
+            rows = csv.DictReader(handle, delimiter="\t")
+            columns = rows.fieldnames or []
+            if "Entry" not in columns:
+                raise ValueError(f"{filename} has no 'Entry' column")
+            batch = []
+            for row in rows:
+                tax_id = row.get("Organism (ID)")
+                reviewed = row.get("Reviewed")
+                batch.append((
+                    row.get("Organism"),
+                    int(tax_id) if tax_id else None,
+                    None if reviewed is None else int(reviewed.lower() == "reviewed"),
+                    row["Entry"],
+                ))
+                if len(batch) >= _BATCH_SIZE:
+                    self.connection.executemany("UPDATE proteins SET organism = ?, tax_id = ?, reviewed = ? WHERE accession = ?", batch)
+                    batch.clear()
+            self.connection.executemany("UPDATE proteins SET organism = ?, tax_id = ?, reviewed = ? WHERE accession = ?", batch)
+        return {
+            "organisms": str(int("Organism" in columns or "Organism (ID)" in columns)),
+            "reviewed": str(int("Reviewed" in columns)),
+        }
+
+
+_offline_index = None
+
+
+def set_offline_index(index):
+    """
+    Make the InterProFetcher browse functions answer queries from an offline index.
+
+    Args:
+        index (OfflineIndex or str): the index, or the path of its SQLite file. None goes back to always using the InterPro API.
+    """
+    global _offline_index
+    if isinstance(index, str):
+        index = OfflineIndex(index)
+    _offline_index = index
+
+
+def get_offline_index():
+    """Return the offline index registered with set_offline_index, or None."""
+    return _offline_index
@@ -0,0 +1,255 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Combine InterPro queries with set operations.
+
+A ``Query`` describes the accessions returned by one InterPro API list
+endpoint, such as the proteins matching a Pfam family or the structures of
+an organism. Queries are combined with ``|`` (union), ``&`` (intersection)
+and ``-`` (difference), with each other or with accessions already at
+hand, and evaluated with ``fetch``::
+
+    from Bio.InterProFetcher.sets import Query
+
+    kringle = Query.proteins("pfam", entry="PF00051")
+    human = Query.proteins("UniProt", tax_id=9606)
+    reviewed = Query.proteins("reviewed")
+    (kringle & human & reviewed).fetch()
+
+Where the API can express an intersection as one filtered URL, here
+``/protein/reviewed/entry/pfam/PF00051/taxonomy/uniprot/9606/``, it is
+sent as a single query, so only the proteins in the intersection are
+paginated. Other combinations fetch each side (concurrently) and combine
+them locally as sorted ``AccessionArray`` objects.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode
+
+from Bio import InterProFetcher
+
+from ._accessions import AccessionArray
+
+
+class _Node:
+    """Base of the set expressions (PRIVATE)."""
+
+    def __or__(self, other):
+        return _Combination("|", self, _as_node(other))
+
+    def __ror__(self, other):
+        return _Combination("|", _as_node(other), self)
+
+    def __and__(self, other):
+        other = _as_node(other)
+        merged = _merge(self, other)
+        return merged if merged is not None else _Combination("&", self, other)
+
+    def __rand__(self, other):
+        return _as_node(other) & self
+
+    def __sub__(self, other):
+        return _Combination("-", self, _as_node(other))
+
+    def __rsub__(self, other):
+        return _Combination("-", _as_node(other), self)
+
+    def fetch(self, client=None, progress=None) -> AccessionArray:
+        """Evaluate the expression and return its accessions, sorted and unique."""
+        raise NotImplementedError
+
+
+class Query(_Node):
+    """Accessions returned by one InterPro API list endpoint.
+
+    Most queries are built with the ``proteins``, ``structures`` and
+    ``entries`` constructors. The API URL is
+    ``{API_URL}/{endpoint}/{database}/`` followed by one
+    ``{endpoint}/{database}/[{accession}/]`` part per filter, e.g.
+    ``/protein/UniProt/entry/pfam/PF00051/taxonomy/uniprot/9606/``, and by
+    the query string parameters.
+
+    Args:
+        endpoint (str): main endpoint ("protein", "structure", "entry", "proteome" or "taxonomy").
+        database (str): database of the main endpoint, e.g. "UniProt", "reviewed", "PDB", "InterPro" or "pfam".
+        filters (dict, optional): maps a filter endpoint to its (database, accession) pair; the accession may be None.
+        params (dict, optional): query string parameters, e.g. {"search": "kinase"}.
+    """
+
+    def __init__(self, endpoint: str, database: str, filters: dict = None, params: dict = None):
+        self.endpoint = endpoint
+        self.database = database
+        self.filters = dict(filters or {})
+        self.params = dict(params or {})
+
+    @classmethod
+    def proteins(cls, database: str = "UniProt", entry: str = None, organism: str = "", tax_id: int = None, proteome: str = None, length: tuple = None, is_fragment: bool = None):
+        """
+        Build a protein query.
+
+        Args:
+            database (str, optional): "UniProt", "reviewed" or "unreviewed" for all proteins, or an entry database (InterPro, pfam, ...) for the proteins matching it. Defaults to "UniProt".
+            entry (str, optional): accession of an entry of database the proteins must match.
+            organism (str, optional): free text search, as in browse_proteins.
+            tax_id (int, optional): NCBI taxonomy ID of the organism.
+            proteome (str, optional): UniProt proteome ID.
+            length (tuple, optional): (minimum, maximum) sequence length, inclusive.
+            is_fragment (bool, optional): only fragments (True) or only complete sequences (False).
+        """
+        filters = {}
+        if database.lower() in ("uniprot", "reviewed", "unreviewed"):
+            if entry is not None:
+                raise ValueError("entry needs an entry database, e.g. Query.proteins('pfam', entry='PF00051')")
+            protein_database = database
+        else:
+            protein_database = "UniProt"
+            filters["entry"] = (database, entry)
+        if tax_id is not None:
+            filters["taxonomy"] = ("uniprot", str(tax_id))
+        if proteome is not None:
+            filters["proteome"] = ("uniprot", proteome)
+        params = {"search": organism.strip()} if organism.strip() else {}
+        if length is not None:
+            params["length"] = "%d-%d" % tuple(length)
+        if is_fragment is not None:
+            params["is_fragment"] = "true" if is_fragment else "false"
+        return cls("protein", protein_database, filters, params)
+
+    @classmethod
+    def structures(cls, database: str = "PDB", entry: str = None, keyword: str = "", resolution: str = "", tax_id: int = None):
+        """
+        Build a PDB structure query.
+
+        Args:
+            database (str, optional): "PDB" for all structures, or an entry database for the structures matching it. Defaults to "PDB".
+            entry (str, optional): accession of an entry of database the structures must match.
+            keyword (str, optional): free text search, as in browse_structures.
+            resolution (str, optional): resolution range ('0-2', '2-4' or '4-100').
+            tax_id (int, optional): NCBI taxonomy ID of the organism.
+        """
+        filters = {}
+        if database.lower() != "pdb":
+            filters["entry"] = (database, entry)
+        if tax_id is not None:
+            filters["taxonomy"] = ("uniprot", str(tax_id))
+        params = {}
+        if keyword.strip():
+            params["search"] = keyword.strip()
+        if resolution:
+            params["resolution"] = resolution
+        return cls("structure", "PDB", filters, params)
+
+    @classmethod
+    def entries(cls, database: str = "InterPro", type: str = "", keyword: str = "", tax_id: int = None):
+        """
+        Build an entry query.
+
+        Args:
+            database (str, optional): entry database. Defaults to "InterPro".
+            type (str, optional): entry type, e.g. "family" or "domain".
+            keyword (str, optional): free text search, as in browse_by_type.
+            tax_id (int, optional): only entries matching proteins of this NCBI taxonomy ID.
+        """
+        filters = {}
+        if tax_id is not None:
+            filters["taxonomy"] = ("uniprot", str(tax_id))
+        params = {}
+        if type:
+            params["type"] = type
+        if keyword.strip():
+            params["search"] = keyword.strip()
+        return cls("entry", database, filters, params)
+
+    @property
+    def url(self) -> str:
+        """URL of the first page of the query."""
+        path = [self.endpoint, self.database]
+        for endpoint, (database, accession) in self.filters.items():
+            path += [endpoint, database] + ([accession] if accession else [])
+        query = urlencode(dict(self.params, page_size=InterProFetcher.PAGE_SIZE), quote_via=quote)
+        return f"{InterProFetcher.API_URL}/{'/'.join(path)}/?{query}"
+
+    def fetch(self, client=None, progress=None) -> AccessionArray:
+        return AccessionArray(InterProFetcher._iter_results(self.url, False, client, progress)).unique()
+
+    def __repr__(self):
+        return f"Query({self.endpoint!r}, {self.database!r}, {self.filters!r}, {self.params!r})"
+
+
+class _Accessions(_Node):
+    """Accessions already at hand, as an operand (PRIVATE)."""
+
+    def __init__(self, accessions):
+        if not isinstance(accessions, AccessionArray):
+            accessions = AccessionArray(accessions)
+        self.accessions = accessions
+
+    def fetch(self, client=None, progress=None):
+        return self.accessions.unique()
+
+
+class _Combination(_Node):
+    """Set operation evaluated on the client (PRIVATE)."""
+
+    _OPERATIONS = {"|": AccessionArray.union, "&": AccessionArray.intersection, "-": AccessionArray.difference}
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def fetch(self, client=None, progress=None):
+        with ThreadPoolExecutor(2) as executor:
+            left = executor.submit(self.left.fetch, client, progress)
+            right = self.right.fetch(client, progress)
+            return self._OPERATIONS[self.operator](left.result(), right)
+
+    def __repr__(self):
+        return f"({self.left!r} {self.operator} {self.right!r})"
+
+
+def _as_node(value):
+    """Wrap accessions so they can be combined with queries (PRIVATE)."""
+    if isinstance(value, _Node):
+        return value
+    if isinstance(value, str):
+        raise TypeError("Combine queries with an iterable of accessions, not a single string")
+    return _Accessions(value)
+
+
+def _merge(left, right):
+    """Return one Query for the intersection of two expressions, or None (PRIVATE)."""
+    if isinstance(left, Query) and isinstance(right, Query):
+        return _merge_queries(left, right)
+    # Intersections are associative: push a query into either side
+    for combination, other in ((left, right), (right, left)):
+        if isinstance(combination, _Combination) and combination.operator == "&" and isinstance(other, Query):
+            for side, rest in ((combination.left, combination.right), (combination.right, combination.left)):
+                merged = _merge(side, other)
+                if merged is not None:
+                    return _Combination("&", merged, rest)
+    return None
+
+
+def _merge_queries(left, right):
+    if left.endpoint != right.endpoint:
+        return None
+    databases = {left.database.lower(), right.database.lower()}
+    if len(databases) == 1:
+        database = left.database
+    elif left.endpoint == "protein" and databases in ({"uniprot", "reviewed"}, {"uniprot", "unreviewed"}):
+        # Reviewed and unreviewed proteins are subsets of UniProt
+        database = right.database if left.database.lower() == "uniprot" else left.database
+    else:
+        return None
+    filters = dict(left.filters)
+    for endpoint, value in right.filters.items():
+        if filters.setdefault(endpoint, value) != value:
+            return None
+    params = dict(left.params)
+    for name, value in right.params.items():
+        if params.setdefault(name, value) != value:
+            return None
+    return Query(left.endpoint, database, filters, params)
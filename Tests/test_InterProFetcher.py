@@ -0,0 +1,947 @@
+# This file is part of the Biopython distribution and governed by your
+# choice of the "Biopython License Agreement" or the "BSD 3-Clause License".
+# Please see the LICENSE file that should have been included as part of this
+# package.
+
+"""Offline tests for Bio.InterProFetcher, run against a local HTTP server."""
+
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+
+from Bio import InterProFetcher
+from Bio.InterProFetcher import InterProClient, Metrics, RateLimiter, ResponseCache, RetryPolicy
+from Bio.InterProFetcher import aio
+from Bio.InterProFetcher import batch
+from Bio.InterProFetcher import benchmark
+from Bio.InterProFetcher._accessions import encode_accession
+from Bio.InterProFetcher._jsonstream import iter_results
+from Bio.InterProFetcher.mockserver import MockServer, record
+from Bio.InterProFetcher.offline import OfflineIndex
+from Bio.InterProFetcher.sets import Query
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        server.connections.add(self.client_address)
+        response = server.routes.get(self.path, (404, {}, b"not found"))
+        if isinstance(response, list):
+            # Canned responses served in turn, the last one repeatedly
+            response = response.pop(0) if len(response) > 1 else response[0]
+        status, headers, body = response
+        if "ETag" in headers and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if "Content-Length" in headers:
+            # Simulate a connection dropped in the middle of the body
+            self.close_connection = True
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Start a keep-alive HTTP server serving canned responses."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.routes = {}
+        self.server.requests = []
+        self.server.connections = set()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.client = InterProClient(max_connections=2, timeout=5, rate_limiter=RateLimiter(rate=100, burst=100, max_rate=100), retry=RetryPolicy(base_delay=0.01, jitter=False))
+        for name in ("API_URL", "PDB_DOWNLOAD_URL"):
+            patcher = mock.patch("Bio.InterProFetcher." + name, self.base)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route(self, path, payload=None, status=200, headers=None, body=None):
+        if body is None:
+            body = json.dumps(payload).encode()
+        self.server.routes[path] = (status, headers or {}, body)
+
+    def route_pages(self, path, pages):
+        """Serve a list of result lists as a cursor paginated query."""
+        for number, results in enumerate(pages):
+            following = self.base + path + "&cursor=%d" % (number + 1) if number + 1 < len(pages) else None
+            self.route(path + ("&cursor=%d" % number if number else ""), {"count": sum(map(len, pages)), "next": following, "results": results})
+
+
+def _protein(accession, sequence="MKV"):
+    return {"metadata": {"accession": accession, "name": accession + " protein"}, "extra_fields": {"sequence": sequence}}
+
+
+class TestInterProClient(LocalServerTestCase):
+    def test_connection_reused(self):
+        self.route("/page", {"results": []})
+        for _ in range(5):
+            self.assertEqual(self.client.get_json(self.base + "/page"), {"results": []})
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_redirect_followed(self):
+        self.route("/old", status=301, headers={"Location": "/new"}, body=b"")
+        self.route("/new", {"ok": True})
+        self.assertEqual(self.client.get_json(self.base + "/old"), {"ok": True})
+
+    def test_gzip_body(self):
+        self.route("/page", headers={"Content-Encoding": "gzip"}, body=gzip.compress(b'{"results": [1]}'))
+        self.assertEqual(self.client.get_json(self.base + "/page"), {"results": [1]})
+
+    def test_http_error(self):
+        with self.assertRaises(HTTPError) as cm:
+            self.client.request(self.base + "/missing")
+        self.assertEqual(cm.exception.code, 404)
+        # The connection is still usable after an error response
+        self.route("/page", {"results": []})
+        self.client.request(self.base + "/page")
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_overload_lowers_rate(self):
+        self.route("/busy", status=429, body=b"")
+        self.client.retry = RetryPolicy(max_attempts=1)
+        rate = self.client.rate_limiter.rate
+        with self.assertRaises(HTTPError):
+            self.client.request(self.base + "/busy")
+        self.assertEqual(self.client.rate_limiter.rate, rate / 2)
+
+
+class TestRetry(LocalServerTestCase):
+    def test_retry_after(self):
+        self.server.routes["/flaky"] = [
+            (503, {"Retry-After": "0"}, b""),
+            (500, {}, b""),
+            (200, {}, b'{"ok": true}'),
+        ]
+        self.assertEqual(self.client.get_json(self.base + "/flaky"), {"ok": True})
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_permanent_error_not_retried(self):
+        self.route("/bad", status=400, body=b"")
+        with self.assertRaises(HTTPError):
+            self.client.request(self.base + "/bad")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_gives_up(self):
+        self.route("/down", status=502, body=b"")
+        with self.assertRaises(HTTPError) as cm:
+            self.client.request(self.base + "/down")
+        self.assertEqual(cm.exception.code, 502)
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_total_budget(self):
+        policy = RetryPolicy(base_delay=10, max_total=15, jitter=False)
+        state = policy.start()
+        error = HTTPError("https://example.org", 503, "Service Unavailable", None, None)
+        self.assertEqual(state.delay(0, error), 10)
+        self.assertIsNone(state.delay(1, error))
+        error = HTTPError("https://example.org", 503, "Service Unavailable", {"Retry-After": "3"}, None)
+        self.assertEqual(state.delay(1, error), 3)
+
+    def test_pagination_retried(self):
+        self.route_pages("/protein/uniprot/?page_size=200", [[_protein("P1")], [_protein("P2")]])
+        path = "/protein/uniprot/?page_size=200&cursor=1"
+        self.server.routes[path] = [(504, {}, b""), self.server.routes[path]]
+        results = list(InterProFetcher._iter_results(self.base + "/protein/uniprot/?page_size=200", False, self.client))
+        self.assertEqual(results, ["P1", "P2"])
+
+    def test_budget_shared_by_job(self):
+        self.client.retry = RetryPolicy(base_delay=0.01, max_total=0.025, jitter=False)
+        for accession in ("P1", "P2", "P3"):
+            self.server.routes["/protein/UniProt/" + accession] = [(503, {}, b""), (200, {}, json.dumps({"metadata": {"accession": accession, "name": "", "sequence": "MKV"}}).encode())]
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), self.assertRaises(HTTPError):
+                InterProFetcher.fetch_protein_sequences(["P1", "P2", "P3"], os.path.join(directory, "out.fasta"), client=self.client, max_workers=1)
+        # The third retry would exceed the budget of the whole call
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_budget_per_proteome(self):
+        self.client.retry = RetryPolicy(base_delay=0.01, max_total=0.015, jitter=False)
+        for number in range(3):
+            path = "/protein/UniProt/entry/InterPro/proteome/uniprot/UP%d/?page_size=200&extra_fields=sequence" % number
+            self.route_pages(path, [[_protein("P%d" % number)]])
+            self.server.routes[path] = [(503, {}, b""), self.server.routes[path]]
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"):
+                files = InterProFetcher.fetch_proteomes(["UP0", "UP1", "UP2"], directory, client=self.client, max_workers=1)
+        self.assertEqual(sorted(files), ["UP0", "UP1", "UP2"])
+
+
+class TestMetrics(LocalServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        self.metrics = Metrics()
+        self.client.hooks = [self.events.append, self.metrics]
+
+    def test_request_event(self):
+        self.server.routes["/flaky"] = [(503, {"Retry-After": "0"}, b""), (200, {"Content-Encoding": "gzip"}, gzip.compress(b'{"ok": true}'))]
+        self.assertEqual(self.client.get_json(self.base + "/flaky"), {"ok": True})
+        [event] = self.events
+        self.assertEqual((event.url, event.status, event.attempts, event.error), (self.base + "/flaky", 200, 2, None))
+        self.assertEqual(event.new_connections, 1)
+        self.assertEqual(event.bytes, len(gzip.compress(b'{"ok": true}')))
+        self.assertGreater(event.ttfb, 0)
+        self.assertGreater(event.decode, 0)
+        self.assertGreaterEqual(event.duration, event.ttfb + event.transfer)
+
+    def test_errors_and_streams(self):
+        self.route("/down", status=404, body=b"")
+        with self.assertRaises(HTTPError):
+            self.client.request(self.base + "/down")
+        self.route("/file", body=b"x" * 1000)
+        with self.client.stream(self.base + "/file") as response:
+            self.assertEqual(len(response.read()), 1000)
+            # Requests made while a stream is open are separate events
+            self.client.request(self.base + "/file")
+        self.assertEqual([(event.status, event.error is not None) for event in self.events], [(404, True), (200, False), (200, False)])
+        self.assertEqual(self.events[2].bytes, 1000)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["requests"], {"404": 1, "200": 2})
+        self.assertEqual(snapshot["counters"]["errors"], 1)
+        self.assertEqual(snapshot["histograms"]["duration"]["count"], 3)
+        text = self.metrics.to_prometheus()
+        self.assertIn('interprofetcher_requests_total{status="200"} 2\n', text)
+        self.assertIn('interprofetcher_duration_seconds_bucket{le="+Inf"} 3\n', text)
+
+
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(latency=0.2)
+        self.addCleanup(self.server.close)
+        self.server.add("/page", {"results": [1]})
+
+    def get_concurrently(self, client, method, threads=4):
+        barrier = threading.Barrier(threads)
+
+        def get():
+            barrier.wait()
+            return getattr(client, method)(self.server.url + "/page")
+
+        with ThreadPoolExecutor(threads) as executor:
+            return list(executor.map(lambda _: get(), range(threads)))
+
+    def test_shared(self):
+        events = []
+        with InterProClient(rate_limiter=RateLimiter(rate=100, burst=100, max_rate=100), hooks=[events.append]) as client:
+            payloads = self.get_concurrently(client, "get_json")
+            self.assertEqual(payloads, [{"results": [1]}] * 4)
+            self.assertTrue(all(payload is payloads[0] for payload in payloads))
+            self.assertEqual(self.server.stats["requests"], 1)
+            self.assertEqual(sorted(event.coalesced for event in events), [False, True, True, True])
+            self.get_concurrently(client, "request")
+            self.assertEqual(self.server.stats["requests"], 2)
+
+    def test_disabled(self):
+        with InterProClient(rate_limiter=RateLimiter(rate=100, burst=100, max_rate=100), coalesce=False) as client:
+            self.get_concurrently(client, "get_json")
+        self.assertEqual(self.server.stats["requests"], 4)
+
+    def test_fetch_protein_sequences(self):
+        self.server.add(self.server.api_url + "/protein/UniProt/P1", {"metadata": {"accession": "P1", "name": "P1 protein", "sequence": "MKV"}})
+        with tempfile.TemporaryDirectory() as directory, self.server.patch(), mock.patch("sys.stdout"):
+            InterProFetcher.fetch_protein_sequences(["P1"] * 4, os.path.join(directory, "proteins.fasta"), client=InterProClient(rate_limiter=RateLimiter(rate=100, burst=100, max_rate=100)))
+            with open(os.path.join(directory, "proteins.fasta")) as handle:
+                self.assertEqual(handle.read(), ">P1|P1 protein\nMKV\n" * 4)
+        self.assertEqual(self.server.stats["requests"], 1)
+
+
+class TestResponseCache(LocalServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_fresh_hit(self):
+        self.client.cache = ResponseCache(self.directory.name)
+        self.route("/page?b=2&a=1", {"results": [1]})
+        self.assertEqual(self.client.get_json(self.base + "/page?b=2&a=1"), {"results": [1]})
+        # Same query with reordered parameters is answered from disk
+        self.assertEqual(self.client.get_json(self.base + "/page?a=1&b=2"), {"results": [1]})
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_revalidation(self):
+        self.client.cache = ResponseCache(self.directory.name, ttl=0)
+        self.route("/page", {"results": [1]}, headers={"ETag": '"v1"'})
+        self.client.get_json(self.base + "/page")
+        response = self.client.request(self.base + "/page")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(response.read()), {"results": [1]})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_eviction(self):
+        cache = ResponseCache(self.directory.name, max_size=300)
+        for i in range(10):
+            cache.put("https://example.org/%d" % i, 200, {}, b"x" * 50)
+        self.assertIsNone(cache.get("https://example.org/0"))
+        self.assertIsNotNone(cache.get("https://example.org/9"))
+        total = sum(os.path.getsize(os.path.join(self.directory.name, name)) for name in os.listdir(self.directory.name))
+        self.assertLessEqual(total, 300)
+
+    def test_eviction_low_water(self):
+        cache = ResponseCache(self.directory.name, max_size=3000)
+        with mock.patch.object(cache, "_evict", wraps=cache._evict) as evict:
+            for i in range(40):
+                cache.put("https://example.org/%d" % i, 200, {}, b"x" * 50)
+        # Every eviction frees room for a few more responses
+        self.assertGreater(evict.call_count, 0)
+        self.assertLess(evict.call_count, 8)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_wait(self):
+        limiter = RateLimiter(rate=2, burst=3)
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.reserve(), 0.5, places=2)
+        self.assertAlmostEqual(limiter.reserve(), 1.0, places=2)
+
+    def test_adaptive_rate(self):
+        limiter = RateLimiter(rate=4, min_rate=1, max_rate=5, increase=0.5)
+        limiter.penalize()
+        self.assertEqual(limiter.rate, 2)
+        # The bucket is drained so the next request has to wait
+        self.assertGreater(limiter.reserve(), 0)
+        for _ in range(3):
+            limiter.penalize()
+        self.assertEqual(limiter.rate, 1)
+        for _ in range(10):
+            limiter.reward()
+        self.assertEqual(limiter.rate, 5)
+
+
+class TestFetchProteinSequences(LocalServerTestCase):
+    def test_input_order(self):
+        accessions = ["P%d" % i for i in range(30)]
+        for accession in accessions:
+            if accession != "P7":
+                self.route("/protein/UniProt/" + accession, {"metadata": {"accession": accession, "name": "n", "sequence": "MK"}})
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "out.fasta")
+            updates = []
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr") as stderr:
+                InterProFetcher.fetch_protein_sequences(accessions, output_path, client=self.client, max_workers=6, progress=updates.append)
+            stderr.write.assert_called_once_with("WARNING: P7 not found.\n")
+            self.assertEqual((updates[-1].done, updates[-1].requests_remaining), (30, 0))
+            with open(output_path) as handle:
+                headers = [line[1:].split("|")[0] for line in handle if line.startswith(">")]
+        accessions.remove("P7")
+        self.assertEqual(headers, accessions)
+
+
+class TestProteinRecords(LocalServerTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(20):
+            if number != 7:
+                accession = "P%d" % number
+                self.route("/protein/UniProt/" + accession, {"metadata": {"accession": accession, "name": accession + " protein", "sequence": "MKV" * (number + 1), "source_organism": {"taxId": "9606", "scientificName": "Homo sapiens"}}})
+        self.records = InterProFetcher.ProteinRecords(["P%d" % number for number in range(20)], client=self.client, prefetch=4, max_workers=2)
+        self.addCleanup(self.records.close)
+
+    def test_lazy_access(self):
+        self.assertEqual(len(self.records), 20)
+        self.assertIn("P7", self.records)
+        self.assertNotIn("P20", self.records)
+        self.assertEqual(self.server.requests, [])
+        record = self.records[3]
+        self.assertEqual((record.id, record.description, str(record.seq)), ("P3", "P3 protein", "MKV" * 4))
+        self.assertEqual(record.annotations["organism"], "Homo sapiens")
+        self.assertIs(self.records["P3"], record)
+        self.assertEqual(self.server.requests, ["/protein/UniProt/P3"])
+        with self.assertRaises(KeyError):
+            self.records[7]
+        self.assertIsNone(self.records.get("P7"))
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_iteration(self):
+        with mock.patch("sys.stderr") as stderr:
+            records = list(self.records[2:10])
+        stderr.write.assert_called_once_with("WARNING: P7 not found.\n")
+        self.assertEqual([record.id for record in records], ["P2", "P3", "P4", "P5", "P6", "P8", "P9"])
+        self.assertEqual(sorted(self.server.requests), sorted("/protein/UniProt/P%d" % number for number in range(2, 10)))
+
+    def test_slices_share_threads(self):
+        with mock.patch("sys.stderr"), mock.patch("Bio.InterProFetcher._records.ThreadPoolExecutor", wraps=ThreadPoolExecutor) as executor:
+            for start in range(0, 20, 5):
+                list(self.records[start:start + 5][:3])
+        executor.assert_called_once()
+        self.records.close()
+        self.assertIsNone(self.records._executor)
+
+
+class TestStreaming(LocalServerTestCase):
+    def test_pages_fetched_on_demand(self):
+        path = "/entry/pfam/?type=family&page_size=200"
+        self.route_pages(path, [[_protein("PF1"), _protein("PF2")], [_protein("PF3")]])
+        entries = InterProFetcher.iter_entries("pfam", "family", client=self.client)
+        self.assertEqual(next(entries), "PF1")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(list(entries), ["PF2", "PF3"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_metadata(self):
+        self.route_pages("/entry/InterPro/?type=domain&page_size=200", [[_protein("IPR1")]])
+        entries = list(InterProFetcher.iter_entries(type="domain", metadata=True, client=self.client))
+        self.assertEqual(entries, [_protein("IPR1")["metadata"]])
+
+    def test_empty(self):
+        self.route("/proteome/uniprot/entry/InterPro/?search=none&page_size=200", status=204, body=b"")
+        self.assertEqual(list(InterProFetcher.iter_proteomes("none", client=self.client)), [])
+
+    def test_browse(self):
+        self.route_pages("/entry/pfam/?type=domain&search=transmembrane&page_size=200", [[_protein("PF1")], [_protein("PF2")]])
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                accessions = InterProFetcher.browse_by_database("pfam", "domain", "transmembrane", write_on_sdout=False, save_to_file=True, client=self.client)
+                with open("pfam_domain_accessionstransmembrane.csv") as handle:
+                    self.assertEqual(handle.read(), "PF1\nPF2\n")
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(accessions, ["PF1", "PF2"])
+
+    def test_filter_pushdown(self):
+        self.assertEqual(InterProFetcher._proteins_url("pfam", "homo sapiens", False), InterProFetcher.API_URL + "/protein/UniProt/entry/pfam/?search=homo%20sapiens&page_size=200")
+        self.route_pages("/protein/reviewed/entry/pfam/PF1/taxonomy/uniprot/9606/?length=100-500&is_fragment=false&page_size=200", [[_protein("P1")]])
+        with mock.patch("sys.stdout"):
+            accessions = InterProFetcher.browse_proteins("pfam", reviewed=True, write_on_sdout=False, client=self.client, entry="PF1", tax_id=9606, length=(100, 500), is_fragment=False)
+        self.assertEqual(accessions, ["P1"])
+        # Every filter gets its own output file
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                with mock.patch("sys.stdout"):
+                    InterProFetcher.browse_proteins("pfam", reviewed=True, write_on_sdout=False, save_to_file=True, client=self.client, entry="PF1", tax_id=9606, length=(100, 500), is_fragment=False)
+                self.assertEqual(os.listdir(directory), ["protein_accessions_pfam__PF1_9606_length_100-500_complete.csv"])
+            finally:
+                os.chdir(cwd)
+
+
+class TestJsonStream(unittest.TestCase):
+    def test_small_chunks(self):
+        page = {"count": 12345, "next": None, "results": [_protein("P1", "M" * 300), {"n": [1.5, -20, True, None, "\u00e9\\\""]}], "previous": "x"}
+        text = json.dumps(page, indent=1)
+        for size in (1, 7, len(text)):
+            fields = {}
+            chunks = (text[i:i + size] for i in range(0, len(text), size))
+            self.assertEqual(list(iter_results(chunks, fields)), page["results"])
+            self.assertEqual(fields, {"count": 12345, "next": None, "previous": "x"})
+
+    def test_truncated(self):
+        fields = {}
+        with self.assertRaises(ValueError):
+            list(iter_results(['{"results": [{"a": 1}, {"b"'], fields))
+
+
+class TestProgress(LocalServerTestCase):
+    def test_progress_callback(self):
+        self.route_pages("/protein/UniProt/entry/pfam/PF1/?page_size=200&extra_fields=sequence", [[_protein("P1"), _protein("P2")], [_protein("P3")]])
+        reports = []
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"):
+                InterProFetcher.fetch_entries("pfam", "PF1", directory, client=self.client, progress=lambda p: reports.append((p.done, p.total, p.requests_remaining)))
+        self.assertEqual(reports, [(2, 3, 1), (3, 3, 0)])
+
+    def test_dry_run(self):
+        self.route("/proteome/uniprot/entry/InterPro/?search=yeast&page_size=1", {"count": 401, "next": None, "results": []})
+        with mock.patch("sys.stdout"):
+            plan = InterProFetcher.browse_proteomes("yeast", client=self.client, dry_run=True)
+        self.assertEqual(plan["count"], 401)
+        self.assertEqual(plan["requests"], 3)
+        self.assertAlmostEqual(plan["seconds"], 3 / self.client.rate_limiter.rate)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_str(self):
+        progress = InterProFetcher.Progress("PF1", None, 200, total=1000)
+        self.assertEqual(progress.requests_remaining, 5)
+        self.assertIsNone(progress.eta)
+        self.assertTrue(str(progress).startswith("PF1: 0/1000 results"))
+
+
+class TestCheckpoint(LocalServerTestCase):
+    def test_resume_fetch_proteomes(self):
+        path = "/protein/UniProt/entry/InterPro/proteome/uniprot/UP1/?page_size=200&extra_fields=sequence"
+        self.route_pages(path, [[_protein("P1")], [_protein("P2")], [_protein("P3")]])
+        missing = self.server.routes[path + "&cursor=2"]
+        self.server.routes[path + "&cursor=2"] = (503, {}, b"")
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+                with self.assertRaises(HTTPError):
+                    InterProFetcher.fetch_proteomes(["UP1"], directory, client=self.client, checkpoint=checkpoint)
+                self.server.routes[path + "&cursor=2"] = missing
+                self.server.requests.clear()
+                # The output of the earlier run is not read back into memory
+                with mock.patch.object(InterProFetcher, "_read_committed", side_effect=AssertionError):
+                    InterProFetcher.fetch_proteomes(["UP1"], directory, client=self.client, checkpoint=checkpoint)
+            self.assertEqual(self.server.requests, [path + "&cursor=2"])
+            with open(os.path.join(directory, "UP1.fasta")) as handle:
+                self.assertEqual(handle.read(), ">P1|P1 protein\nMKV\n>P2|P2 protein\nMKV\n>P3|P3 protein\nMKV\n")
+            # A completed job is not downloaded again
+            with mock.patch("sys.stdout"), mock.patch.object(InterProFetcher, "_read_committed", side_effect=AssertionError):
+                InterProFetcher.fetch_proteomes(["UP1"], directory, client=self.client, checkpoint=checkpoint)
+            self.assertEqual(len(self.server.requests), 1)
+
+    def test_parallel_fetch_proteomes(self):
+        for number in range(6):
+            path = "/protein/UniProt/entry/InterPro/proteome/uniprot/UP%d/?page_size=200&extra_fields=sequence" % number
+            self.route_pages(path, [[_protein("P%d" % number)], [_protein("Q%d" % number)]])
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr") as stderr:
+                files = InterProFetcher.fetch_proteomes(["UP%d" % number for number in range(7)], directory, client=self.client, max_workers=3)
+            self.assertEqual(sorted(files), ["UP%d" % number for number in range(6)])
+            self.assertIn("UP6", "".join(call.args[0] for call in stderr.write.call_args_list))
+            for number in range(6):
+                with open(files["UP%d" % number]) as handle:
+                    self.assertEqual(handle.read(), ">P%d|P%d protein\nMKV\n>Q%d|Q%d protein\nMKV\n" % ((number,) * 4))
+            self.assertEqual(sorted(os.listdir(directory)), sorted(os.path.basename(name) for name in files.values()))
+
+    def test_broken_page_retried(self):
+        path = "/protein/UniProt/entry/pfam/PF1/?page_size=200&extra_fields=sequence"
+        body = json.dumps({"count": 3, "next": None, "results": [_protein("P%d" % i, "M" * 1000) for i in range(3)]}).encode()
+        self.server.routes[path] = [(200, {"Content-Length": str(len(body))}, body[:len(body) // 2]), (200, {}, body)]
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"):
+                InterProFetcher.fetch_entries("pfam", "PF1", directory, client=self.client)
+            with open(os.path.join(directory, "PF1.fasta")) as handle:
+                self.assertEqual(handle.read().count(">"), 3)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_resume_browse(self):
+        path = "/proteome/uniprot/entry/InterPro/?search=yeast&page_size=200"
+        self.route_pages(path, [[_protein("UP1"), _protein("UP2")], [_protein("UP3")]])
+        missing = self.server.routes.pop(path + "&cursor=1")
+        with tempfile.TemporaryDirectory() as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                with mock.patch("sys.stderr"), self.assertRaises(HTTPError):
+                    InterProFetcher.browse_proteomes("yeast", write_on_sdout=False, save_to_file=True, client=self.client, checkpoint="checkpoint.json")
+                self.server.routes[path + "&cursor=1"] = missing
+                accessions = InterProFetcher.browse_proteomes("yeast", write_on_sdout=False, save_to_file=True, client=self.client, checkpoint="checkpoint.json")
+                with open("proteome_accessions_yeast.csv") as handle:
+                    self.assertEqual(handle.read(), "UP1\nUP2\nUP3\n")
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(accessions, ["UP1", "UP2", "UP3"])
+
+
+class TestFetchEntriesBulk(LocalServerTestCase):
+    def test_failures_recorded(self):
+        sizes = {"PF1": 3, "PF2": 1, "PF3": 2}
+        for accession, size in sizes.items():
+            pages = [[_protein("%s_%d" % (accession, i))] for i in range(size)]
+            self.route_pages("/protein/UniProt/entry/pfam/%s/?page_size=200&extra_fields=sequence" % accession, pages)
+            self.route("/protein/UniProt/entry/pfam/%s/?page_size=1" % accession, {"count": size, "next": None, "results": pages[0]})
+        # A malformed page, and a malformed count
+        self.route("/protein/UniProt/entry/pfam/PF5/?page_size=1", {"count": 1, "next": None, "results": []})
+        self.route("/protein/UniProt/entry/pfam/PF5/?page_size=200&extra_fields=sequence", body=b'{"count": 1, "results": [{"metad')
+        self.route("/protein/UniProt/entry/pfam/PF6/?page_size=1", {"next": None})
+        entries = [("pfam", "PF1"), ("pfam", "PF2"), ("pfam", "PF404"), ("pfam", "PF5"), ("pfam", "PF3"), ("pfam", "PF6"), ("pfam", "PF2")]
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+                written, failures = InterProFetcher.fetch_entries_bulk(entries, directory, client=self.client, max_workers=2)
+            self.assertEqual(sorted(written), [("pfam", "PF1"), ("pfam", "PF2"), ("pfam", "PF3")])
+            self.assertEqual(sorted(failures), [("pfam", "PF404"), ("pfam", "PF5"), ("pfam", "PF6")])
+            self.assertEqual(failures["pfam", "PF404"].code, 404)
+            self.assertIsInstance(failures["pfam", "PF6"], KeyError)
+            with open(written["pfam", "PF1"]) as handle:
+                self.assertEqual(handle.read().count(">"), 3)
+        # Each size is requested once despite the duplicated entry
+        self.assertEqual(self.server.requests.count("/protein/UniProt/entry/pfam/PF2/?page_size=1"), 1)
+
+
+class TestBatch(LocalServerTestCase):
+    def test_run_batch(self):
+        self.route_pages("/proteome/uniprot/entry/InterPro/?search=yeast&page_size=200", [[{"metadata": {"accession": "UP1"}}]])
+        job = {"function": "browse_proteomes", "kwargs": {"organism": "yeast", "write_on_sdout": False}}
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = os.path.join(directory, "jobs.jsonl")
+            manifest = os.path.join(directory, "manifest.jsonl")
+            with open(jobs, "w") as handle:
+                handle.write(json.dumps(dict(job, id="yeast")) + "\n\n")
+                handle.write(json.dumps(job) + "\n")
+                handle.write(json.dumps({"function": "browse_proteomes", "kwargs": {"organism": "nothing", "write_on_sdout": False}}) + "\n")
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+                batch.run_batch(jobs, manifest, client=self.client)
+            with open(manifest) as handle:
+                records = {record["id"]: record for record in map(json.loads, handle)}
+        self.assertEqual(sorted(records), ["4", "yeast"])
+        self.assertEqual(records["yeast"]["status"], "ok")
+        self.assertEqual(records["yeast"]["result"], ["UP1"])
+        self.assertEqual(records["yeast"]["duplicates"], ["3"])
+        self.assertEqual(records["4"]["status"], "error")
+
+    def test_unknown_function(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = os.path.join(directory, "jobs.jsonl")
+            with open(jobs, "w") as handle:
+                handle.write('{"function": "exit"}\n')
+            with self.assertRaises(ValueError):
+                batch.read_jobs(jobs)
+
+
+class TestAccessionArray(unittest.TestCase):
+    def test_round_trip(self):
+        accessions = ["P12345", "A0A023GPI8", "1abc", "IPR000001", "UP000005640", "PF00001", "P1234"]
+        array = InterProFetcher.AccessionArray(accessions)
+        self.assertEqual(list(array), accessions)
+        self.assertEqual(array.nbytes, 8 * len(accessions))
+        self.assertEqual(InterProFetcher.AccessionArray.frombytes(array.tobytes()), array)
+        with self.assertRaises(ValueError):
+            encode_accession("G3DSA:1.10.10.10")
+
+    def test_uncompact_accessions(self):
+        accessions = ["PF00001", "G3DSA:1.10.10.10", "PTHR10000:SF12", "1abc"]
+        array = InterProFetcher.AccessionArray(iter(accessions))
+        self.assertEqual(list(array), accessions)
+        self.assertIn("PTHR10000:SF12", array)
+        self.assertEqual(list(array.unique()), sorted(accessions))
+        with self.assertRaises(ValueError):
+            array.tobytes()
+        compact = InterProFetcher.AccessionArray(["PF00001", "PF00002"])
+        self.assertEqual(list(compact | array), sorted(accessions + ["PF00002"]))
+        self.assertEqual(list(array - compact), sorted(accessions[1:]))
+        compact.append("G3DSA:2.20.20.20")
+        self.assertEqual(list(compact & ["G3DSA:2.20.20.20", "PF00002", "PF00003"]), ["G3DSA:2.20.20.20", "PF00002"])
+
+    def test_sort_and_membership(self):
+        accessions = ["Q9Y6K9", "P12345", "P1234", "A0A023GPI8", "P12345", "P10000"]
+        array = InterProFetcher.AccessionArray(accessions)
+        self.assertIn("P1234", array)
+        self.assertNotIn("P123", array)
+        unique = array.unique()
+        self.assertEqual(list(unique), sorted(set(accessions)))
+        self.assertIn("Q9Y6K9", unique)
+        self.assertNotIn("Q9Y6K8", unique)
+        self.assertNotIn("not an accession", unique)
+        array.sort()
+        self.assertEqual(list(array), sorted(accessions))
+        self.assertEqual(list(array[1:3]), sorted(accessions)[1:3])
+        other = InterProFetcher.AccessionArray(["P10000", "P99999", "Q9Y6K9"])
+        self.assertEqual(list(array | other), sorted(set(accessions) | {"P99999"}))
+        self.assertEqual(list(array & other), ["P10000", "Q9Y6K9"])
+        self.assertEqual(list(array - other), ["A0A023GPI8", "P1234", "P12345"])
+        self.assertEqual(list(other - array), ["P99999"])
+        # PDB IDs sort after the uppercase accessions
+        mixed = InterProFetcher.AccessionArray(["1abc", "P12345", "2xyz"])
+        mixed.sort()
+        self.assertEqual(list(mixed), ["P12345", "1abc", "2xyz"])
+
+
+class TestSets(LocalServerTestCase):
+    def accessions(self, path, accessions):
+        self.route_pages(path, [[{"metadata": {"accession": accession}} for accession in accessions]])
+
+    def test_pushdown(self):
+        query = Query.proteins("pfam", entry="PF1") & Query.proteins("UniProt", tax_id=9606) & Query.proteins("reviewed")
+        self.assertIsInstance(query, Query)
+        self.assertEqual(query.url, self.base + "/protein/reviewed/entry/pfam/PF1/taxonomy/uniprot/9606/?page_size=200")
+        self.accessions("/protein/reviewed/entry/pfam/PF1/taxonomy/uniprot/9606/?page_size=200", ["P2", "P1"])
+        self.assertEqual(list(query.fetch(self.client)), ["P1", "P2"])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_client_side(self):
+        self.accessions("/protein/UniProt/entry/pfam/PF1/?page_size=200", ["P1", "P2", "P3"])
+        self.accessions("/protein/UniProt/entry/pfam/PF2/?page_size=200", ["P3", "P4"])
+        pf1 = Query.proteins("pfam", entry="PF1")
+        pf2 = Query.proteins("pfam", entry="PF2")
+        self.assertEqual(list((pf1 | pf2).fetch(self.client)), ["P1", "P2", "P3", "P4"])
+        self.assertEqual(list((pf1 & pf2).fetch(self.client)), ["P3"])
+        self.assertEqual(list((pf1 - pf2 - ["P1"]).fetch(self.client)), ["P2"])
+        self.assertEqual(list((InterProFetcher.AccessionArray(["P4", "P9"]) & pf2).fetch(self.client)), ["P4"])
+
+    def test_gene3d_entries(self):
+        self.accessions("/entry/cathgene3d/?page_size=200", ["G3DSA:3.40.50.300", "G3DSA:1.10.10.10"])
+        self.assertEqual(list(Query.entries("cathgene3d").fetch(self.client)), ["G3DSA:1.10.10.10", "G3DSA:3.40.50.300"])
+
+
+class TestOfflineIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        files = {
+            "entry.list": "ENTRY_AC\tENTRY_TYPE\tENTRY_NAME\nIPR000001\tDomain\tKringle\nIPR000002\tFamily\tCystatin family\n",
+            "protein2ipr.dat": "".join("\t".join(row) + "\n" for row in [
+                ("P1", "IPR000001", "Kringle", "PF00051", "1", "80"),
+                ("P1", "IPR000001", "Kringle", "PF00051", "90", "170"),
+                ("P1", "IPR000001", "Kringle", "SM00130", "1", "80"),
+                ("P2", "IPR000002", "Cystatin family", "PF00031", "5", "100"),
+                ("P3", "IPR000001", "Kringle", "PS50070", "1", "80"),
+            ]),
+            "uniprot.tsv": "Entry\tReviewed\tOrganism\tOrganism (ID)\nP1\treviewed\tGorilla gorilla gorilla\t9595\nP2\tunreviewed\tGorilla gorilla gorilla\t9595\nP3\treviewed\tHomo sapiens\t9606\n",
+        }
+        for name, text in files.items():
+            with open(os.path.join(self.directory.name, name), "w") as handle:
+                handle.write(text)
+        path = lambda name: os.path.join(self.directory.name, name)
+        self.index = OfflineIndex.build(path("index.sqlite"), path("protein2ipr.dat"), path("entry.list"), path("uniprot.tsv"))
+        self.addCleanup(self.index.close)
+
+    def test_browse_proteins(self):
+        self.assertEqual(self.index.browse_proteins("pfam", "gorilla gorilla"), ["P1", "P2"])
+        self.assertEqual(self.index.browse_proteins("pfam", "gorilla", reviewed=True), ["P1"])
+        self.assertEqual(self.index.browse_proteins("InterPro", "9606"), ["P3"])
+        self.assertEqual(self.index.browse_proteins("profile"), ["P3"])
+        self.assertFalse(self.index.can_browse_proteins("cdd"))
+
+    def test_unsorted_protein2ipr(self):
+        filename = os.path.join(self.directory.name, "unsorted.dat")
+        with open(filename, "w") as handle:
+            handle.write("P1\tIPR000001\tKringle\tPF00051\t1\t80\nP2\tIPR000002\tCystatin family\tPF00031\t5\t100\nP1\tIPR000001\tKringle\tSM00130\t1\t80\n")
+        index = OfflineIndex.build(os.path.join(self.directory.name, "unsorted.sqlite"), filename)
+        self.addCleanup(index.close)
+        self.assertEqual(index.browse_proteins("pfam"), ["P1", "P2"])
+        self.assertEqual(index.browse_proteins("smart"), ["P1"])
+        self.assertEqual(index.browse_proteins("InterPro"), ["P1", "P2"])
+
+    def test_browse_by_type(self):
+        self.assertEqual(self.index.browse_by_type("family", "cystatin"), ["IPR000002"])
+        self.assertEqual(self.index.browse_by_type("domain"), ["IPR000001"])
+
+    def test_routing(self):
+        InterProFetcher.set_offline_index(self.index)
+        self.addCleanup(InterProFetcher.set_offline_index, None)
+        with mock.patch("sys.stdout"), mock.patch("Bio.InterProFetcher.get_default_client") as client:
+            self.assertEqual(InterProFetcher.browse_proteins("pfam", "gorilla gorilla", write_on_sdout=False), ["P1", "P2"])
+            self.assertEqual(InterProFetcher.browse_by_type("family", "cystatin", write_on_sdout=False), ["IPR000002"])
+        client.assert_not_called()
+
+
+class TestSinks(LocalServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_open_sink(self):
+        filename = os.path.join(self.directory.name, "hits.jsonl.gz")
+        with InterProFetcher.open_sink(filename) as sink:
+            self.assertIsInstance(sink, InterProFetcher.JsonlSink)
+            sink.write_results([_protein("P1"), _protein("P2")])
+            # Nothing appears under the final name before completion
+            self.assertFalse(os.path.exists(filename))
+        with gzip.open(filename, "rt") as handle:
+            self.assertEqual([json.loads(line) for line in handle], [_protein("P1"), _protein("P2")])
+        with self.assertRaises(ValueError):
+            InterProFetcher.open_sink("hits.xml")
+
+    def test_fetch_entries_all_pages(self):
+        self.route_pages("/protein/UniProt/entry/pfam/PF1/?page_size=200&extra_fields=sequence", [[_protein("P1")], [_protein("P2")]])
+        with mock.patch("sys.stdout"):
+            InterProFetcher.fetch_entries("pfam", "PF1", self.directory.name, client=self.client, compression="bgzf")
+        with gzip.open(os.path.join(self.directory.name, "PF1.fasta.gz"), "rt") as handle:
+            self.assertEqual(handle.read(), ">P1|P1 protein\nMKV\n>P2|P2 protein\nMKV\n")
+
+    def test_resume_compressed(self):
+        path = "/protein/UniProt/entry/InterPro/proteome/uniprot/UP1/?page_size=200&extra_fields=sequence"
+        self.route_pages(path, [[_protein("P1")], [_protein("P2")]])
+        missing = self.server.routes[path + "&cursor=1"]
+        self.server.routes[path + "&cursor=1"] = (503, {}, b"")
+        checkpoint = os.path.join(self.directory.name, "checkpoint.json")
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+            with self.assertRaises(HTTPError):
+                InterProFetcher.fetch_proteomes(["UP1"], self.directory.name, client=self.client, checkpoint=checkpoint, compression="gzip")
+            self.server.routes[path + "&cursor=1"] = missing
+            InterProFetcher.fetch_proteomes(["UP1"], self.directory.name, client=self.client, checkpoint=checkpoint, compression="gzip")
+        with gzip.open(os.path.join(self.directory.name, "UP1.fasta.gz"), "rt") as handle:
+            self.assertEqual(handle.read(), ">P1|P1 protein\nMKV\n>P2|P2 protein\nMKV\n")
+
+    def test_indexed_fasta(self):
+        # About 400 kB of FASTA, spread over several BGZF blocks
+        records = [("P%d" % i, "protein %d" % i, "ACDEFGHIKLMNPQRSTVWY"[i % 20] * (i * 7 % 500)) for i in range(1500)]
+        for compression in (None, "bgzf"):
+            filename = os.path.join(self.directory.name, "proteins.fasta" + (".gz" if compression else ""))
+            with InterProFetcher.FastaSink(filename, compression, index=True) as sink:
+                for fields in records:
+                    sink.write_record(*fields)
+            self.assertEqual(os.path.exists(filename + ".gzi"), compression == "bgzf")
+            with InterProFetcher.index_fasta(filename, key_function=lambda name: name.split("|")[0]) as index:
+                self.assertEqual(len(index), 1500)
+                for accession, name, sequence in (records[0], records[1], records[777], records[1499]):
+                    seq_record = index[accession]
+                    self.assertEqual((seq_record.id, seq_record.description, str(seq_record.seq)), (accession + "|protein", accession + "|" + name, sequence))
+        with open(filename + ".fai") as handle:
+            self.assertEqual(handle.readline(), "P0|protein\t0\t14\t80\t81\n")
+            self.assertEqual(handle.readline(), "P1|protein\t7\t28\t7\t8\n")
+        with self.assertRaises(ValueError):
+            InterProFetcher.FastaSink(filename, "gzip", index=True)
+
+    def test_indexed_resume(self):
+        path = "/protein/UniProt/entry/InterPro/proteome/uniprot/UP1/?page_size=200&extra_fields=sequence"
+        self.route_pages(path, [[_protein("P1", "A" * 100)], [_protein("P2", "C" * 50)]])
+        missing = self.server.routes[path + "&cursor=1"]
+        self.server.routes[path + "&cursor=1"] = (503, {}, b"")
+        checkpoint = os.path.join(self.directory.name, "checkpoint.json")
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+            with self.assertRaises(HTTPError):
+                InterProFetcher.fetch_proteomes(["UP1"], self.directory.name, client=self.client, checkpoint=checkpoint, compression="bgzf", index=True)
+            self.server.routes[path + "&cursor=1"] = missing
+            InterProFetcher.fetch_proteomes(["UP1"], self.directory.name, client=self.client, checkpoint=checkpoint, compression="bgzf", index=True)
+        with InterProFetcher.index_fasta(os.path.join(self.directory.name, "UP1.fasta.gz")) as index:
+            self.assertEqual(list(index), ["P1|P1", "P2|P2"])
+            self.assertEqual(str(index["P2|P2"].seq), "C" * 50)
+            self.assertEqual(index.get_raw("P1|P1"), b">P1|P1 protein\n" + b"A" * 80 + b"\n" + b"A" * 20 + b"\n")
+
+
+class TestDownloadPDB(LocalServerTestCase):
+    def test_formats_and_streaming(self):
+        pdb = b"HEADER    TEST\n" * 10000
+        self.route("/1abc.pdb.gz", body=gzip.compress(pdb))
+        self.route("/2xyz.cif.gz", body=gzip.compress(b"data_2XYZ\n"))
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), mock.patch("sys.stderr") as stderr:
+                files = InterProFetcher.download_pdb_structures(["1abc", "2xyz", "3nop"], directory, client=self.client)
+            stderr.write.assert_called_once_with("WARNING: 3nop is not found in the PDB database.\n")
+            self.assertEqual(files, {"1abc": os.path.join(directory, "1abc.pdb"), "2xyz": os.path.join(directory, "2xyz.cif")})
+            with open(files["1abc"], "rb") as handle:
+                self.assertEqual(handle.read(), pdb)
+            self.assertEqual(sorted(os.listdir(directory)), ["1abc.pdb", "2xyz.cif"])
+
+            with mock.patch("sys.stdout"):
+                files = InterProFetcher.download_pdb_structures(["2xyz"], directory, client=self.client, formats=("cif",), keep_compressed=True)
+            with gzip.open(files["2xyz"]) as handle:
+                self.assertEqual(handle.read(), b"data_2XYZ\n")
+
+    def test_truncated_download_retried(self):
+        pdb = gzip.compress(b"HEADER    TEST\n" * 10000)
+        # Cut short, then a gzip stream missing its end, then complete
+        self.server.routes["/1abc.pdb.gz"] = [(200, {"Content-Length": str(len(pdb))}, pdb[:len(pdb) // 2]), (200, {}, pdb[:-8]), (200, {}, pdb)]
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"):
+                files = InterProFetcher.download_pdb_structures(["1abc"], directory, client=self.client)
+            with open(files["1abc"], "rb") as handle:
+                self.assertEqual(handle.read(), b"HEADER    TEST\n" * 10000)
+            self.assertEqual(os.listdir(directory), ["1abc.pdb"])
+        self.assertEqual(len(self.server.requests), 3)
+        # A download which keeps failing is not saved
+        self.server.routes["/1abc.pdb.gz"] = (200, {"Content-Length": str(len(pdb))}, pdb[:len(pdb) // 2])
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), self.assertRaises(URLError):
+                InterProFetcher.download_pdb_structures(["1abc"], directory, client=self.client, keep_compressed=True)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_download_retries_not_nested(self):
+        self.route("/1abc.pdb.gz", status=503, body=b"")
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch("sys.stdout"), self.assertRaises(HTTPError):
+                InterProFetcher.download_pdb_structures(["1abc"], directory, client=self.client)
+        self.assertEqual(len(self.server.requests), self.client.retry.max_attempts)
+        self.assertNotIn("/2xyz.pdb.gz", self.server.requests[-1:])
+
+
+class TestAsync(LocalServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.aclient = aio.AsyncInterProClient(self.client, max_concurrency=4)
+        self.addCleanup(self.aclient.close)
+
+    def test_browse_pages(self):
+        self.route_pages("/entry/InterPro/?type=family&page_size=200", [[_protein("IPR1"), _protein("IPR2")], [_protein("IPR3")]])
+        self.route_pages("/proteome/uniprot/entry/InterPro/?search=yeast&page_size=200", [[_protein("UP1")]])
+
+        async def main():
+            return await asyncio.gather(
+                aio.browse_by_type("family", client=self.aclient),
+                aio.browse_proteomes("yeast", client=self.aclient),
+            )
+
+        self.assertEqual(asyncio.run(main()), [["IPR1", "IPR2", "IPR3"], ["UP1"]])
+
+    def test_fetch_entries(self):
+        self.route_pages("/protein/UniProt/entry/pfam/PF1/?page_size=200&extra_fields=sequence", [[_protein("P1", "A" * 100)], [_protein("P2")]])
+        with tempfile.TemporaryDirectory() as directory:
+            count = asyncio.run(aio.fetch_entries("pfam", "PF1", directory, client=self.aclient))
+            self.assertEqual(count, 2)
+            with open(os.path.join(directory, "PF1.fasta")) as handle:
+                self.assertEqual(handle.read(), ">P1|P1 protein\n" + "A" * 80 + "\n" + "A" * 20 + "\n>P2|P2 protein\nMKV\n")
+            with mock.patch("sys.stderr"):
+                self.assertIsNone(asyncio.run(aio.fetch_entries("pfam", "PF2", directory, client=self.aclient)))
+            self.assertFalse(os.path.exists(os.path.join(directory, "PF2.fasta")))
+
+    def test_fetch_proteomes_bounded(self):
+        for number in range(12):
+            self.route_pages("/protein/UniProt/entry/InterPro/proteome/uniprot/UP%d/?page_size=200&extra_fields=sequence" % number, [[_protein("P%d" % number)]])
+        open_sinks = []
+        most_open = []
+
+        class CountingSink(InterProFetcher.FastaSink):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                open_sinks.append(self)
+                most_open.append(len(open_sinks))
+
+            def close(self):
+                open_sinks.remove(self)
+                super().close()
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(aio, "FastaSink", CountingSink):
+            counts = asyncio.run(aio.fetch_proteomes(["UP%d" % number for number in range(12)], directory, client=self.aclient))
+        self.assertEqual(counts, {"UP%d" % number: 1 for number in range(12)})
+        self.assertLessEqual(max(most_open), 4)
+
+
+class TestMockServer(unittest.TestCase):
+    def setUp(self):
+        self.client = InterProClient(max_connections=2, timeout=5, rate_limiter=RateLimiter(rate=1000, burst=1000, max_rate=1000), retry=RetryPolicy(max_attempts=10, base_delay=0.001, jitter=False))
+        self.addCleanup(self.client.close)
+
+    def test_error_injection(self):
+        with MockServer(latency=0.001, error_rate=0.3, seed=1) as server:
+            with server.patch():
+                server.add_pages(InterProFetcher._proteomes_url("yeast"), [[_protein("UP%d" % (page * 2 + i)) for i in range(2)] for page in range(5)])
+                self.assertEqual(len(list(InterProFetcher.iter_proteomes("yeast", client=self.client))), 10)
+            self.assertGreater(server.stats["errors"], 0)
+            self.assertEqual(server.stats["requests"], 5 + server.stats["errors"])
+
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with MockServer() as live:
+                url = live.api_url + "/entry/pfam/?page_size=200"
+                live.add_pages(url, [[_protein("PF1")], [_protein("PF2")]])
+                self.assertEqual(record([url], directory, self.client), 2)
+            with MockServer.load(directory) as server, server.patch():
+                entries = list(InterProFetcher.iter_entries("pfam", client=self.client))
+            self.assertEqual(entries, ["PF1", "PF2"])
+
+    def test_benchmarks(self):
+        with MockServer() as server:
+            benchmark.populate(server, records=450)
+            results = benchmark.run_benchmarks(server, ["browse_proteins", "fetch_entries_bulk", "fetch_protein_sequences", "download_pdb_structures"])
+        self.assertEqual([result["records"] for result in results], [450, 900, 10, 2])
+        self.assertEqual([result["requests"] for result in results], [3, 8, 10, 2])
+        self.assertTrue(all(result["bytes_per_second"] > 0 for result in results))
+        with self.assertRaises(ValueError):
+            benchmark.run_benchmarks(server, ["browse_everything"])
+
+
+if __name__ == "__main__":
+    runner = unittest.TextTestRunner(verbosity=2)
+    unittest.main(testRunner=runner)